@@ -0,0 +1,145 @@
+"""
+Índice de intervalos e cálculo de horários livres da agenda.
+
+Os agendamentos de cada recurso (profissional ou cadeira) viram um
+IndiceIntervalos: intervalos ocupados fundidos e ordenados, em que a busca
+de conflito é uma busca binária e os horários livres de uma janela saem de
+uma varredura a partir dela. A disponibilidade da semana para toda a equipe
+é montada em memória a partir de uma única consulta dos agendamentos do
+período.
+
+Configuração (horário local do salão):
+- AGENDA_ABERTURA / AGENDA_FECHAMENTO: expediente, padrão 09:00 às 19:00;
+- AGENDA_DIAS: dias de atendimento (0 = segunda), padrão 0,1,2,3,4,5;
+- AGENDA_DURACAO_MAX_MIN: duração máxima de um agendamento (padrão 480).
+"""
+import os
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+Intervalo = Tuple[datetime, datetime]
+
+AGENDA_ABERTURA = time.fromisoformat(os.getenv("AGENDA_ABERTURA", "09:00"))
+AGENDA_FECHAMENTO = time.fromisoformat(os.getenv("AGENDA_FECHAMENTO", "19:00"))
+AGENDA_DIAS = frozenset(int(dia) for dia in os.getenv("AGENDA_DIAS", "0,1,2,3,4,5").split(","))
+AGENDA_DURACAO_MAX = timedelta(minutes=int(os.getenv("AGENDA_DURACAO_MAX_MIN", "480")))
+
+
+class IndiceIntervalos:
+    """
+    Intervalos ocupados de um recurso, fundidos e ordenados pelo início.
+    Como não se sobrepõem, os fins também ficam ordenados e as buscas são
+    O(log n) com bisect. Intervalos que só se encostam não conflitam.
+    """
+
+    def __init__(self, intervalos: Iterable[Intervalo] = ()):
+        self._inicios: List[datetime] = []
+        self._fins: List[datetime] = []
+        for inicio, fim in sorted(intervalos):
+            if self._fins and inicio <= self._fins[-1]:
+                self._fins[-1] = max(self._fins[-1], fim)
+            else:
+                self._inicios.append(inicio)
+                self._fins.append(fim)
+
+    def __len__(self) -> int:
+        return len(self._inicios)
+
+    def __iter__(self) -> Iterator[Intervalo]:
+        return iter(zip(self._inicios, self._fins))
+
+    def inserir(self, inicio: datetime, fim: datetime) -> None:
+        # Intervalos que tocam [inicio, fim] são fundidos com ele
+        primeiro = bisect_left(self._fins, inicio)
+        ultimo = bisect_right(self._inicios, fim)
+        if primeiro < ultimo:
+            inicio = min(inicio, self._inicios[primeiro])
+            fim = max(fim, self._fins[ultimo - 1])
+        self._inicios[primeiro:ultimo] = [inicio]
+        self._fins[primeiro:ultimo] = [fim]
+
+    def conflita(self, inicio: datetime, fim: datetime) -> bool:
+        # Dos intervalos que começam antes de `fim`, o último é o que termina mais tarde
+        posicao = bisect_left(self._inicios, fim)
+        return posicao > 0 and self._fins[posicao - 1] > inicio
+
+    def livres(self, inicio: datetime, fim: datetime) -> List[Intervalo]:
+        """
+        Trechos livres dentro da janela [inicio, fim).
+        """
+        resultado = []
+        cursor = inicio
+        for posicao in range(bisect_right(self._fins, inicio), len(self._inicios)):
+            if self._inicios[posicao] >= fim:
+                break
+            if self._inicios[posicao] > cursor:
+                resultado.append((cursor, self._inicios[posicao]))
+            cursor = max(cursor, self._fins[posicao])
+        if cursor < fim:
+            resultado.append((cursor, fim))
+        return resultado
+
+
+def todos_ocupados(indices: Sequence[IndiceIntervalos]) -> IndiceIntervalos:
+    """
+    Períodos em que todos os recursos estão ocupados ao mesmo tempo (por
+    exemplo, nenhuma cadeira livre), por varredura dos inícios e fins.
+    """
+    if not indices:
+        return IndiceIntervalos()
+    marcos = []
+    for indice in indices:
+        for inicio, fim in indice:
+            marcos.append((inicio, 1))
+            marcos.append((fim, -1))
+    # No mesmo instante, as saídas vêm antes das entradas
+    marcos.sort(key=lambda marco: (marco[0], marco[1]))
+
+    resultado = []
+    ocupados = 0
+    comeco: Optional[datetime] = None
+    for instante, variacao in marcos:
+        ocupados += variacao
+        if ocupados == len(indices) and comeco is None:
+            comeco = instante
+        elif ocupados < len(indices) and comeco is not None:
+            if instante > comeco:
+                resultado.append((comeco, instante))
+            comeco = None
+    return IndiceIntervalos(resultado)
+
+
+def expediente(dia: date) -> Optional[Intervalo]:
+    if dia.weekday() not in AGENDA_DIAS:
+        return None
+    return datetime.combine(dia, AGENDA_ABERTURA), datetime.combine(dia, AGENDA_FECHAMENTO)
+
+
+def horarios_livres(
+    ocupado: IndiceIntervalos,
+    inicio: date,
+    dias: int,
+    duracao: timedelta,
+    a_partir_de: Optional[datetime] = None,
+) -> List[Intervalo]:
+    """
+    Janelas livres de pelo menos `duracao` dentro do expediente, nos `dias`
+    dias a partir de `inicio`, ignorando o que já passou de `a_partir_de`.
+    """
+    janelas = []
+    for deslocamento in range(dias):
+        periodo = expediente(inicio + timedelta(days=deslocamento))
+        if periodo is None:
+            continue
+        comeco, fim = periodo
+        if a_partir_de is not None:
+            comeco = max(comeco, a_partir_de)
+        if comeco >= fim:
+            continue
+        janelas.extend(
+            (livre_inicio, livre_fim)
+            for livre_inicio, livre_fim in ocupado.livres(comeco, fim)
+            if livre_fim - livre_inicio >= duracao
+        )
+    return janelas
@@ -0,0 +1,225 @@
+"""
+Arquivo frio de procedimentos antigos.
+
+Visitas com mais de ARQUIVO_IDADE_ANOS anos quase nunca são lidas, mas pesam
+nos índices de todas as listagens. O job deste módulo move essas linhas para
+arquivos NDJSON comprimidos com gzip, um por cliente e por mês:
+
+    {ARQUIVO_DIR}/cliente_{id}/{AAAA}_{MM}.ndjson.gz
+
+e as remove da tabela. O histórico do cliente e a exportação juntam o que
+está arquivado quando chamados com include_archived=true; o arquivo é só
+leitura (editar ou remover um procedimento arquivado retorna 404).
+
+Cada lote é gravado (gzip concatenado, com fsync e rename atômico) antes do
+DELETE no banco. Se o job cair no meio, as linhas continuam na tabela e são
+arquivadas de novo na próxima execução; a leitura descarta ids repetidos.
+
+Execução (cron, uma vez por dia ou por mês):
+    cd app && python -m core.arquivamento
+    cd app && python -m core.arquivamento --anos 5
+
+A mesma execução compacta o log da sincronização incremental
+(crud/alteracao.py), removendo entradas superadas.
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import shutil
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from core.cache import CACHE, LISTAGENS
+from core.invalidacao import publicar
+from models.procedimento import Procedimento
+
+logger = logging.getLogger(__name__)
+
+ARQUIVO_DIR = os.getenv("ARQUIVO_DIR", "arquivo/procedimentos/")
+ARQUIVO_IDADE_ANOS = int(os.getenv("ARQUIVO_IDADE_ANOS", "3"))
+ARQUIVO_LOTE = int(os.getenv("ARQUIVO_LOTE", "5000"))
+
+
+def data_de_corte(anos: int = ARQUIVO_IDADE_ANOS, hoje: Optional[date] = None) -> date:
+    """
+    Primeiro dia do mês de `anos` anos atrás: o job arquiva meses inteiros.
+    """
+    hoje = hoje or date.today()
+    return date(hoje.year - anos, hoje.month, 1)
+
+
+def _diretorio_cliente(cliente_id: int) -> str:
+    return os.path.join(ARQUIVO_DIR, f"cliente_{int(cliente_id)}")
+
+
+def _serializar(valor: Any) -> str:
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def _gravar(cliente_id: int, mes: date, itens: List[Dict[str, Any]]) -> None:
+    """
+    Acrescenta os itens ao arquivo do cliente no mês. O arquivo é reescrito
+    em um temporário e trocado com rename, para nunca ficar pela metade.
+    """
+    diretorio = _diretorio_cliente(cliente_id)
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f"{mes:%Y_%m}.ndjson.gz")
+
+    existente = b""
+    if os.path.exists(caminho):
+        with open(caminho, "rb") as arquivo:
+            existente = arquivo.read()
+    conteudo = "".join(json.dumps(item, default=_serializar, ensure_ascii=False) + "\n" for item in itens)
+
+    temporario = caminho + ".tmp"
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(existente)
+        arquivo.write(gzip.compress(conteudo.encode("utf-8")))
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    os.replace(temporario, caminho)
+
+
+def arquivar_procedimentos(db: Session, antes_de: date, lote: int = ARQUIVO_LOTE) -> int:
+    """
+    Move para o arquivo frio os procedimentos com data anterior a `antes_de`,
+    em lotes de `lote` linhas. Retorna quantos foram arquivados.
+    """
+    colunas = Procedimento.__table__.columns
+    total = 0
+    while True:
+        linhas = db.execute(
+            select(*colunas)
+            .where(Procedimento.data_procedimento < antes_de)
+            .order_by(Procedimento.cliente_id, Procedimento.data_procedimento, Procedimento.id)
+            .limit(lote)
+            .with_for_update()
+        ).mappings().all()
+        if not linhas:
+            break
+
+        grupos: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+        for item in linhas:
+            grupos[(item["cliente_id"], item["data_procedimento"].replace(day=1))].append(dict(item))
+        for (cliente_id, mes), itens in grupos.items():
+            _gravar(cliente_id, mes, itens)
+
+        ids = [item["id"] for item in linhas]
+        # A condição na data mantém o DELETE só nas partições antigas
+        db.execute(
+            delete(Procedimento)
+            .where(Procedimento.id.in_(ids), Procedimento.data_procedimento < antes_de)
+            .execution_options(synchronize_session=False)
+        )
+        publicar(db, "procedimento", ids, tabelas=["procedimentos"])
+        db.commit()
+        CACHE.delete("procedimento", *ids)
+        LISTAGENS.nova_geracao("procedimentos")
+
+        total += len(ids)
+        logger.info("%d procedimentos arquivados (antes de %s)", total, antes_de)
+    return total
+
+
+def historico_arquivado(cliente_id: int) -> List[Dict[str, Any]]:
+    """
+    Procedimentos arquivados de um cliente, do mais recente para o mais
+    antigo, como dicionários com as colunas da tabela (datas em ISO 8601).
+    """
+    diretorio = _diretorio_cliente(cliente_id)
+    if not os.path.isdir(diretorio):
+        return []
+
+    por_id: Dict[int, Dict[str, Any]] = {}
+    for nome in sorted(os.listdir(diretorio)):
+        if not nome.endswith(".ndjson.gz"):
+            continue
+        with gzip.open(os.path.join(diretorio, nome), "rt", encoding="utf-8") as arquivo:
+            for texto in arquivo:
+                if texto.strip():
+                    item = json.loads(texto)
+                    por_id[item["id"]] = item
+    return sorted(por_id.values(), key=lambda item: (item["data_procedimento"], item["id"]), reverse=True)
+
+
+def remover_historico_arquivado(cliente_ids: Iterable[int]) -> None:
+    """
+    Apaga o arquivo frio de clientes removidos (tarefa em segundo plano,
+    core/tarefas.py). Uma falha faz a tarefa tentar de novo.
+    """
+    falhas = []
+    for cliente_id in cliente_ids:
+        try:
+            shutil.rmtree(_diretorio_cliente(cliente_id))
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            logger.warning("Não foi possível remover o arquivo do cliente %s: %s", cliente_id, exc)
+            falhas.append(cliente_id)
+    if falhas:
+        raise OSError(f"Arquivo frio não removido dos clientes {falhas}")
+
+
+def transferir_historico_arquivado(origens: Iterable[int], destino: int) -> None:
+    """
+    Passa o arquivo frio de clientes mesclados para o cliente `destino`
+    (tarefa em segundo plano, core/tarefas.py, depois do commit da
+    mesclagem). Cada mês é acrescentado ao arquivo do mesmo mês do destino,
+    com o cliente_id novo, e só então o diretório de origem é apagado; se a
+    tarefa cair no meio e for repetida, a leitura descarta os ids repetidos.
+    """
+    falhas = []
+    for origem in origens:
+        diretorio = _diretorio_cliente(origem)
+        if not os.path.isdir(diretorio):
+            continue
+        try:
+            for nome in sorted(os.listdir(diretorio)):
+                if not nome.endswith(".ndjson.gz"):
+                    continue
+                with gzip.open(os.path.join(diretorio, nome), "rt", encoding="utf-8") as arquivo:
+                    itens = [json.loads(texto) for texto in arquivo if texto.strip()]
+                for item in itens:
+                    item["cliente_id"] = destino
+                mes = datetime.strptime(nome[:7], "%Y_%m").date()
+                _gravar(destino, mes, itens)
+            shutil.rmtree(diretorio)
+        except OSError as exc:
+            logger.warning("Não foi possível transferir o arquivo do cliente %s para %s: %s", origem, destino, exc)
+            falhas.append(origem)
+    if falhas:
+        raise OSError(f"Arquivo frio não transferido dos clientes {falhas}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move procedimentos antigos para o arquivo frio")
+    parser.add_argument("--anos", type=int, default=ARQUIVO_IDADE_ANOS, help="Idade mínima, em anos")
+    parser.add_argument("--antes-de", type=date.fromisoformat, help="Data de corte explícita (AAAA-MM-DD)")
+    parser.add_argument("--lote", type=int, default=ARQUIVO_LOTE)
+    parser.add_argument("--sem-compactar", action="store_true", help="Não compacta o log de alterações")
+    args = parser.parse_args()
+
+    from crud.alteracao import compactar_alteracoes
+    from db.session import SessionLocal
+    from models.cliente import Cliente  # noqa: F401 (relacionamento de Procedimento)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    antes_de = args.antes_de or data_de_corte(args.anos)
+    with SessionLocal() as db:
+        total = arquivar_procedimentos(db, antes_de, args.lote)
+        compactadas = 0 if args.sem_compactar else compactar_alteracoes(db)
+    print(f"{total} procedimentos anteriores a {antes_de} arquivados em {ARQUIVO_DIR}")
+    if not args.sem_compactar:
+        print(f"{compactadas} entradas superadas removidas do log de alterações")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Índice em memória para o autocompletar de nomes de clientes.
+
+Cada worker mantém os nomes dos clientes ativos (não arquivados) em dois
+arrays ordenados de termos normalizados (sem acento, casefold):
+- o nome inteiro, para "mar" achar "Maria Silva";
+- o nome a partir de cada palavra seguinte, para "sil" achar o mesmo cliente.
+
+A busca é uma busca binária pelo prefixo e lê só os k primeiros termos do
+intervalo, sem consulta ao banco. O índice é carregado na inicialização
+(fase "autocompletar") e atualizado pelo crud: indexar() registra as
+mudanças na transação e elas entram no índice no commit (um rollback as
+descarta). No Postgres as mudanças vão também para os outros workers por
+NOTIFY no canal AUTOCOMPLETAR_CANAL (padrão salao_autocompletar); se a
+conexão de escuta cair, o índice é recarregado ao reconectar.
+"""
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, select, text
+from sqlalchemy.orm import Session
+
+from core.invalidacao import _origem, registrar_canal
+from core.metrics import Gauge
+from core.texto import normalizar
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETAR_CANAL = os.getenv("AUTOCOMPLETAR_CANAL", "salao_autocompletar")
+
+# O payload do NOTIFY tem limite de 8000 bytes; acima disso manda recarregar
+TAMANHO_MAXIMO = 7500
+
+AUTOCOMPLETAR_NOMES = Gauge("autocomplete_index_clients", "Clientes no índice do autocompletar deste worker")
+
+
+def _termos(chave: str) -> Tuple[str, List[str]]:
+    """
+    O nome normalizado e os sufixos que começam nas palavras seguintes.
+    """
+    palavras = chave.split(" ")
+    return chave, [" ".join(palavras[posicao:]) for posicao in range(1, len(palavras))]
+
+
+class IndicePrefixos:
+    """
+    Nomes por prefixo: listas ordenadas de (termo, id) e o nome original de
+    cada id, protegidas por um lock (as buscas são curtas: O(log n + k)).
+    """
+
+    def __init__(self):
+        self._inicio: List[Tuple[str, int]] = []
+        self._palavras: List[Tuple[str, int]] = []
+        self._nomes: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        # Mudanças que chegaram durante um carregar(), reaplicadas no fim
+        self._durante_carga: Optional[Dict[int, Optional[str]]] = None
+        self.pronto = False
+
+    def __len__(self) -> int:
+        return len(self._nomes)
+
+    def carregar(self, nomes: Iterable[Tuple[int, str]]) -> None:
+        with self._lock:
+            self._durante_carga = {}
+        inicio: List[Tuple[str, int]] = []
+        palavras: List[Tuple[str, int]] = []
+        por_id: Dict[int, str] = {}
+        for cliente_id, nome in nomes:
+            chave, sufixos = _termos(normalizar(nome))
+            inicio.append((chave, cliente_id))
+            palavras.extend((sufixo, cliente_id) for sufixo in sufixos)
+            por_id[cliente_id] = nome
+        inicio.sort()
+        palavras.sort()
+
+        with self._lock:
+            self._inicio, self._palavras, self._nomes = inicio, palavras, por_id
+            pendentes, self._durante_carga = self._durante_carga, None
+            for cliente_id, nome in pendentes.items():
+                self._definir(cliente_id, nome)
+            self.pronto = True
+        AUTOCOMPLETAR_NOMES.set(len(self._nomes))
+
+    def definir(self, nomes: Dict[int, Optional[str]]) -> None:
+        """
+        Inclui ou renomeia os clientes; nome None remove do índice.
+        """
+        with self._lock:
+            for cliente_id, nome in nomes.items():
+                if self._durante_carga is not None:
+                    self._durante_carga[cliente_id] = nome
+                self._definir(cliente_id, nome)
+        AUTOCOMPLETAR_NOMES.set(len(self._nomes))
+
+    def _definir(self, cliente_id: int, nome: Optional[str]) -> None:
+        anterior = self._nomes.pop(cliente_id, None)
+        if anterior is not None:
+            chave, sufixos = _termos(normalizar(anterior))
+            _remover(self._inicio, (chave, cliente_id))
+            for sufixo in sufixos:
+                _remover(self._palavras, (sufixo, cliente_id))
+        if nome is not None:
+            chave, sufixos = _termos(normalizar(nome))
+            insort(self._inicio, (chave, cliente_id))
+            for sufixo in sufixos:
+                insort(self._palavras, (sufixo, cliente_id))
+            self._nomes[cliente_id] = nome
+
+    def buscar(self, texto: str, limite: int = 10) -> List[Tuple[int, str]]:
+        """
+        Até `limite` clientes cujo nome, ou alguma palavra do nome a partir
+        dela, começa com `texto`: primeiro os que começam pelo prefixo, depois
+        os que o têm no meio, cada grupo em ordem alfabética.
+        """
+        prefixo = normalizar(texto)
+        if not prefixo or limite <= 0:
+            return []
+        encontrados: Dict[int, str] = {}
+        with self._lock:
+            for termos in (self._inicio, self._palavras):
+                posicao = bisect_left(termos, (prefixo,))
+                while posicao < len(termos) and len(encontrados) < limite:
+                    termo, cliente_id = termos[posicao]
+                    if not termo.startswith(prefixo):
+                        break
+                    encontrados.setdefault(cliente_id, self._nomes[cliente_id])
+                    posicao += 1
+        return list(encontrados.items())
+
+
+def _remover(termos: List[Tuple[str, int]], item: Tuple[str, int]) -> None:
+    posicao = bisect_left(termos, item)
+    if posicao < len(termos) and termos[posicao] == item:
+        del termos[posicao]
+
+
+INDICE = IndicePrefixos()
+
+
+def carregar() -> None:
+    """
+    (Re)carrega o índice com os clientes ativos.
+    """
+    from db.session import SessionLocal
+    from models.cliente import Cliente
+
+    try:
+        with SessionLocal() as db:
+            nomes = db.execute(select(Cliente.id, Cliente.nome).where(Cliente.arquivado_em.is_(None))).all()
+    except Exception as exc:
+        logger.warning("Não foi possível carregar o índice do autocompletar: %s", exc)
+        return
+    INDICE.carregar(nomes)
+
+
+def indexar(db: Session, nomes: Dict[int, Optional[str]]) -> None:
+    """
+    Registra na transação corrente de `db` o nome atual de cada cliente
+    (None: removido ou arquivado). Deve ser chamada antes do commit.
+    """
+    if not nomes:
+        return
+    db.info.setdefault("autocompletar", {}).update(nomes)
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    payload = json.dumps({"origem": _origem(), "nomes": nomes})
+    if len(payload) > TAMANHO_MAXIMO:
+        payload = json.dumps({"origem": _origem(), "recarregar": True})
+    db.execute(text("SELECT pg_notify(:canal, :payload)"), {"canal": AUTOCOMPLETAR_CANAL, "payload": payload})
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_pendentes(db: Session) -> None:
+    nomes = db.info.pop("autocompletar", None)
+    if nomes:
+        INDICE.definir(nomes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendentes(db: Session) -> None:
+    db.info.pop("autocompletar", None)
+
+
+def _receber(payload: str) -> None:
+    """
+    Mudanças de outro worker (NOTIFY); as deste worker já entraram no commit.
+    """
+    try:
+        mensagem = json.loads(payload)
+    except ValueError:
+        return
+    if mensagem.get("origem") == _origem():
+        return
+    if mensagem.get("recarregar"):
+        carregar()
+        return
+    INDICE.definir({int(cliente_id): nome for cliente_id, nome in mensagem.get("nomes", {}).items()})
+
+
+def _ao_reconectar() -> None:
+    # Na primeira conexão a fase de inicialização já carregou o índice
+    if INDICE.pronto:
+        carregar()
+
+
+registrar_canal(AUTOCOMPLETAR_CANAL, _receber, _ao_reconectar)
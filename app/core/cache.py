@@ -0,0 +1,484 @@
+"""
+Cache de entidades usado pelo crud (get_cliente, get_procedimento,
+get_usuario_by_id).
+
+Guarda só os valores das colunas de cada linha, nunca objetos ORM, para que
+uma entrada possa ser reaproveitada em qualquer sessão. O backend é escolhido
+por variável de ambiente:
+- CACHE_BACKEND=memoria (padrão): LRU em processo com TTL, por worker;
+- CACHE_BACKEND=redis: Redis em CACHE_URL, compartilhado entre os workers
+  (em desenvolvimento, o serviço redis do docker-compose);
+- CACHE_BACKEND=desligado: sem cache.
+
+As escritas do crud atualizam ou removem a entrada depois do commit. Com o
+backend em memória e vários workers, os outros workers podem ver o valor
+antigo por até CACHE_TTL_S segundos.
+
+Uma leitura que não acha a linha no cache a busca no banco e a grava em
+seguida; se uma escrita (ou uma invalidação de outro worker) acontecer entre
+as duas, a linha lida já está velha. Por isso cada tipo tem uma geração,
+incrementada por toda escrita e remoção: a leitura guarda a geração antes de
+ir ao banco (geracao()) e a linha só é gravada se ela não mudou
+(preencher()), na mesma operação do backend.
+
+Listagens (get_procedimentos) usam um cache de resultados à parte, com TTL
+curto (CACHE_TTL_LISTAGEM_S) e chave que inclui a geração da tabela: toda
+escrita em procedimentos incrementa a geração, e as listagens antigas deixam
+de ser lidas na hora, sem precisar saber quais filtros elas continham. A
+chave também inclui a origem da leitura (primário ou a réplica): uma réplica
+atrasada lê dados de antes da escrita que incrementou a geração, e o
+resultado dela não pode ser servido a quem lê do primário logo após escrever.
+
+Uma falha do backend nunca derruba a requisição: a leitura cai no banco.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type, TypeVar
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from core.metrics import Counter, Gauge, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memoria")
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_TTL_S = float(os.getenv("CACHE_TTL_S", "60"))
+CACHE_MAX_ITENS = int(os.getenv("CACHE_MAX_ITENS", "10000"))
+CACHE_TTL_LISTAGEM_S = float(os.getenv("CACHE_TTL_LISTAGEM_S", "5"))
+
+CACHE_REQUESTS = Counter("cache_requests_total", "Leituras do cache por resultado", ("cache", "result"))
+CACHE_ERRORS = Counter("cache_errors_total", "Falhas de comunicação com o backend do cache", ("operation",))
+CACHE_ITENS = Gauge("cache_items", "Entradas guardadas no cache em processo")
+
+Modelo = TypeVar("Modelo")
+
+
+class MemoriaBackend:
+    """
+    LRU em processo com expiração por entrada.
+    """
+
+    def __init__(self, max_itens: int = CACHE_MAX_ITENS):
+        self.max_itens = max_itens
+        self._itens: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        # Gerações ficam fora do LRU: se uma fosse descartada e voltasse a
+        # zero, listagens antigas com a mesma geração voltariam a valer
+        self._geracoes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, chave: str) -> Optional[Any]:
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    def _gravar(self, chave: str, valor: Any, ttl: float) -> None:
+        self._itens[chave] = (time.monotonic() + ttl, valor)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.max_itens:
+            self._itens.popitem(last=False)
+
+    def set(self, chave: str, valor: Any, ttl: float) -> None:
+        with self._lock:
+            self._gravar(chave, valor, ttl)
+
+    def set_se_geracao(self, chave: str, valor: Any, ttl: float, chave_geracao: str, geracao: int) -> bool:
+        with self._lock:
+            if self._geracoes.get(chave_geracao, 0) != geracao:
+                return False
+            self._gravar(chave, valor, ttl)
+            return True
+
+    def delete(self, chaves: Iterable[str]) -> None:
+        with self._lock:
+            for chave in chaves:
+                self._itens.pop(chave, None)
+
+    def geracao(self, chave: str) -> int:
+        return self._geracoes.get(chave, 0)
+
+    def incrementar(self, chave: str) -> int:
+        with self._lock:
+            self._geracoes[chave] = self._geracoes.get(chave, 0) + 1
+            return self._geracoes[chave]
+
+    def limpar(self, prefixo: str) -> None:
+        with self._lock:
+            for chave in [chave for chave in self._itens if chave.startswith(prefixo)]:
+                del self._itens[chave]
+            for chave in self._geracoes:
+                if chave.startswith(prefixo):
+                    self._geracoes[chave] += 1
+
+    def tamanho(self) -> int:
+        return len(self._itens)
+
+
+def _codificar(valor: Any) -> Any:
+    if isinstance(valor, datetime):
+        return {"__datetime__": valor.isoformat()}
+    if isinstance(valor, date):
+        return {"__date__": valor.isoformat()}
+    raise TypeError(f"Tipo não suportado no cache: {type(valor).__name__}")
+
+
+def _decodificar(objeto: Dict[str, Any]) -> Any:
+    if "__datetime__" in objeto:
+        return datetime.fromisoformat(objeto["__datetime__"])
+    if "__date__" in objeto:
+        return date.fromisoformat(objeto["__date__"])
+    return objeto
+
+
+# Grava KEYS[1] só se a geração em KEYS[2] ainda for ARGV[3]
+_SET_SE_GERACAO = """
+if tonumber(redis.call('GET', KEYS[2]) or '0') ~= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+return 1
+"""
+
+
+class RedisBackend:
+    """
+    Backend em rede (Redis). Os valores são gravados em JSON, com datas
+    marcadas para voltarem como date/datetime.
+    """
+
+    def __init__(self, url: str = CACHE_URL, cliente=None):
+        if cliente is None:
+            import redis
+
+            cliente = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.cliente = cliente
+        self._set_se_geracao = cliente.register_script(_SET_SE_GERACAO)
+
+    def get(self, chave: str) -> Optional[Any]:
+        bruto = self.cliente.get(chave)
+        if bruto is None:
+            return None
+        return json.loads(bruto, object_hook=_decodificar)
+
+    def set(self, chave: str, valor: Any, ttl: float) -> None:
+        self.cliente.set(chave, json.dumps(valor, default=_codificar), px=int(ttl * 1000))
+
+    def set_se_geracao(self, chave: str, valor: Any, ttl: float, chave_geracao: str, geracao: int) -> bool:
+        return bool(self._set_se_geracao(
+            keys=[chave, chave_geracao],
+            args=[json.dumps(valor, default=_codificar), int(ttl * 1000), geracao],
+        ))
+
+    def delete(self, chaves: Iterable[str]) -> None:
+        chaves = list(chaves)
+        if chaves:
+            self.cliente.delete(*chaves)
+
+    def geracao(self, chave: str) -> int:
+        return int(self.cliente.get(chave) or 0)
+
+    def incrementar(self, chave: str) -> int:
+        return self.cliente.incr(chave)
+
+    def limpar(self, prefixo: str, lote: int = 500) -> None:
+        """
+        Remove as chaves de `prefixo` (o banco do Redis pode ser dividido com
+        outras aplicações) e incrementa as gerações das listagens: apagá-las
+        as faria voltar a zero, e listagens antigas com a geração zero
+        voltariam a valer enquanto não expirassem.
+        """
+        geracoes = f"{prefixo}geracao:".encode()
+        remover, incrementar = [], []
+        for chave in self.cliente.scan_iter(match=f"{prefixo}*", count=lote):
+            chave = chave if isinstance(chave, bytes) else chave.encode()
+            (incrementar if chave.startswith(geracoes) else remover).append(chave)
+            if len(remover) >= lote:
+                self.cliente.unlink(*remover)
+                remover = []
+        if remover:
+            self.cliente.unlink(*remover)
+        if incrementar:
+            pipeline = self.cliente.pipeline(transaction=False)
+            for chave in incrementar:
+                pipeline.incr(chave)
+            pipeline.execute()
+
+    def tamanho(self) -> int:
+        return self.cliente.dbsize()
+
+
+class DesligadoBackend:
+    def get(self, chave: str) -> Optional[Any]:
+        return None
+
+    def set(self, chave: str, valor: Any, ttl: float) -> None:
+        pass
+
+    def set_se_geracao(self, chave: str, valor: Any, ttl: float, chave_geracao: str, geracao: int) -> bool:
+        return False
+
+    def delete(self, chaves: Iterable[str]) -> None:
+        pass
+
+    def geracao(self, chave: str) -> int:
+        return 0
+
+    def incrementar(self, chave: str) -> int:
+        return 0
+
+    def limpar(self, prefixo: str) -> None:
+        pass
+
+    def tamanho(self) -> int:
+        return 0
+
+
+def criar_backend(nome: str = CACHE_BACKEND):
+    if nome == "memoria":
+        return MemoriaBackend()
+    if nome == "redis":
+        return RedisBackend()
+    if nome == "desligado":
+        return DesligadoBackend()
+    raise ValueError(f"CACHE_BACKEND inválido: {nome}")
+
+
+class CacheEntidades:
+    """
+    Cache de linhas por (tipo, id), com contagem de acertos por tipo.
+    """
+
+    def __init__(self, backend, ttl: float = CACHE_TTL_S, prefixo: str = "salao:"):
+        self.backend = backend
+        self.ttl = ttl
+        self.prefixo = prefixo
+
+    def _chave(self, tipo: str, id_: int) -> str:
+        return f"{self.prefixo}{tipo}:{id_}"
+
+    def _chave_geracao(self, tipo: str) -> str:
+        return f"{self.prefixo}geracao:entidade:{tipo}"
+
+    def _nova_geracao(self, tipo: str) -> None:
+        self.backend.incrementar(self._chave_geracao(tipo))
+
+    def get(self, tipo: str, id_: int) -> Optional[Dict[str, Any]]:
+        try:
+            valor = self.backend.get(self._chave(tipo, id_))
+        except Exception as exc:
+            CACHE_ERRORS.inc(operation="get")
+            logger.warning("Falha ao ler do cache: %s", exc)
+            valor = None
+        CACHE_REQUESTS.inc(cache=tipo, result="miss" if valor is None else "hit")
+        return None if valor is None else dict(valor)
+
+    def set(self, tipo: str, id_: int, valor: Dict[str, Any]) -> None:
+        """
+        Grava a linha escrita pelo crud (depois do commit).
+        """
+        self.set_varios(tipo, {id_: valor})
+
+    def set_varios(self, tipo: str, valores: Dict[int, Dict[str, Any]]) -> None:
+        """
+        Grava as linhas escritas pelo crud, por id, com um só incremento da
+        geração do tipo.
+        """
+        try:
+            self._nova_geracao(tipo)
+            for id_, valor in valores.items():
+                self.backend.set(self._chave(tipo, id_), valor, self.ttl)
+        except Exception as exc:
+            CACHE_ERRORS.inc(operation="set")
+            logger.warning("Falha ao gravar no cache: %s", exc)
+            # Sem a geração nova, uma leitura em curso ainda pode gravar a
+            # linha antiga: melhor não deixar nenhuma
+            self.delete(tipo, *valores)
+
+    def geracao(self, tipo: str) -> Optional[int]:
+        """
+        Geração atual do tipo, lida antes de buscar uma linha no banco para
+        depois passá-la a preencher(); None se o backend falhar.
+        """
+        try:
+            return self.backend.geracao(self._chave_geracao(tipo))
+        except Exception as exc:
+            CACHE_ERRORS.inc(operation="geracao")
+            logger.warning("Falha ao ler a geração de %s: %s", tipo, exc)
+            return None
+
+    def preencher(
+        self, tipo: str, id_: int, valor: Dict[str, Any], geracao: Optional[int], ttl: Optional[float] = None
+    ) -> None:
+        """
+        Grava uma linha lida do banco, só se nenhuma escrita do tipo
+        aconteceu desde que `geracao` foi lida.
+        """
+        if geracao is None:
+            return
+        try:
+            self.backend.set_se_geracao(
+                self._chave(tipo, id_), valor, self.ttl if ttl is None else ttl, self._chave_geracao(tipo), geracao
+            )
+        except Exception as exc:
+            CACHE_ERRORS.inc(operation="set")
+            logger.warning("Falha ao gravar no cache: %s", exc)
+
+    def ttl_leitura(self, db: Session) -> Optional[float]:
+        """
+        TTL para guardar uma linha lida em `db`. Linhas lidas de uma réplica
+        podem estar atrasadas em relação a uma escrita recente, então ficam
+        só pelo TTL curto das listagens.
+        """
+        return min(self.ttl, CACHE_TTL_LISTAGEM_S) if db.info.get("replica") else None
+
+    def delete(self, tipo: str, *ids: int) -> None:
+        try:
+            self._nova_geracao(tipo)
+            self.backend.delete(self._chave(tipo, id_) for id_ in ids)
+        except Exception as exc:
+            CACHE_ERRORS.inc(operation="delete")
+            logger.warning("Falha ao invalidar o cache (%s %s): %s", tipo, ids, exc)
+
+    def limpar(self) -> None:
+        """
+        Remove as entidades e as listagens deste cache (as chaves do prefixo).
+        """
+        self.backend.limpar(self.prefixo)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """
+        Acertos, faltas e taxa de acerto por tipo desde o início do worker.
+        """
+        por_tipo: Dict[str, Dict[str, float]] = {}
+        for _, labels, valor in CACHE_REQUESTS.amostras():
+            contagem = por_tipo.setdefault(labels["cache"], {"hit": 0, "miss": 0})
+            contagem[labels["result"]] = int(valor)
+        for contagem in por_tipo.values():
+            total = contagem["hit"] + contagem["miss"]
+            contagem["hit_rate"] = round(contagem["hit"] / total, 4) if total else 0.0
+        try:
+            itens = self.backend.tamanho()
+        except Exception:
+            itens = None
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl_s": self.ttl,
+            "itens": itens,
+            "por_tipo": por_tipo,
+        }
+
+
+class CacheListagens:
+    """
+    Cache de resultados de listagens, por tabela e filtros normalizados.
+    A geração da tabela faz parte da chave; nova_geracao() invalida todas as
+    listagens da tabela de uma vez.
+    """
+
+    def __init__(self, backend, ttl: float = CACHE_TTL_LISTAGEM_S, prefixo: str = "salao:"):
+        self.backend = backend
+        self.ttl = ttl
+        self.prefixo = prefixo
+
+    def _chave_geracao(self, tabela: str) -> str:
+        return f"{self.prefixo}geracao:{tabela}"
+
+    def geracao(self, tabela: str) -> Optional[int]:
+        """
+        Geração atual da tabela, ou None se o backend falhar.
+        """
+        try:
+            return self.backend.geracao(self._chave_geracao(tabela))
+        except Exception as exc:
+            CACHE_ERRORS.inc(operation="geracao")
+            logger.warning("Falha ao ler a geração de %s: %s", tabela, exc)
+            return None
+
+    def _chave(self, tabela: str, filtros: Tuple, origem: str) -> Optional[str]:
+        geracao = self.geracao(tabela)
+        if geracao is None:
+            return None
+        resumo = hashlib.sha1(json.dumps(filtros, default=_codificar).encode()).hexdigest()
+        return f"{self.prefixo}lista:{tabela}:{geracao}:{origem}:{resumo}"
+
+    def get(self, db: Session, tabela: str, filtros: Tuple) -> Tuple[Optional[str], Optional[List[Dict[str, Any]]]]:
+        """
+        Retorna (chave, linhas) para uma listagem lida em `db`. A chave deve
+        ser repassada ao set(), para que o resultado seja gravado na geração
+        lida antes da consulta ao banco e na origem (primário ou réplica)
+        de onde ele veio.
+        """
+        chave = self._chave(tabela, filtros, db.info.get("replica") or "primario")
+        valor = None
+        if chave is not None and self.ttl > 0:
+            try:
+                valor = self.backend.get(chave)
+            except Exception as exc:
+                CACHE_ERRORS.inc(operation="get")
+                logger.warning("Falha ao ler do cache: %s", exc)
+        CACHE_REQUESTS.inc(cache=f"{tabela}_listagem", result="miss" if valor is None else "hit")
+        return chave, valor
+
+    def set(self, chave: Optional[str], linhas: List[Dict[str, Any]]) -> None:
+        if chave is None or self.ttl <= 0:
+            return
+        try:
+            self.backend.set(chave, linhas, self.ttl)
+        except Exception as exc:
+            CACHE_ERRORS.inc(operation="set")
+            logger.warning("Falha ao gravar no cache: %s", exc)
+
+    def nova_geracao(self, tabela: str) -> None:
+        try:
+            self.backend.incrementar(self._chave_geracao(tabela))
+        except Exception as exc:
+            CACHE_ERRORS.inc(operation="geracao")
+            logger.warning("Falha ao invalidar as listagens de %s: %s", tabela, exc)
+
+
+CACHE = CacheEntidades(criar_backend())
+LISTAGENS = CacheListagens(CACHE.backend)
+
+
+def coletar_cache() -> None:
+    if isinstance(CACHE.backend, MemoriaBackend):
+        CACHE_ITENS.set(CACHE.backend.tamanho())
+
+
+REGISTRY.registrar_coletor(coletar_cache)
+
+
+def linha(objeto, excluir: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Valores das colunas de um objeto ORM, no formato guardado no cache.
+    Colunas em `excluir` ficam de fora e são carregadas sob demanda.
+    """
+    return {
+        atributo.key: getattr(objeto, atributo.key)
+        for atributo in inspect(objeto).mapper.column_attrs
+        if atributo.key not in excluir
+    }
+
+
+def anexar(db: Session, modelo: Type[Modelo], valores: Dict[str, Any]) -> Modelo:
+    """
+    Monta o objeto ORM a partir de uma entrada do cache e o associa à sessão
+    sem consultar o banco. Relacionamentos continuam carregando sob demanda.
+    """
+    objeto = modelo(**valores)
+    make_transient_to_detached(objeto)
+    return db.merge(objeto, load=False)
@@ -0,0 +1,165 @@
+"""
+Catálogo de tipos de procedimento em memória.
+
+Cada worker guarda o catálogo (tipos_procedimento, poucas dezenas de linhas)
+em dicionários por id e por chave normalizada e o relê a cada
+CATALOGO_TTL_S segundos (padrão 60) ou depois de uma mudança. Assim a
+gravação de um procedimento resolve o tipo sem consulta na maior parte das
+vezes, e os filtros por tipo viram igualdade (ou IN) no id, sem ilike.
+
+Um nome que não está no catálogo é procurado (e, se preciso, criado) na
+transação de quem grava o procedimento, sem abrir outra conexão do pool. O
+catálogo só é relido depois do commit, de forma preguiçosa: um rollback não
+deixa nele um id que não existe. No Postgres o tipo novo vai também para os
+outros workers por NOTIFY no canal CATALOGO_CANAL (padrão salao_catalogo),
+e eles descartam o catálogo na hora, em vez de esperar o TTL; se a conexão
+de escuta cair, o catálogo é descartado ao reconectar.
+
+A releitura usa a sessão de quem chamou quando ela não é de uma réplica
+(uma réplica atrasada devolveria o catálogo sem o tipo novo por mais um
+TTL); senão, uma sessão própria no primário. Numa transação que já achou ou
+criou um tipo fora do catálogo, a releitura espera o commit.
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, select, text
+from sqlalchemy.orm import Session
+
+from core.invalidacao import _origem, registrar_canal
+from core.texto import normalizar
+from models.tipo_procedimento import TipoProcedimento
+
+CATALOGO_TTL_S = float(os.getenv("CATALOGO_TTL_S", "60"))
+CATALOGO_CANAL = os.getenv("CATALOGO_CANAL", "salao_catalogo")
+
+
+def _insert_ignorando_conflito(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(TipoProcedimento)
+
+
+class CatalogoTipos:
+    def __init__(self, ttl: float = CATALOGO_TTL_S):
+        self.ttl = ttl
+        self._por_id: Dict[int, str] = {}
+        self._por_chave: Dict[str, Tuple[int, str]] = {}
+        self._carregado_em: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _atualizar(self, db: Optional[Session] = None, forcar: bool = False) -> None:
+        if not forcar and self._carregado_em is not None and time.monotonic() - self._carregado_em < self.ttl:
+            return
+        if db is not None and db.info.get("catalogo_alterado") and self._carregado_em is not None:
+            # A transação já criou ou achou tipos fora do catálogo; ele é
+            # relido depois do commit, sem outra conexão até lá
+            return
+        consulta = select(TipoProcedimento.id, TipoProcedimento.nome, TipoProcedimento.chave)
+        if db is not None and not db.info.get("catalogo_alterado") and not db.info.get("replica"):
+            linhas = db.execute(consulta).all()
+        else:
+            from db.session import SessionLocal
+
+            with SessionLocal() as sessao:
+                linhas = sessao.execute(consulta).all()
+        with self._lock:
+            self._por_id = {linha.id: linha.nome for linha in linhas}
+            self._por_chave = {linha.chave: (linha.id, linha.nome) for linha in linhas}
+            self._carregado_em = time.monotonic()
+
+    def invalidar(self) -> None:
+        self._carregado_em = None
+
+    def tipos(self) -> List[Tuple[int, str]]:
+        self._atualizar()
+        return sorted(self._por_id.items(), key=lambda item: normalizar(item[1]))
+
+    def nome(self, tipo_id: Optional[int], db: Optional[Session] = None) -> Optional[str]:
+        if tipo_id is None:
+            return None
+        self._atualizar(db)
+        if tipo_id not in self._por_id:
+            self._atualizar(db, forcar=True)
+        return self._por_id.get(tipo_id)
+
+    def ids_contendo(self, texto: str, db: Optional[Session] = None) -> List[int]:
+        """
+        Ids dos tipos cujo nome normalizado contém `texto` normalizado
+        ("colora" acha "Coloração"), procurados no catálogo em memória.
+        """
+        self._atualizar(db)
+        trecho = normalizar(texto)
+        return sorted(tipo_id for chave, (tipo_id, _) in self._por_chave.items() if trecho in chave)
+
+    def resolver(self, db: Session, nome: str) -> Tuple[int, str]:
+        """
+        Retorna (id, nome do catálogo) do tipo `nome`, criando-o na
+        transação de `db` quando ainda não existe.
+        """
+        chave = normalizar(nome)
+        self._atualizar(db)
+        encontrado = self._por_chave.get(chave)
+        if encontrado is not None:
+            return encontrado
+
+        # Fora do catálogo deste worker: criado por outro (que ainda não
+        # chegou aqui) ou novo. O catálogo é relido depois do commit
+        db.info["catalogo_alterado"] = True
+        consulta = select(TipoProcedimento.id, TipoProcedimento.nome).where(TipoProcedimento.chave == chave)
+        existente = db.execute(consulta).one_or_none()
+        if existente is not None:
+            return existente.id, existente.nome
+
+        nome_limpo = " ".join(nome.split())
+        tipo_id = db.execute(
+            _insert_ignorando_conflito(db)
+            .values(nome=nome_limpo, chave=chave)
+            .on_conflict_do_nothing(index_elements=["chave"])
+            .returning(TipoProcedimento.id)
+        ).scalar()
+        if tipo_id is None:
+            # Criado por outra transação nesse meio tempo
+            existente = db.execute(consulta).one()
+            return existente.id, existente.nome
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(
+                text("SELECT pg_notify(:canal, :payload)"),
+                {"canal": CATALOGO_CANAL, "payload": json.dumps({"origem": _origem()})},
+            )
+        return tipo_id, nome_limpo
+
+
+CATALOGO = CatalogoTipos()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_apos_commit(db: Session) -> None:
+    if db.info.pop("catalogo_alterado", False):
+        CATALOGO.invalidar()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar(db: Session) -> None:
+    db.info.pop("catalogo_alterado", None)
+
+
+def _receber(payload: str) -> None:
+    """
+    Tipo novo criado por outro worker (NOTIFY); o deste worker já descartou
+    o catálogo no commit.
+    """
+    try:
+        mensagem = json.loads(payload)
+    except ValueError:
+        return
+    if mensagem.get("origem") != _origem():
+        CATALOGO.invalidar()
+
+
+registrar_canal(CATALOGO_CANAL, _receber, CATALOGO.invalidar)
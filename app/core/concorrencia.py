@@ -0,0 +1,212 @@
+"""
+Limite de concorrência por classe de rota, com descarte de carga.
+
+As rotas são síncronas (def) e dividem o pool de threads do anyio: sem
+limite, logins lentos (bcrypt) ou históricos grandes ocupam as threads e os
+GETs baratos esperam atrás deles até o cliente desistir. O middleware separa
+as requisições em classes, cada uma com seu orçamento:
+- auth: /api/v1/auth/*;
+- upload: POST/PUT com corpo multipart (fotos);
+- leitura: GET e HEAD;
+- escrita: as demais.
+
+Cada classe executa até CONCORRENCIA_<CLASSE>_LIMITE requisições ao mesmo
+tempo; as seguintes esperam vaga em uma fila de até CONCORRENCIA_<CLASSE>_FILA,
+por no máximo CONCORRENCIA_ESPERA_MAXIMA_S segundos. Com a fila cheia (ou a
+espera esgotada) a resposta é 503 com Retry-After na hora, em vez de a
+requisição ficar pendurada ocupando memória e conexão.
+
+O pool de threads tem THREADPOOL_TAMANHO threads (padrão 40, o do anyio),
+configurado na inicialização; a soma dos limites deve caber nele com folga
+para o que roda no pool fora das classes (inicialização, autenticação do feed
+de eventos). Os limites das classes que usam o banco também devem caber no
+pool de conexões, ou as threads só trocam a fila do middleware pela do pool.
+
+Ficam de fora /metrics, /health e o feed de eventos (async, de longa duração
+e com limite próprio, EVENTOS_MAX_ASSINANTES).
+
+Métricas no /metrics: concurrency_limit, concurrency_in_flight,
+concurrency_queue_depth, concurrency_wait_seconds e
+concurrency_rejected_total, por classe.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.metrics import REGISTRY, Counter, Gauge, Histogram
+
+THREADPOOL_TAMANHO = int(os.getenv("THREADPOOL_TAMANHO", "40"))
+CONCORRENCIA_ESPERA_MAXIMA_S = float(os.getenv("CONCORRENCIA_ESPERA_MAXIMA_S", "5"))
+CONCORRENCIA_RETRY_AFTER_S = int(os.getenv("CONCORRENCIA_RETRY_AFTER_S", "2"))
+
+# (limite, fila) padrão de cada classe
+_PADROES = {
+    "auth": (4, 16),
+    "leitura": (16, 64),
+    "escrita": (8, 32),
+    "upload": (2, 4),
+}
+
+CONCORRENCIA_LIMITE = Gauge("concurrency_limit", "Requisições simultâneas permitidas por classe de rota", ("classe",))
+CONCORRENCIA_EM_EXECUCAO = Gauge("concurrency_in_flight", "Requisições em execução por classe de rota", ("classe",))
+CONCORRENCIA_FILA = Gauge("concurrency_queue_depth", "Requisições esperando vaga por classe de rota", ("classe",))
+CONCORRENCIA_ESPERA = Histogram(
+    "concurrency_wait_seconds", "Tempo de espera por uma vaga na classe de rota", ("classe",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+CONCORRENCIA_REJEITADAS = Counter(
+    "concurrency_rejected_total", "Requisições recusadas com 503 por classe de rota e motivo", ("classe", "motivo")
+)
+
+
+class Orcamento:
+    """
+    Vagas de uma classe de rota. Só é usado de dentro do event loop (sem
+    lock): quem sai passa a vaga direto para o primeiro da fila.
+    """
+
+    def __init__(self, classe: str, limite: int, fila: int):
+        self.classe = classe
+        self.limite = limite
+        self.fila = fila
+        self.em_execucao = 0
+        self._esperando: Deque[asyncio.Future] = deque()
+
+    @property
+    def aguardando(self) -> int:
+        return len(self._esperando)
+
+    async def entrar(self, espera_maxima: float) -> Optional[str]:
+        """
+        Ocupa uma vaga. Retorna None com a vaga ocupada, ou o motivo da
+        recusa ("fila_cheia" ou "espera_esgotada").
+        """
+        if self.em_execucao < self.limite and not self._esperando:
+            self.em_execucao += 1
+            return None
+        if len(self._esperando) >= self.fila:
+            return "fila_cheia"
+
+        vaga = asyncio.get_running_loop().create_future()
+        self._esperando.append(vaga)
+        try:
+            await asyncio.wait_for(vaga, espera_maxima)
+        except asyncio.TimeoutError:
+            # sair() pode ter tirado a vaga da fila enquanto o wait_for a cancelava
+            if vaga in self._esperando:
+                self._esperando.remove(vaga)
+            return "espera_esgotada"
+        except BaseException:
+            # Cliente desconectou: a vaga pode ter chegado junto com o cancelamento
+            if vaga.done() and not vaga.cancelled():
+                self.sair()
+            elif vaga in self._esperando:
+                self._esperando.remove(vaga)
+            raise
+        return None
+
+    def sair(self) -> None:
+        while self._esperando:
+            vaga = self._esperando.popleft()
+            if not vaga.done():
+                vaga.set_result(None)
+                return
+        self.em_execucao -= 1
+
+
+def _orcamentos() -> Dict[str, Orcamento]:
+    orcamentos = {}
+    for classe, (limite, fila) in _PADROES.items():
+        prefixo = f"CONCORRENCIA_{classe.upper()}"
+        orcamentos[classe] = Orcamento(
+            classe,
+            int(os.getenv(f"{prefixo}_LIMITE", str(limite))),
+            int(os.getenv(f"{prefixo}_FILA", str(fila))),
+        )
+    return orcamentos
+
+
+ORCAMENTOS = _orcamentos()
+
+
+def classificar(scope: Scope) -> str:
+    """
+    Classe da requisição, só pelo método, caminho e Content-Type (o
+    middleware roda antes do roteamento).
+    """
+    if scope.get("path", "").startswith("/api/v1/auth"):
+        return "auth"
+    metodo = scope.get("method", "")
+    if metodo in ("GET", "HEAD"):
+        return "leitura"
+    if metodo in ("POST", "PUT"):
+        for nome, valor in scope.get("headers", []):
+            if nome == b"content-type" and valor.startswith(b"multipart/form-data"):
+                return "upload"
+    return "escrita"
+
+
+def configurar_threadpool(tamanho: int = THREADPOOL_TAMANHO) -> None:
+    """
+    Ajusta o pool de threads das rotas síncronas. Deve ser chamada de dentro
+    do event loop (o limitador padrão do anyio é por loop).
+    """
+    from anyio import to_thread
+
+    to_thread.current_default_thread_limiter().total_tokens = tamanho
+
+
+def coletar_concorrencia() -> None:
+    for orcamento in ORCAMENTOS.values():
+        CONCORRENCIA_LIMITE.set(orcamento.limite, classe=orcamento.classe)
+        CONCORRENCIA_EM_EXECUCAO.set(orcamento.em_execucao, classe=orcamento.classe)
+        CONCORRENCIA_FILA.set(orcamento.aguardando, classe=orcamento.classe)
+
+
+REGISTRY.registrar_coletor(coletar_concorrencia)
+
+
+class ConcorrenciaMiddleware:
+    """
+    Middleware ASGI que aplica os orçamentos por classe de rota e responde
+    503 com Retry-After quando a classe está saturada.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        ignorar: Optional[Iterable[str]] = ("/metrics", "/health", "/api/v1/eventos/"),
+        espera_maxima: float = CONCORRENCIA_ESPERA_MAXIMA_S
+    ):
+        self.app = app
+        self.ignorar = set(ignorar or ())
+        self.espera_maxima = espera_maxima
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope.get("path") in self.ignorar:
+            await self.app(scope, receive, send)
+            return
+
+        orcamento = ORCAMENTOS[classificar(scope)]
+        inicio = time.perf_counter()
+        motivo = await orcamento.entrar(self.espera_maxima)
+        CONCORRENCIA_ESPERA.observe(time.perf_counter() - inicio, classe=orcamento.classe)
+        if motivo is not None:
+            CONCORRENCIA_REJEITADAS.inc(classe=orcamento.classe, motivo=motivo)
+            resposta = JSONResponse(
+                status_code=503,
+                content={"detail": "Servidor ocupado. Tente novamente em instantes."},
+                headers={"Retry-After": str(CONCORRENCIA_RETRY_AFTER_S)},
+            )
+            await resposta(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            orcamento.sair()
@@ -1,21 +1,101 @@
-from fastapi import Depends, HTTPException, status
+import os
+import threading
+import time
+
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Dict, Optional
 
-from db.session import SessionLocal
+from db.session import SessionLocal, escolher_replica
+from core.metrics import DB_ROTEAMENTO
+from core.registros import identificar_usuario
 from core.security import decode_access_token
 from crud.auth import get_usuario_by_id
 from models.usuario import Usuario
 
 bearer_scheme = HTTPBearer()
 
+# Depois de uma escrita, as leituras do mesmo usuário ficam no primário por
+# esta janela (read-your-writes), cobrindo o atraso das réplicas
+REPLICA_JANELA_S = float(os.getenv("REPLICA_JANELA_S", "5"))
+COOKIE_PRIMARIO = "salao_primario"
+
+# usuario_id -> instante (time.time) até quando ler do primário, neste worker
+_escritas_recentes: Dict[int, float] = {}
+_escritas_lock = threading.Lock()
+
+
+def _usuario_do_token(request: Request) -> Optional[int]:
+    """
+    ID do usuário do token Bearer, sem consultar o banco (None se não houver).
+    """
+    autorizacao = request.headers.get("authorization", "")
+    if not autorizacao.lower().startswith("bearer "):
+        return None
+    payload = decode_access_token(autorizacao[7:])
+    return payload.get("id") if payload else None
+
+
+def _marcar_escrita(request: Request, response: Response) -> None:
+    ate = time.time() + REPLICA_JANELA_S
+    # O cookie cobre os outros workers; o registro por usuário, clientes sem cookies
+    response.set_cookie(COOKIE_PRIMARIO, f"{ate:.3f}", max_age=int(REPLICA_JANELA_S) + 1, httponly=True)
+    usuario_id = _usuario_do_token(request)
+    if usuario_id is not None:
+        with _escritas_lock:
+            _escritas_recentes[usuario_id] = ate
+            agora = time.time()
+            for chave in [chave for chave, valor in _escritas_recentes.items() if valor < agora]:
+                del _escritas_recentes[chave]
+
+
+def _escreveu_recentemente(request: Request) -> bool:
+    try:
+        if float(request.cookies.get(COOKIE_PRIMARIO, 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+    usuario_id = _usuario_do_token(request)
+    return usuario_id is not None and _escritas_recentes.get(usuario_id, 0) > time.time()
+
 
-def get_db():
+def get_db(request: Request, response: Response):
     """
-    Dependency para obter uma sessão do banco de dados.
+    Dependency para obter uma sessão do banco de dados (primário).
+    Um commit feito na sessão manda as próximas leituras do usuário para o
+    primário por REPLICA_JANELA_S segundos.
     """
     db = SessionLocal()
+    event.listen(db, "after_commit", lambda _: _marcar_escrita(request, response))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_db_leitura(request: Request):
+    """
+    Dependency para rotas somente leitura: usa uma réplica saudável quando
+    houver (DATABASE_REPLICA_URLS) e cai no primário se não houver réplica,
+    se a conexão com ela falhar ou logo após uma escrita do mesmo usuário.
+    """
+    replica = None if _escreveu_recentemente(request) else escolher_replica()
+    db = None
+    if replica is not None:
+        db = replica.sessao()
+        try:
+            db.connection()
+            DB_ROTEAMENTO.inc(destino="replica")
+        except OperationalError:
+            replica.marcar_falha()
+            db.close()
+            db = None
+    if db is None:
+        db = SessionLocal()
+        DB_ROTEAMENTO.inc(destino="primario")
     try:
         yield db
     finally:
@@ -61,7 +141,9 @@ def get_current_user(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Usuário inativo. Contate o administrador.",
             )
-        
+
+        # Usuário do log de acesso e da auditoria (core/registros.py)
+        identificar_usuario(usuario.id, usuario.username)
         return usuario
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -0,0 +1,286 @@
+"""
+Detecção de clientes duplicados ("Maria Silva" cadastrada duas vezes).
+
+Comparar todos os nomes entre si é O(n²): 100 mil clientes dariam 5 bilhões
+de pares. O job compara só nomes que caem no mesmo bloco:
+- os nomes são normalizados (sem acento, casefold) e perdem as partículas
+  (da, de, do, dos, das, e), de modo que "Maria da Silva" e "maria silva"
+  ficam iguais;
+- cada par de palavras do nome gera chaves de bloco, sem depender da ordem
+  (o que também junta nomes com as palavras trocadas ou com uma palavra a
+  mais, "Maria Silva Santos"):
+  - as duas palavras inteiras ("maria|silva");
+  - uma palavra inteira e a outra sem uma das letras ("maria|oiveira" sai
+    de "Maria Oliveira" e de "Maria Oiveira"): um erro de digitação
+    (letra trocada, a mais, a menos ou invertida) em uma das palavras cai
+    no mesmo bloco. Nesses blocos só se comparam nomes em que a palavra
+    original é diferente (os iguais já se encontram no bloco anterior),
+    então eles custam pouco;
+  - o esqueleto de consoantes das duas ("mr|slv": sem as vogais depois da
+    primeira letra, com s/z/ç, i/y e letras dobradas unificados), para
+    erros de vogal nas duas palavras ("Mraia Slva");
+  nomes de uma palavra só usam as chaves dela;
+- dentro do bloco, os trigramas de caracteres descartam rápido os pares
+  muito diferentes (Jaccard abaixo de FILTRO_TRIGRAMAS); nos que sobram, a
+  similaridade compara palavra a palavra: cada palavra de um nome com a mais
+  parecida do outro (1 - distância de edição / tamanho, com a inversão de
+  duas letras vizinhas contando como um erro), na média e nos
+  dois sentidos. Assim um erro de digitação ("Maria Slva", 0.9) pesa menos
+  que um nome diferente ("Carla Lima" x "Carlos Lima", 0.83).
+
+Blocos maiores que DUPLICADOS_BLOCO_MAXIMO (nomes muito comuns) não são
+comparados par a par: os nomes são ordenados e cada um é comparado só com os
+DUPLICADOS_JANELA seguintes (vizinhança ordenada).
+
+Os pares com similaridade a partir de DUPLICADOS_SIMILARIDADE (padrão 0.85)
+vão para a tabela clientes_duplicados, onde a recepção os mescla
+(POST /api/v1/clientes/{id}/mesclar) ou descarta; pares descartados não
+voltam a ser sugeridos. Clientes arquivados ficam de fora.
+
+Execução (cron, uma vez por dia):
+    cd app && python -m core.duplicados
+"""
+import argparse
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from functools import lru_cache
+from itertools import combinations, islice
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Set, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from core.texto import normalizar
+from models.cliente import Cliente
+from models.cliente_duplicado import ClienteDuplicado
+
+logger = logging.getLogger(__name__)
+
+DUPLICADOS_SIMILARIDADE = float(os.getenv("DUPLICADOS_SIMILARIDADE", "0.85"))
+DUPLICADOS_BLOCO_MAXIMO = int(os.getenv("DUPLICADOS_BLOCO_MAXIMO", "200"))
+DUPLICADOS_JANELA = int(os.getenv("DUPLICADOS_JANELA", "10"))
+
+PARTICULAS = frozenset({"da", "das", "de", "do", "dos", "e"})
+# Palavras usadas nas chaves de bloco (as primeiras do nome)
+PALAVRAS_CHAVE = 4
+TAMANHO_LOTE = 5000
+FILTRO_TRIGRAMAS = 0.4
+
+
+def palavras(nome: str) -> List[str]:
+    return [palavra for palavra in normalizar(nome).split(" ") if palavra and palavra not in PARTICULAS]
+
+
+_SONS = [
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"h"), ""),
+    (re.compile(r"c(?=[ei])|z"), "s"),
+    (re.compile(r"[kq]"), "c"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"y"), "i"),
+]
+_VOGAIS = re.compile(r"(?<=.)[aeiou]")
+_DOBRADAS = re.compile(r"(.)\1+")
+
+
+def esqueleto(palavra: str) -> str:
+    """
+    Consoantes da palavra normalizada, com a primeira letra: "silva" e
+    "slva" dão "slv", "souza" e "sousa" dão "s".
+    """
+    for padrao, troca in _SONS:
+        palavra = padrao.sub(troca, palavra)
+    return _DOBRADAS.sub(r"\1", _VOGAIS.sub("", palavra))
+
+
+def _sem_uma_letra(palavra: str) -> Set[str]:
+    return {palavra} | {palavra[:posicao] + palavra[posicao + 1:] for posicao in range(len(palavra))}
+
+
+def chaves_de_bloco(termos: List[str]) -> Dict[str, str]:
+    """
+    Chaves de bloco do nome, cada uma com a palavra que gerou a variante
+    ("" nas chaves em que todos do bloco são comparados entre si).
+    """
+    termos = termos[:PALAVRAS_CHAVE]
+    esqueletos = [esqueleto(termo) for termo in termos]
+    if len(termos) == 1:
+        chaves = {f"d:{variante}": termos[0] for variante in _sem_uma_letra(termos[0])}
+        chaves[f"e:{esqueletos[0]}"] = ""
+        return chaves
+    chaves = {"e:" + "|".join(sorted(par)): "" for par in combinations(esqueletos, 2)}
+    for a, b in combinations(termos, 2):
+        chaves["x:" + "|".join(sorted((a, b)))] = ""
+        for fixa, outra in ((a, b), (b, a)):
+            for variante in _sem_uma_letra(outra):
+                chaves[f"d:{fixa}|{variante}"] = outra
+    return chaves
+
+
+def trigramas(texto: str) -> FrozenSet[str]:
+    # Espaços nas pontas: o começo e o fim do nome também contam
+    marcado = f"  {texto} "
+    return frozenset(marcado[posicao:posicao + 3] for posicao in range(len(marcado) - 2))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    comuns = len(a & b)
+    return comuns / (len(a) + len(b) - comuns)
+
+
+def _distancia(a: str, b: str) -> int:
+    """
+    Distância de edição (inserção, remoção ou troca de uma letra, ou inversão
+    de duas vizinhas).
+    """
+    antes_anterior: List[int] = []
+    anterior = list(range(len(b) + 1))
+    for linha in range(1, len(a) + 1):
+        atual = [linha]
+        for coluna in range(1, len(b) + 1):
+            custo = min(anterior[coluna] + 1, atual[coluna - 1] + 1, anterior[coluna - 1] + (a[linha - 1] != b[coluna - 1]))
+            if linha > 1 and coluna > 1 and a[linha - 1] == b[coluna - 2] and a[linha - 2] == b[coluna - 1]:
+                custo = min(custo, antes_anterior[coluna - 2] + 1)
+            atual.append(custo)
+        antes_anterior, anterior = anterior, atual
+    return anterior[-1]
+
+
+# Nomes e sobrenomes se repetem muito: a mesma dupla de palavras aparece em
+# milhares de pares de nomes
+@lru_cache(maxsize=200000)
+def _parecida(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    return 1 - _distancia(a, b) / max(len(a), len(b))
+
+
+def similaridade(a: List[str], b: List[str]) -> float:
+    """
+    Similaridade (0 a 1) entre dois nomes já separados em palavras.
+    """
+    matriz = [[_parecida(palavra, outra) for outra in b] for palavra in a]
+    de_a = sum(map(max, matriz)) / len(a)
+    de_b = sum(map(max, zip(*matriz))) / len(b)
+    return (de_a + de_b) / 2
+
+
+def _candidatos(membros: List[Tuple[str, str]], bloco_maximo: int, janela: int) -> Iterator[Tuple[str, str]]:
+    if len(membros) <= bloco_maximo:
+        pares = combinations(membros, 2)
+    else:
+        ordenados = sorted(membros)
+        pares = (
+            (membro, vizinho)
+            for posicao, membro in enumerate(ordenados)
+            for vizinho in islice(ordenados, posicao + 1, posicao + 1 + janela)
+        )
+    for (a, palavra_a), (b, palavra_b) in pares:
+        if not palavra_a or palavra_a != palavra_b:
+            yield a, b
+
+
+def detectar(
+    nomes: Iterable[Tuple[int, str]],
+    minimo: float = DUPLICADOS_SIMILARIDADE,
+    bloco_maximo: int = DUPLICADOS_BLOCO_MAXIMO,
+    janela: int = DUPLICADOS_JANELA
+) -> List[Tuple[int, int, float]]:
+    """
+    Pares (menor id, maior id, similaridade) com similaridade >= `minimo`,
+    do mais parecido para o menos.
+
+    Só nomes normalizados distintos são comparados. Clientes com o mesmo
+    nome formam um grupo, ligado pelo menor id: cada um vira um par com ele
+    (k - 1 pares, não k²), e dois grupos parecidos são ligados pelos
+    menores ids. Mesclar pelos pares sugeridos junta o grupo inteiro.
+    """
+    grupos: Dict[str, List[int]] = defaultdict(list)
+    for cliente_id, nome in nomes:
+        termos = palavras(nome)
+        if termos:
+            grupos[" ".join(termos)].append(cliente_id)
+
+    pares: List[Tuple[int, int, float]] = []
+    blocos: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+    for texto, ids in grupos.items():
+        ids.sort()
+        pares.extend((ids[0], outro, 1.0) for outro in ids[1:])
+        for chave, palavra in chaves_de_bloco(texto.split(" ")).items():
+            blocos[chave].append((texto, palavra))
+
+    # Um par que cai em vários blocos só é comparado uma vez (pelos ids dos
+    # grupos, que são inteiros: o conjunto custa pouco)
+    vistos: Set[int] = set()
+    limite = max((ids[0] for ids in grupos.values()), default=0) + 1
+    grams: Dict[str, FrozenSet[str]] = {}
+    for membros in blocos.values():
+        if len(membros) < 2:
+            continue
+        for a, b in _candidatos(membros, bloco_maximo, janela):
+            primeiro, segundo = sorted((grupos[a][0], grupos[b][0]))
+            par = primeiro * limite + segundo
+            if par in vistos:
+                continue
+            vistos.add(par)
+            if a not in grams:
+                grams[a] = trigramas(a)
+            if b not in grams:
+                grams[b] = trigramas(b)
+            if jaccard(grams[a], grams[b]) < FILTRO_TRIGRAMAS:
+                continue
+            valor = similaridade(a.split(" "), b.split(" "))
+            if valor >= minimo:
+                pares.append((primeiro, segundo, round(valor, 4)))
+    pares.sort(key=lambda par: (-par[2], par[0], par[1]))
+    return pares
+
+
+def detectar_duplicados(db: Session, minimo: float = DUPLICADOS_SIMILARIDADE) -> int:
+    """
+    Recalcula os pares pendentes de clientes_duplicados: remove os que não
+    foram descartados e grava os encontrados agora, menos os descartados.
+    Retorna quantos pares ficaram pendentes.
+    """
+    nomes = db.execute(select(Cliente.id, Cliente.nome).where(Cliente.arquivado_em.is_(None))).all()
+    pares = detectar(nomes, minimo)
+    descartados = set(db.execute(
+        select(ClienteDuplicado.cliente_id, ClienteDuplicado.duplicado_id)
+        .where(ClienteDuplicado.descartado_em.isnot(None))
+    ).tuples().all())
+
+    db.execute(delete(ClienteDuplicado).where(ClienteDuplicado.descartado_em.is_(None)))
+    novos = [
+        {"cliente_id": a, "duplicado_id": b, "similaridade": valor}
+        for a, b, valor in pares
+        if (a, b) not in descartados
+    ]
+    for inicio in range(0, len(novos), TAMANHO_LOTE):
+        db.execute(insert(ClienteDuplicado), novos[inicio:inicio + TAMANHO_LOTE])
+    db.commit()
+    return len(novos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Procura clientes com nomes duplicados")
+    parser.add_argument("--similaridade", type=float, default=DUPLICADOS_SIMILARIDADE,
+                        help="Similaridade mínima (0 a 1) para sugerir o par")
+    args = parser.parse_args()
+
+    from db.session import SessionLocal
+    from models.procedimento import Procedimento  # noqa: F401 (relacionamento de Cliente)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    comeco = time.perf_counter()
+    with SessionLocal() as db:
+        total = detectar_duplicados(db, args.similaridade)
+    print(f"{total} pares de possíveis duplicados em {time.perf_counter() - comeco:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
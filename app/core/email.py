@@ -0,0 +1,65 @@
+"""
+E-mails da aplicação, enviados com o fastapi-mail pelas tarefas em segundo
+plano (core/tarefas.py), nunca na requisição.
+
+Configuração (sem MAIL_SERVER, nenhum e-mail é agendado):
+MAIL_SERVER, MAIL_PORT (padrão 587), MAIL_USERNAME, MAIL_PASSWORD,
+MAIL_FROM, MAIL_FROM_NAME, MAIL_STARTTLS (padrão 1) e MAIL_SSL_TLS (padrão 0).
+"""
+import asyncio
+import os
+from typing import List
+
+MAIL_SERVER = os.getenv("MAIL_SERVER", "")
+EMAIL_ATIVO = bool(MAIL_SERVER)
+
+
+def _configuracao():
+    from fastapi_mail import ConnectionConfig
+
+    usuario = os.getenv("MAIL_USERNAME", "")
+    return ConnectionConfig(
+        MAIL_SERVER=MAIL_SERVER,
+        MAIL_PORT=int(os.getenv("MAIL_PORT", "587")),
+        MAIL_USERNAME=usuario,
+        MAIL_PASSWORD=os.getenv("MAIL_PASSWORD", ""),
+        MAIL_FROM=os.getenv("MAIL_FROM", usuario),
+        MAIL_FROM_NAME=os.getenv("MAIL_FROM_NAME", "Sistema de Salão"),
+        MAIL_STARTTLS=os.getenv("MAIL_STARTTLS", "1") == "1",
+        MAIL_SSL_TLS=os.getenv("MAIL_SSL_TLS", "0") == "1",
+        USE_CREDENTIALS=bool(usuario),
+    )
+
+
+def enviar(destinatarios: List[str], assunto: str, corpo: str) -> None:
+    """
+    Envia um e-mail em texto simples. Uma falha propaga a exceção, para a
+    tarefa tentar de novo.
+    """
+    from fastapi_mail import FastMail, MessageSchema, MessageType
+
+    mensagem = MessageSchema(subject=assunto, recipients=destinatarios, body=corpo, subtype=MessageType.plain)
+    # As tarefas rodam em threads próprias, sem event loop
+    asyncio.run(FastMail(_configuracao()).send_message(mensagem))
+
+
+def enviar_boas_vindas(usuario_id: int) -> None:
+    """
+    E-mail de boas-vindas de um usuário recém-cadastrado (tarefa
+    "email_boas_vindas", agendada pelo cadastro).
+    """
+    from db.session import SessionLocal
+    from models.usuario import Usuario
+
+    with SessionLocal() as db:
+        usuario = db.get(Usuario, usuario_id)
+        if usuario is None or not usuario.is_active:
+            return  # Removido ou desativado antes do envio
+        destinatario, nome, username = usuario.email, usuario.nome_completo or usuario.username, usuario.username
+
+    enviar(
+        [destinatario],
+        "Bem-vindo(a) ao Sistema de Salão",
+        f"Olá, {nome}!\n\nSua conta no Sistema de Salão foi criada. "
+        f"Entre com o usuário {username} ou com este e-mail.\n",
+    )
@@ -0,0 +1,230 @@
+"""
+Feed de alterações (Server-Sent Events) de clientes e procedimentos.
+
+As escritas do crud chamam emitir() antes do commit. Os eventos ficam
+pendentes na sessão e só vão para o hub depois do commit (um rollback os
+descarta). O hub (HUB) faz o fan-out dentro do worker para os assinantes da
+rota GET /api/v1/eventos/, cada um com uma fila limitada e filtros
+opcionais por cliente_id e período (data_procedimento).
+
+Um assinante que não consome a fila a tempo (EVENTOS_FILA_MAX eventos
+pendentes) recebe um evento `reset` e é desconectado. Ao reconectar, o
+cliente deve recarregar o que exibe.
+
+No Postgres os eventos também vão para os outros workers por NOTIFY no canal
+EVENTOS_CANAL (padrão salao_eventos), entregue só se a transação confirmar,
+e cada worker os repassa aos seus assinantes. Uma queda da conexão de escuta
+também gera `reset`.
+"""
+import asyncio
+import json
+import os
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional, Set
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from core.invalidacao import _origem, registrar_canal
+from core.metrics import Counter, Gauge
+
+EVENTOS_FILA_MAX = int(os.getenv("EVENTOS_FILA_MAX", "256"))
+EVENTOS_MAX_ASSINANTES = int(os.getenv("EVENTOS_MAX_ASSINANTES", "10000"))
+EVENTOS_HEARTBEAT_S = float(os.getenv("EVENTOS_HEARTBEAT_S", "15"))
+EVENTOS_CANAL = os.getenv("EVENTOS_CANAL", "salao_eventos")
+
+# O payload do NOTIFY tem limite de 8000 bytes; acima disso vai sem os dados
+TAMANHO_MAXIMO = 7500
+
+EVENTOS_ASSINANTES = Gauge("events_subscribers", "Assinantes conectados ao feed de eventos neste worker")
+EVENTOS_PUBLICADOS = Counter("events_published_total", "Eventos entregues ao hub", ("origem",))
+EVENTOS_DESCONECTADOS = Counter(
+    "events_subscribers_dropped_total", "Assinantes desconectados por não acompanharem o feed"
+)
+
+
+def _serializar(valor: Any) -> str:
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+class Evento:
+    """
+    Uma alteração já formatada como frame SSE, montado uma única vez e
+    compartilhado por todos os assinantes.
+    """
+
+    __slots__ = ("cliente_id", "data", "frame")
+
+    def __init__(self, mensagem: Dict[str, Any]):
+        self.cliente_id: Optional[int] = mensagem.get("cliente_id")
+        data = mensagem.get("data_procedimento")
+        self.data: Optional[date] = date.fromisoformat(data) if isinstance(data, str) else data
+        corpo = json.dumps(mensagem, default=_serializar, ensure_ascii=False)
+        self.frame = f"event: {mensagem['tipo']}.{mensagem['acao']}\ndata: {corpo}\n\n"
+
+
+RESET = 'event: reset\ndata: {"motivo": "recarregue os dados"}\n\n'
+
+
+class Assinante:
+    """
+    Uma conexão SSE: fila limitada e filtros. Vive no event loop do worker.
+    """
+
+    def __init__(
+        self,
+        cliente_id: Optional[int] = None,
+        data_inicio: Optional[date] = None,
+        data_fim: Optional[date] = None,
+        tamanho: int = EVENTOS_FILA_MAX,
+    ):
+        self.cliente_id = cliente_id
+        self.data_inicio = data_inicio
+        self.data_fim = data_fim
+        self.fila: asyncio.Queue = asyncio.Queue(tamanho)
+
+    def aceita(self, evento: Evento) -> bool:
+        if self.cliente_id is not None and evento.cliente_id != self.cliente_id:
+            return False
+        if evento.data is not None:
+            if self.data_inicio and evento.data < self.data_inicio:
+                return False
+            if self.data_fim and evento.data > self.data_fim:
+                return False
+        return True
+
+    def resetar(self) -> None:
+        """
+        Troca o que estiver pendente por um único `reset`.
+        """
+        while not self.fila.empty():
+            self.fila.get_nowait()
+        self.fila.put_nowait(RESET)
+
+
+class HubEventos:
+    """
+    Fan-out em memória. publicar() pode ser chamada de qualquer thread (as
+    rotas síncronas rodam no threadpool): a distribuição acontece no event
+    loop, com uma única chamada por evento, qualquer que seja o número de
+    assinantes.
+    """
+
+    def __init__(self):
+        self._assinantes: Set[Assinante] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def assinar(self, assinante: Assinante) -> bool:
+        """
+        Registra o assinante (chamada de dentro do event loop). Retorna
+        False quando o worker já está no limite de assinantes.
+        """
+        with self._lock:
+            if len(self._assinantes) >= EVENTOS_MAX_ASSINANTES:
+                return False
+            self._loop = asyncio.get_running_loop()
+            self._assinantes.add(assinante)
+            EVENTOS_ASSINANTES.set(len(self._assinantes))
+        return True
+
+    def cancelar(self, assinante: Assinante) -> None:
+        with self._lock:
+            self._assinantes.discard(assinante)
+            EVENTOS_ASSINANTES.set(len(self._assinantes))
+
+    def __len__(self) -> int:
+        return len(self._assinantes)
+
+    def publicar(self, evento: Optional[Evento]) -> None:
+        """
+        Entrega o evento aos assinantes interessados; None manda `reset` a todos.
+        """
+        loop = self._loop
+        if loop is None or not self._assinantes:
+            return
+        try:
+            loop.call_soon_threadsafe(self._distribuir, evento)
+        except RuntimeError:
+            pass  # loop encerrado (worker desligando)
+
+    def _distribuir(self, evento: Optional[Evento]) -> None:
+        descartados = []
+        for assinante in list(self._assinantes):
+            if evento is None:
+                assinante.resetar()
+                continue
+            if not assinante.aceita(evento):
+                continue
+            try:
+                assinante.fila.put_nowait(evento.frame)
+            except asyncio.QueueFull:
+                assinante.resetar()
+                descartados.append(assinante)
+        for assinante in descartados:
+            self.cancelar(assinante)
+            EVENTOS_DESCONECTADOS.inc()
+
+
+HUB = HubEventos()
+
+
+def emitir(db: Session, tipo: str, acao: str, registros: Iterable[Dict[str, Any]]) -> None:
+    """
+    Registra eventos `tipo`.`acao` (criado, atualizado, removido) na
+    transação corrente de `db`, um por registro. Deve ser chamada antes do
+    commit; cada registro precisa de "id" e, em procedimentos, de
+    "cliente_id" e "data_procedimento".
+    """
+    mensagens = []
+    for registro in registros:
+        mensagem = {"tipo": tipo, "acao": acao, "id": registro["id"]}
+        mensagem["cliente_id"] = registro["id"] if tipo == "cliente" else registro.get("cliente_id")
+        if "data_procedimento" in registro:
+            mensagem["data_procedimento"] = registro["data_procedimento"]
+        if acao != "removido":
+            mensagem["dados"] = registro
+        mensagens.append(mensagem)
+    if not mensagens:
+        return
+
+    db.info.setdefault("eventos", []).extend(mensagens)
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for mensagem in mensagens:
+        payload = json.dumps({**mensagem, "origem": _origem()}, default=_serializar)
+        if len(payload) > TAMANHO_MAXIMO:
+            payload = json.dumps({**mensagem, "origem": _origem(), "dados": None}, default=_serializar)
+        db.execute(text("SELECT pg_notify(:canal, :payload)"), {"canal": EVENTOS_CANAL, "payload": payload})
+
+
+@event.listens_for(Session, "after_commit")
+def _entregar_pendentes(db: Session) -> None:
+    for mensagem in db.info.pop("eventos", ()):
+        HUB.publicar(Evento(mensagem))
+        EVENTOS_PUBLICADOS.inc(origem="local")
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendentes(db: Session) -> None:
+    db.info.pop("eventos", None)
+
+
+def _receber(payload: str) -> None:
+    """
+    Evento de outro worker (NOTIFY); os deste worker já saíram no commit.
+    """
+    try:
+        mensagem = json.loads(payload)
+    except ValueError:
+        return
+    if mensagem.pop("origem", None) == _origem():
+        return
+    HUB.publicar(Evento(mensagem))
+    EVENTOS_PUBLICADOS.inc(origem="remoto")
+
+
+registrar_canal(EVENTOS_CANAL, _receber, lambda: HUB.publicar(None))
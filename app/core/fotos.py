@@ -0,0 +1,30 @@
+"""
+Arquivos de foto dos clientes.
+"""
+import logging
+import os
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def remover_fotos(caminhos: Iterable[Optional[str]]) -> None:
+    """
+    Apaga arquivos de foto que deixaram de ser usados (cliente removido,
+    foto trocada ou descartada na mesclagem). Roda como tarefa em segundo
+    plano (core/tarefas.py), depois do commit; arquivo já apagado não é
+    erro, e uma falha em algum arquivo faz a tarefa tentar de novo.
+    """
+    falhas = []
+    for caminho in caminhos:
+        if not caminho:
+            continue
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            logger.warning("Não foi possível remover a foto %s: %s", caminho, exc)
+            falhas.append(caminho)
+    if falhas:
+        raise OSError(f"Fotos não removidas: {', '.join(falhas)}")
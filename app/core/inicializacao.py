@@ -0,0 +1,104 @@
+"""
+Inicialização e encerramento dos workers (lifespan do FastAPI).
+
+O que antes rodava na importação dos módulos (criação de diretórios,
+create_all, model_rebuild) fica aqui, medido por fase no gauge
+startup_duration_seconds do /metrics:
+- threadpool: ajusta o pool de threads das rotas síncronas
+  (THREADPOOL_TAMANHO, ver core/concorrencia.py);
+- diretorios: cria o diretório de uploads;
+- pool_db: abre STARTUP_AQUECER_POOL conexões (padrão 2) com SELECT 1;
+- caches: importa os módulos carregados sob demanda (jose, bcrypt) quando
+  STARTUP_AQUECER_CACHES=1, trocando inicialização mais lenta por uma
+  primeira requisição de login mais rápida;
+- invalidacao: sobe o ouvinte LISTEN/NOTIFY do cache (core/invalidacao.py);
+- particoes: garante as partições mensais futuras de procedimentos e agenda
+  a manutenção periódica (db/particionamento.py; só Postgres particionado);
+- autocompletar: carrega o índice de nomes de clientes (core/autocompletar.py);
+- registros: sobe as threads do log de acesso e da auditoria
+  (core/registros.py), que gravam o que sobrou na fila no encerramento;
+- tarefas: sobe as threads que executam as tarefas em segundo plano
+  (core/tarefas.py), que terminam a tarefa em curso no encerramento.
+
+Falhas no aquecimento do banco não impedem o worker de subir: a conexão é
+refeita na primeira requisição.
+"""
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+
+from core.autocompletar import carregar as carregar_autocompletar
+from core.concorrencia import configurar_threadpool
+from core.invalidacao import iniciar_ouvinte, parar_ouvinte
+from core.metrics import STARTUP_DURATION
+from core.registros import iniciar_registros, parar_registros
+from core.tarefas import iniciar_tarefas, parar_tarefas
+from db.particionamento import iniciar_manutencao, parar_manutencao
+
+logger = logging.getLogger(__name__)
+
+AQUECER_POOL = int(os.getenv("STARTUP_AQUECER_POOL", "2"))
+AQUECER_CACHES = os.getenv("STARTUP_AQUECER_CACHES", "0") == "1"
+
+
+def _criar_diretorios() -> None:
+    from v1.cliente import UPLOAD_DIR
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+
+def _aquecer_pool() -> None:
+    from db.session import aquecer_pool
+
+    if AQUECER_POOL <= 0:
+        return
+    try:
+        aquecer_pool(AQUECER_POOL)
+    except Exception as exc:
+        logger.warning("Não foi possível aquecer o pool do banco: %s", exc)
+
+
+def _aquecer_caches() -> None:
+    if not AQUECER_CACHES:
+        return
+    import bcrypt  # noqa: F401
+    from core.security import _jose
+
+    _jose()
+
+
+async def _fase(nome: str, funcao) -> None:
+    inicio = time.perf_counter()
+    await run_in_threadpool(funcao)
+    STARTUP_DURATION.set(time.perf_counter() - inicio, fase=nome)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    inicio = time.perf_counter()
+    # No event loop: o limitador de threads do anyio é por loop
+    configurar_threadpool()
+    await _fase("diretorios", _criar_diretorios)
+    await _fase("pool_db", _aquecer_pool)
+    await _fase("caches", _aquecer_caches)
+    await _fase("invalidacao", iniciar_ouvinte)
+    await _fase("particoes", iniciar_manutencao)
+    await _fase("autocompletar", carregar_autocompletar)
+    await _fase("registros", iniciar_registros)
+    await _fase("tarefas", iniciar_tarefas)
+    STARTUP_DURATION.set(time.perf_counter() - inicio, fase="total")
+
+    yield
+
+    from db.session import engine
+
+    parar_ouvinte()
+    parar_manutencao()
+    parar_tarefas()
+    parar_registros()
+
+    engine.dispose()
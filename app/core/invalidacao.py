@@ -0,0 +1,228 @@
+"""
+Barramento de invalidação do cache entre workers via LISTEN/NOTIFY do Postgres.
+
+Com CACHE_BACKEND=memoria cada worker tem o seu cache, e uma escrita feita
+em um worker não chega aos caches dos outros. As escritas do crud publicam o
+que mudaram com pg_notify dentro da própria transação, então a mensagem só é
+entregue se o commit acontecer. Cada worker mantém uma conexão dedicada em
+LISTEN (thread em segundo plano) e aplica as mensagens dos outros: remove as
+entidades citadas e avança a geração das listagens das tabelas alteradas.
+
+Se a conexão de escuta cair, mensagens podem ter sido perdidas: ao reconectar
+o cache local é esvaziado.
+
+Configuração:
+- CACHE_INVALIDACAO=auto (padrão): liga com backend em memória e Postgres;
+  1 força, 0 desliga. Com Redis o cache já é compartilhado.
+- CACHE_CANAL: canal do NOTIFY (padrão salao_cache).
+
+Alterações feitas direto no banco (scripts SQL) podem avisar os workers com:
+    SELECT pg_notify('salao_cache', '{"tipo": "usuario", "ids": [1]}');
+
+A mesma conexão de escuta atende outros canais registrados com
+registrar_canal() (o feed de eventos de core/eventos.py usa um).
+"""
+import json
+import logging
+import os
+import re
+import select
+import socket
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.cache import CACHE, CACHE_BACKEND, LISTAGENS
+from core.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+CACHE_INVALIDACAO = os.getenv("CACHE_INVALIDACAO", "auto")
+CACHE_CANAL = os.getenv("CACHE_CANAL", "salao_cache")
+
+# O payload do NOTIFY tem limite de 8000 bytes; acima disso manda limpar tudo
+TAMANHO_MAXIMO = 7500
+
+INVALIDACOES = Counter(
+    "cache_invalidation_messages_total", "Mensagens do barramento de invalidação", ("direction",)
+)
+OUVINTE_CONECTADO = Gauge("cache_invalidation_listener_up", "Conexão LISTEN do barramento ativa (1) ou não (0)")
+
+# canal -> (tratador de cada payload, função chamada a cada (re)conexão)
+Canais = Dict[str, Tuple[Callable[[str], None], Callable[[], None]]]
+_canais: Canais = {}
+
+
+def _validar_canal(canal: str) -> None:
+    if not re.fullmatch(r"[a-z_][a-z0-9_]*", canal):
+        raise ValueError(f"Canal de NOTIFY inválido: {canal}")
+
+
+_validar_canal(CACHE_CANAL)
+
+
+def registrar_canal(canal: str, tratador: Callable[[str], None], ao_conectar: Callable[[], None]) -> None:
+    """
+    Inclui um canal na conexão de escuta do worker (Postgres). `ao_conectar`
+    roda a cada (re)conexão, já que o que chegou sem LISTEN foi perdido.
+    """
+    _validar_canal(canal)
+    _canais[canal] = (tratador, ao_conectar)
+
+
+def _origem() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def habilitado(dialeto: str) -> bool:
+    if CACHE_INVALIDACAO == "0":
+        return False
+    if CACHE_INVALIDACAO == "1":
+        return dialeto == "postgresql"
+    return dialeto == "postgresql" and CACHE_BACKEND == "memoria"
+
+
+def publicar(db: Session, tipo: str, ids: Iterable[int] = (), tabelas: Iterable[str] = ()) -> None:
+    """
+    Publica a invalidação na transação corrente de `db`. Deve ser chamada
+    antes do commit: o Postgres só entrega o NOTIFY quando ele acontece.
+    """
+    if not habilitado(db.get_bind().dialect.name):
+        return
+    mensagem: Dict[str, Any] = {"origem": _origem(), "tipo": tipo, "ids": list(ids), "tabelas": list(tabelas)}
+    payload = json.dumps(mensagem)
+    if len(payload) > TAMANHO_MAXIMO:
+        payload = json.dumps({"origem": mensagem["origem"], "limpar": True})
+    db.execute(text("SELECT pg_notify(:canal, :payload)"), {"canal": CACHE_CANAL, "payload": payload})
+    INVALIDACOES.inc(direction="published")
+
+
+def aplicar(payload: str) -> None:
+    """
+    Aplica no cache local uma mensagem recebida. As do próprio worker são
+    ignoradas, porque o crud já atualizou o cache antes de publicar.
+    """
+    try:
+        mensagem = json.loads(payload)
+    except ValueError:
+        logger.warning("Mensagem de invalidação inválida: %r", payload)
+        return
+    if mensagem.get("origem") == _origem():
+        return
+
+    INVALIDACOES.inc(direction="received")
+    if mensagem.get("limpar"):
+        CACHE.limpar()
+        return
+    if mensagem.get("tipo") and mensagem.get("ids"):
+        CACHE.delete(mensagem["tipo"], *mensagem["ids"])
+    for tabela in mensagem.get("tabelas", ()):
+        LISTAGENS.nova_geracao(tabela)
+
+
+class OuvinteInvalidacao(threading.Thread):
+    """
+    Mantém uma conexão em LISTEN nos canais e entrega cada mensagem ao
+    tratador do canal, reconectando com espera crescente quando a conexão cai.
+    """
+
+    def __init__(self, engine, canais: Canais, espera_maxima: float = 30.0):
+        super().__init__(daemon=True, name="ouvinte-invalidacao")
+        self.engine = engine
+        self.canais = canais
+        self.espera_maxima = espera_maxima
+        self._parar = threading.Event()
+
+    def parar(self) -> None:
+        self._parar.set()
+
+    def run(self):
+        espera = 1.0
+        while not self._parar.is_set():
+            try:
+                self._escutar()
+                espera = 1.0
+            except Exception as exc:
+                logger.warning("Ouvinte de invalidação desconectado: %s", exc)
+            finally:
+                OUVINTE_CONECTADO.set(0)
+            if self._parar.wait(espera):
+                break
+            espera = min(espera * 2, self.espera_maxima)
+
+    def _escutar(self) -> None:
+        # Conexão fora do pool: fica presa ao LISTEN pela vida do worker
+        conexao = self.engine.raw_connection()
+        conexao.detach()
+        driver = conexao.driver_connection
+        try:
+            driver.autocommit = True
+            cursor = driver.cursor()
+            for canal in self.canais:
+                cursor.execute(f"LISTEN {canal}")
+
+            # O que chegou enquanto não havia LISTEN foi perdido
+            for _, ao_conectar in self.canais.values():
+                ao_conectar()
+            OUVINTE_CONECTADO.set(1)
+
+            if hasattr(driver, "poll"):
+                self._laco_psycopg2(driver)
+            else:
+                self._laco_psycopg(driver)
+        finally:
+            try:
+                driver.close()
+            except Exception:
+                pass
+
+    def _laco_psycopg2(self, driver) -> None:
+        while not self._parar.is_set():
+            if select.select([driver], [], [], 1.0) == ([], [], []):
+                continue
+            driver.poll()
+            while driver.notifies:
+                self._entregar(driver.notifies.pop(0))
+
+    def _laco_psycopg(self, driver) -> None:
+        while not self._parar.is_set():
+            for notificacao in driver.notifies(timeout=1.0):
+                self._entregar(notificacao)
+
+    def _entregar(self, notificacao) -> None:
+        tratador, _ = self.canais.get(notificacao.channel, (None, None))
+        if tratador is not None:
+            tratador(notificacao.payload)
+
+
+_ouvinte: Optional[OuvinteInvalidacao] = None
+
+
+def iniciar_ouvinte() -> bool:
+    """
+    Sobe o ouvinte deste worker se o barramento estiver habilitado ou houver
+    outros canais registrados (só no Postgres).
+    """
+    global _ouvinte
+    from db.session import engine
+
+    if _ouvinte is not None or engine.dialect.name != "postgresql":
+        return False
+    canais = dict(_canais)
+    if habilitado(engine.dialect.name):
+        canais[CACHE_CANAL] = (aplicar, CACHE.limpar)
+    if not canais:
+        return False
+    _ouvinte = OuvinteInvalidacao(engine, canais)
+    _ouvinte.start()
+    return True
+
+
+def parar_ouvinte() -> None:
+    global _ouvinte
+    if _ouvinte is not None:
+        _ouvinte.parar()
+        _ouvinte.join(timeout=5)
+        _ouvinte = None
@@ -0,0 +1,310 @@
+"""
+Diagnóstico de memória para administradores.
+
+Controla o tracemalloc, guarda snapshots nomeados para comparação, mostra
+os locais de alocação que mais cresceram em cada rota e conta os objetos ORM
+vivos nas sessões.
+
+Com o tracemalloc ativo, o middleware compara um snapshot tirado antes de
+uma requisição com um tirado depois e acumula a diferença por rota e por
+traceback. Tirar e comparar snapshots custa caro (proporcional ao que está
+rastreado, segundos com o heap aquecido): MEMORIA_ROTAS_AMOSTRA define a
+fração das requisições medidas (padrão 1%), cada worker mede no máximo uma
+de cada vez, e os snapshots e a comparação rodam no pool de threads, fora
+do event loop.
+"""
+import gc
+import itertools
+import os
+import random
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import Counter as Contador
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.metrics import nome_da_rota
+
+MEMORIA_MAX_SNAPSHOTS = int(os.getenv("MEMORIA_MAX_SNAPSHOTS", "5"))
+MEMORIA_ROTAS_AMOSTRA = float(os.getenv("MEMORIA_ROTAS_AMOSTRA", "0.01"))
+# Locais guardados por rota (os de maior crescimento acumulado)
+MEMORIA_LOCAIS_POR_ROTA = int(os.getenv("MEMORIA_LOCAIS_POR_ROTA", "50"))
+
+# Ignora as alocações do próprio tracemalloc e do mecanismo de import
+_FILTROS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+_lock = threading.Lock()
+# Ocupado enquanto uma requisição é medida: uma por worker, para que as
+# diferenças de duas medições não se somem
+_medindo = threading.Lock()
+_snapshots: "OrderedDict[str, Dict]" = OrderedDict()
+_sequencia = itertools.count(1)
+# rota -> [requisições medidas, bytes líquidos acumulados, maior crescimento em uma requisição]
+_por_rota: Dict[str, List[float]] = {}
+# rota -> traceback -> [diferença de bytes, diferença de blocos] acumuladas
+_locais_por_rota: Dict[str, Dict[Tuple[str, ...], List[int]]] = {}
+# Sessões abertas desde a importação; saem sozinhas quando são coletadas
+_sessoes: "weakref.WeakSet[Session]" = weakref.WeakSet()
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _registrar_sessao(sessao: Session, transacao) -> None:
+    _sessoes.add(sessao)
+
+
+def rss_bytes() -> Optional[int]:
+    """
+    Memória residente atual do processo (Linux), ou o pico via getrusage.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as arquivo:
+            for linha in arquivo:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def iniciar(nframes: int = 10) -> None:
+    if tracemalloc.is_tracing():
+        raise ValueError("O tracemalloc já está ativo")
+    with _lock:
+        _por_rota.clear()
+        _locais_por_rota.clear()
+    tracemalloc.start(nframes)
+
+
+def parar() -> None:
+    """
+    Para o tracemalloc e descarta os snapshots (que dependem do rastreamento).
+    """
+    if not tracemalloc.is_tracing():
+        raise ValueError("O tracemalloc não está ativo")
+    tracemalloc.stop()
+    with _lock:
+        _snapshots.clear()
+
+
+def status() -> Dict:
+    ativo = tracemalloc.is_tracing()
+    atual, pico = tracemalloc.get_traced_memory() if ativo else (0, 0)
+    with _lock:
+        snapshots = [
+            {"id": snapshot_id, "rotulo": dados["rotulo"], "criado_em": dados["criado_em"]}
+            for snapshot_id, dados in _snapshots.items()
+        ]
+    return {
+        "tracemalloc_ativo": ativo,
+        "nframes": tracemalloc.get_traceback_limit() if ativo else None,
+        "memoria_rastreada_bytes": atual,
+        "pico_rastreado_bytes": pico,
+        "rss_bytes": rss_bytes(),
+        "snapshots": snapshots,
+    }
+
+
+def _snapshot_filtrado() -> tracemalloc.Snapshot:
+    if not tracemalloc.is_tracing():
+        raise ValueError("O tracemalloc não está ativo. Inicie-o antes de tirar snapshots.")
+    return tracemalloc.take_snapshot().filter_traces(_FILTROS)
+
+
+def tirar_snapshot(rotulo: Optional[str] = None) -> str:
+    """
+    Tira um snapshot e o guarda para comparações futuras.
+    Mantém apenas os MEMORIA_MAX_SNAPSHOTS mais recentes.
+    """
+    snapshot = _snapshot_filtrado()
+    snapshot_id = str(next(_sequencia))
+    with _lock:
+        _snapshots[snapshot_id] = {
+            "rotulo": rotulo or f"snapshot-{snapshot_id}",
+            "criado_em": time.time(),
+            "rss_bytes": rss_bytes(),
+            "snapshot": snapshot,
+        }
+        while len(_snapshots) > MEMORIA_MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return snapshot_id
+
+
+def _formatar_traceback(traceback: tracemalloc.Traceback) -> List[str]:
+    return [f"{frame.filename}:{frame.lineno}" for frame in traceback]
+
+
+def top_alocacoes(agrupar: str = "lineno", limite: int = 25) -> List[Dict]:
+    """
+    Locais com mais memória alocada e ainda viva no momento.
+    """
+    estatisticas = _snapshot_filtrado().statistics(agrupar)
+    return [
+        {
+            "local": _formatar_traceback(estatistica.traceback),
+            "bytes": estatistica.size,
+            "blocos": estatistica.count,
+        }
+        for estatistica in estatisticas[:limite]
+    ]
+
+
+def comparar(base_id: str, atual_id: Optional[str] = None, agrupar: str = "lineno", limite: int = 25) -> Dict:
+    """
+    Diferença entre dois snapshots guardados (ou entre um snapshot e o estado atual).
+    """
+    with _lock:
+        base = _snapshots.get(base_id)
+        atual = _snapshots.get(atual_id) if atual_id else None
+    if base is None or (atual_id and atual is None):
+        raise KeyError("Snapshot não encontrado")
+    snapshot_atual = atual["snapshot"] if atual else _snapshot_filtrado()
+
+    diferencas = snapshot_atual.compare_to(base["snapshot"], agrupar)
+    return {
+        "base": base_id,
+        "atual": atual_id or "agora",
+        "diferenca_total_bytes": sum(item.size_diff for item in diferencas),
+        "diferenca_rss_bytes": ((atual["rss_bytes"] if atual else rss_bytes()) or 0) - (base["rss_bytes"] or 0),
+        "locais": [
+            {
+                "local": _formatar_traceback(item.traceback),
+                "diferenca_bytes": item.size_diff,
+                "bytes": item.size,
+                "diferenca_blocos": item.count_diff,
+            }
+            for item in diferencas[:limite]
+        ],
+    }
+
+
+def _acumular(rota: str, antes: tracemalloc.Snapshot, depois: tracemalloc.Snapshot) -> None:
+    diferencas = [item for item in depois.compare_to(antes, "traceback") if item.size_diff or item.count_diff]
+    crescimento = sum(item.size_diff for item in diferencas)
+    with _lock:
+        valores = _por_rota.setdefault(rota, [0, 0, 0])
+        valores[0] += 1
+        valores[1] += crescimento
+        valores[2] = max(valores[2], crescimento)
+
+        locais = _locais_por_rota.setdefault(rota, {})
+        for item in diferencas:
+            chave = tuple(_formatar_traceback(item.traceback))
+            acumulado = locais.setdefault(chave, [0, 0])
+            acumulado[0] += item.size_diff
+            acumulado[1] += item.count_diff
+        if len(locais) > 2 * MEMORIA_LOCAIS_POR_ROTA:
+            maiores = sorted(locais.items(), key=lambda local: abs(local[1][0]), reverse=True)
+            _locais_por_rota[rota] = dict(maiores[:MEMORIA_LOCAIS_POR_ROTA])
+
+
+def _medir(rota: str, antes: tracemalloc.Snapshot) -> None:
+    if tracemalloc.is_tracing():
+        _acumular(rota, antes, _snapshot_filtrado())
+
+
+def crescimento_por_rota(limite: int = 50, locais: int = 10) -> List[Dict]:
+    """
+    Memória líquida retida após as requisições medidas de cada rota desde o
+    início do rastreamento, com os `locais` de alocação que mais cresceram.
+    Com requisições simultâneas as diferenças se misturam; use como indicativo.
+    """
+    with _lock:
+        itens = [
+            (rota, list(valores), sorted(_locais_por_rota.get(rota, {}).items(), key=lambda local: local[1][0], reverse=True))
+            for rota, valores in _por_rota.items()
+        ]
+    itens.sort(key=lambda item: item[1][1], reverse=True)
+    return [
+        {
+            "rota": rota,
+            "requisicoes": int(requisicoes),
+            "bytes_retidos": int(retidos),
+            "media_bytes_retidos": int(retidos / requisicoes) if requisicoes else 0,
+            "maior_crescimento_bytes": int(maior),
+            "locais": [
+                {"local": list(local), "diferenca_bytes": diferenca, "diferenca_blocos": blocos}
+                for local, (diferenca, blocos) in maiores[:locais]
+            ],
+        }
+        for rota, (requisicoes, retidos, maior), maiores in itens[:limite]
+    ]
+
+
+def objetos_orm(incluir_gc: bool = False) -> Dict:
+    """
+    Conta os objetos nos identity maps das sessões vivas, por modelo.
+    Com incluir_gc=True também conta todas as instâncias de modelos vivas no
+    processo (inclusive objetos desanexados que ficaram referenciados), o que
+    percorre o heap inteiro e é lento.
+    """
+    from db.base import Base
+
+    sessoes = list(_sessoes)
+    por_modelo: Contador = Contador()
+    for sessao in sessoes:
+        for objeto in list(sessao.identity_map.values()):
+            por_modelo[type(objeto).__name__] += 1
+
+    resultado = {
+        "sessoes_vivas": len(sessoes),
+        "identity_map": dict(por_modelo),
+    }
+
+    if incluir_gc:
+        instancias: Contador = Contador()
+        for objeto in gc.get_objects():
+            if isinstance(objeto, Base):
+                instancias[type(objeto).__name__] += 1
+        resultado["instancias_vivas"] = dict(instancias)
+    return resultado
+
+
+class MemoriaMiddleware:
+    """
+    Middleware ASGI que acumula, por rota, a memória retida após as
+    requisições amostradas e os locais onde ela foi alocada, enquanto o
+    tracemalloc estiver ativo. Sem rastreamento o custo é uma chamada.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not tracemalloc.is_tracing()
+            or random.random() >= MEMORIA_ROTAS_AMOSTRA
+            or not _medindo.acquire(blocking=False)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            try:
+                antes = await run_in_threadpool(_snapshot_filtrado)
+            except ValueError:
+                # Rastreamento parado nesse meio tempo
+                antes = None
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                if antes is not None:
+                    await run_in_threadpool(_medir, f"{scope.get('method', '')} {nome_da_rota(scope)}", antes)
+        finally:
+            _medindo.release()
@@ -0,0 +1,331 @@
+"""
+Métricas da aplicação no formato texto do Prometheus.
+
+Implementação mínima (contadores, gauges e histogramas) sem dependências
+externas, exposta pelo endpoint /metrics em main.py.
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# Buckets padrão do cliente oficial do Prometheus (em segundos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    partes = [f'{nome}="{_escapar(str(valor))}"' for nome, valor in labels.items()]
+    return "{" + ",".join(partes) + "}"
+
+
+def _formatar_valor(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class Registry:
+    """
+    Conjunto de métricas registradas, renderizadas juntas no /metrics.
+    """
+
+    def __init__(self):
+        self._metricas: List["_Metric"] = []
+        self._coletores: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def registrar(self, metrica: "_Metric") -> None:
+        with self._lock:
+            self._metricas.append(metrica)
+
+    def registrar_coletor(self, coletor: Callable[[], None]) -> None:
+        """
+        Registra uma função chamada antes de cada renderização, usada para
+        atualizar gauges que refletem estado (pool do banco, caches, etc).
+        """
+        with self._lock:
+            self._coletores.append(coletor)
+
+    def render(self) -> str:
+        for coletor in list(self._coletores):
+            try:
+                coletor()
+            except Exception:
+                pass  # Um coletor com erro não deve derrubar o /metrics
+
+        linhas: List[str] = []
+        for metrica in list(self._metricas):
+            linhas.append(f"# HELP {metrica.nome} {metrica.descricao}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            for sufixo, labels, valor in metrica.amostras():
+                linhas.append(f"{metrica.nome}{sufixo}{_formatar_labels(labels)} {_formatar_valor(valor)}")
+        return "\n".join(linhas) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    tipo = "untyped"
+
+    def __init__(self, nome: str, descricao: str, labelnames: Iterable[str] = (), registry: Registry = REGISTRY):
+        self.nome = nome
+        self.descricao = descricao
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._lock = threading.Lock()
+        registry.registrar(self)
+
+    def _chave(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(nome, "")) for nome in self.labelnames)
+
+    def _labels(self, chave: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, chave))
+
+
+class Counter(_Metric):
+    tipo = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0.0}
+
+    def inc(self, valor: float = 1.0, **labels) -> None:
+        chave = self._chave(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0.0) + valor
+
+    def valor(self, **labels) -> float:
+        return self._valores.get(self._chave(labels), 0.0)
+
+    def amostras(self):
+        with self._lock:
+            itens = list(self._valores.items())
+        return [("", self._labels(chave), valor) for chave, valor in itens]
+
+
+class Gauge(_Metric):
+    tipo = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0.0}
+
+    def set(self, valor: float, **labels) -> None:
+        chave = self._chave(labels)
+        with self._lock:
+            self._valores[chave] = float(valor)
+
+    def inc(self, valor: float = 1.0, **labels) -> None:
+        chave = self._chave(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0.0) + valor
+
+    def dec(self, valor: float = 1.0, **labels) -> None:
+        self.inc(-valor, **labels)
+
+    def valor(self, **labels) -> float:
+        return self._valores.get(self._chave(labels), 0.0)
+
+    def amostras(self):
+        with self._lock:
+            itens = list(self._valores.items())
+        return [("", self._labels(chave), valor) for chave, valor in itens]
+
+
+class Histogram(_Metric):
+    tipo = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # chave -> [contagens por bucket..., soma, total]
+        self._valores: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, valor: float, **labels) -> None:
+        chave = self._chave(labels)
+        with self._lock:
+            serie = self._valores.get(chave)
+            if serie is None:
+                serie = [0.0] * (len(self.buckets) + 2)
+                self._valores[chave] = serie
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+                    break
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def time(self, **labels) -> "_Cronometro":
+        """
+        Context manager que observa a duração do bloco em segundos.
+        """
+        return _Cronometro(self, labels)
+
+    def amostras(self):
+        with self._lock:
+            itens = [(chave, list(serie)) for chave, serie in self._valores.items()]
+        resultado = []
+        for chave, serie in itens:
+            labels = self._labels(chave)
+            acumulado = 0.0
+            for i, limite in enumerate(self.buckets):
+                acumulado += serie[i]
+                resultado.append(("_bucket", {**labels, "le": _formatar_valor(limite)}, acumulado))
+            resultado.append(("_sum", labels, serie[-2]))
+            resultado.append(("_count", labels, serie[-1]))
+        return resultado
+
+
+class _Cronometro:
+    def __init__(self, histograma: Histogram, labels: Dict[str, str]):
+        self._histograma = histograma
+        self._labels = labels
+        self._inicio = 0.0
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histograma.observe(time.perf_counter() - self._inicio, **self._labels)
+        return False
+
+
+# Métricas HTTP
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Total de requisições HTTP por rota", ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP por rota", ("method", "route")
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requisições HTTP em andamento")
+
+# Pool de threads usado pelas rotas síncronas
+THREADPOOL_TOTAL = Gauge("threadpool_tokens_total", "Tamanho do pool de threads das rotas síncronas")
+THREADPOOL_EM_USO = Gauge("threadpool_tokens_borrowed", "Threads do pool em uso")
+THREADPOOL_AGUARDANDO = Gauge("threadpool_tasks_waiting", "Tarefas aguardando uma thread livre")
+
+# Pool de conexões do banco
+DB_POOL = Gauge("db_pool_connections", "Conexões do pool do banco por estado", ("state",))
+
+# Réplicas de leitura
+DB_ROTEAMENTO = Counter("db_read_sessions_total", "Sessões de leitura por destino (replica/primario)", ("destino",))
+DB_REPLICA_UP = Gauge("db_replica_up", "Réplica de leitura saudável (1) ou fora do rodízio (0)", ("replica",))
+DB_REPLICA_ATRASO = Gauge("db_replica_lag_seconds", "Atraso de replicação medido na última verificação", ("replica",))
+
+# Operações específicas
+BCRYPT_DURATION = Histogram(
+    "bcrypt_duration_seconds", "Tempo gasto em hash/verificação bcrypt", ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0),
+)
+PHOTO_BYTES_SERVED = Counter("photo_bytes_served_total", "Bytes de fotos de clientes servidos")
+STARTUP_DURATION = Gauge("startup_duration_seconds", "Duração de cada fase da inicialização do worker", ("fase",))
+
+
+def coletar_threadpool() -> None:
+    """
+    Atualiza os gauges do pool de threads do anyio.
+    Deve ser chamada de dentro do event loop (rota async).
+    """
+    from anyio import to_thread
+
+    limiter = to_thread.current_default_thread_limiter()
+    THREADPOOL_TOTAL.set(limiter.total_tokens)
+    THREADPOOL_EM_USO.set(limiter.borrowed_tokens)
+    THREADPOOL_AGUARDANDO.set(limiter.statistics().tasks_waiting)
+
+
+def coletar_pool_db() -> None:
+    """
+    Atualiza os gauges do pool de conexões do SQLAlchemy.
+    """
+    from db.session import engine
+
+    pool = engine.pool
+    for estado, metodo in (("size", "size"), ("checked_in", "checkedin"),
+                           ("checked_out", "checkedout"), ("overflow", "overflow")):
+        funcao = getattr(pool, metodo, None)
+        if funcao is not None:
+            DB_POOL.set(funcao(), state=estado)
+
+
+REGISTRY.registrar_coletor(coletar_pool_db)
+
+
+def coletar_replicas() -> None:
+    """
+    Atualiza os gauges com o último estado conhecido de cada réplica.
+    """
+    from db.session import replicas
+
+    for replica in replicas:
+        DB_REPLICA_UP.set(1 if replica.saudavel else 0, replica=replica.nome)
+        DB_REPLICA_ATRASO.set(replica.atraso_s, replica=replica.nome)
+
+
+REGISTRY.registrar_coletor(coletar_replicas)
+
+
+def nome_da_rota(scope: Scope) -> str:
+    """
+    Retorna o template da rota (ex: /api/v1/clientes/{cliente_id}) para evitar
+    uma série por ID. Requisições sem rota correspondente são agrupadas.
+    """
+    route = scope.get("route")
+    caminho = getattr(route, "path", None)
+    if not caminho:
+        return "unmatched"
+
+    # Versões recentes do FastAPI guardam o prefixo do include_router fora da rota
+    estado = scope.get("fastapi")
+    incluido = estado.get("included_router") if isinstance(estado, dict) else None
+    prefixo = getattr(getattr(incluido, "include_context", None), "prefix", "") or ""
+    if prefixo and not caminho.startswith(prefixo):
+        caminho = prefixo + caminho
+    return caminho
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mede contagem, latência e requisições em andamento por rota.
+    """
+
+    def __init__(self, app: ASGIApp, ignorar: Optional[Iterable[str]] = ("/metrics",)):
+        self.app = app
+        self.ignorar = set(ignorar or ())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope.get("path") in self.ignorar:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        inicio = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            duracao = time.perf_counter() - inicio
+            rota = nome_da_rota(scope)
+            metodo = scope.get("method", "")
+            HTTP_REQUESTS.inc(method=metodo, route=rota, status=str(status_code))
+            HTTP_LATENCY.observe(duracao, method=metodo, route=rota)
@@ -0,0 +1,445 @@
+"""
+Profiling sob demanda para administradores.
+
+Dois modos:
+- Por requisição: o header "X-Profile: 1" (ou ?profile=1) faz aquela requisição
+  ser amostrada. Só é aceito com token de administrador.
+- Contínuo: um amostrador em segundo plano que grava uma janela a cada N segundos.
+
+Os perfis são gravados em PROFILE_DIR como JSON, com rota, número de queries,
+tempo total e as pilhas agregadas (formato "collapsed", usado por flamegraphs).
+"""
+import contextvars
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as ContadorPilhas
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import Counter, nome_da_rota
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles/")
+PROFILE_MAX_ARQUIVOS = int(os.getenv("PROFILE_MAX_ARQUIVOS", "200"))
+PROFILE_INTERVALO_MS = float(os.getenv("PROFILE_INTERVALO_MS", "5"))
+PROFILE_PROFUNDIDADE = 64
+
+# Diretório do código da aplicação: pilhas sem nenhum frame daqui são threads ociosas
+APP_DIR = str(Path(__file__).resolve().parents[1])
+
+_ID_VALIDO = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+
+DB_QUERIES = Counter("db_queries_total", "Total de queries executadas no banco")
+
+
+class PerfilRequisicao:
+    """
+    Estado de uma requisição em profiling, compartilhado com as threads do pool
+    através de contextvars (o anyio copia o contexto para as threads).
+    """
+
+    def __init__(self):
+        self.threads: Set[int] = set()
+        self.queries = 0
+        self.tempo_queries = 0.0
+
+
+_perfil_atual: contextvars.ContextVar[Optional[PerfilRequisicao]] = contextvars.ContextVar(
+    "perfil_atual", default=None
+)
+
+
+# Na classe Engine, e não só no primário: as leituras roteadas para as
+# réplicas (db/session.py) também contam nos perfis e no total de queries
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_da_query(conn, cursor, statement, parameters, context, executemany):
+    DB_QUERIES.inc()
+    perfil = _perfil_atual.get()
+    if perfil is not None:
+        # A thread que executa queries da requisição passa a ser amostrada
+        perfil.threads.add(threading.get_ident())
+        conn.info.setdefault("perfil_inicio_query", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _depois_da_query(conn, cursor, statement, parameters, context, executemany):
+    perfil = _perfil_atual.get()
+    inicios = conn.info.get("perfil_inicio_query")
+    if perfil is not None and inicios:
+        perfil.queries += 1
+        perfil.tempo_queries += time.perf_counter() - inicios.pop()
+
+
+def _formatar_frame(frame) -> str:
+    codigo = frame.f_code
+    arquivo = codigo.co_filename
+    if arquivo.startswith(APP_DIR):
+        arquivo = arquivo[len(APP_DIR) + 1:]
+    else:
+        arquivo = os.path.basename(arquivo)
+    return f"{arquivo}:{codigo.co_name}"
+
+
+def _pilha(frame) -> Optional[str]:
+    """
+    Converte um frame em uma linha "collapsed" (raiz;...;folha).
+    Retorna None quando nenhum frame é do código da aplicação (thread ociosa).
+    """
+    partes: List[str] = []
+    da_aplicacao = False
+    while frame is not None and len(partes) < PROFILE_PROFUNDIDADE:
+        if frame.f_code.co_filename.startswith(APP_DIR):
+            da_aplicacao = True
+        partes.append(_formatar_frame(frame))
+        frame = frame.f_back
+    if not da_aplicacao:
+        return None
+    return ";".join(reversed(partes))
+
+
+class Amostrador(threading.Thread):
+    """
+    Amostrador de pilhas baseado em sys._current_frames().
+    Quando `threads` é informado, só amostra essas threads.
+    """
+
+    def __init__(self, intervalo_ms: float = PROFILE_INTERVALO_MS, threads: Optional[Set[int]] = None):
+        super().__init__(daemon=True, name="amostrador-perfil")
+        self.intervalo = intervalo_ms / 1000.0
+        self.threads = threads
+        self.pilhas: ContadorPilhas = ContadorPilhas()
+        self.amostras = 0
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self):
+        proprio = threading.get_ident()
+        while not self._parar.wait(self.intervalo):
+            self.amostrar(proprio)
+
+    def amostrar(self, ignorar: Optional[int] = None) -> None:
+        for ident, frame in sys._current_frames().items():
+            if ident == ignorar:
+                continue
+            if self.threads is not None and ident not in self.threads:
+                continue
+            linha = _pilha(frame)
+            if linha is None:
+                continue
+            with self._lock:
+                self.pilhas[linha] += 1
+                self.amostras += 1
+
+    def coletar(self) -> Dict[str, int]:
+        """
+        Retorna as pilhas acumuladas e zera o acumulador.
+        """
+        with self._lock:
+            pilhas = dict(self.pilhas)
+            self.pilhas.clear()
+            self.amostras = 0
+        return pilhas
+
+    def parar(self) -> None:
+        self._parar.set()
+        if self.is_alive() and threading.get_ident() != self.ident:
+            self.join(timeout=1)
+
+
+def _top_funcoes(pilhas: Dict[str, int], limite: int = 30) -> List[Dict]:
+    """
+    Calcula amostras próprias (função no topo da pilha) e inclusivas por função.
+    """
+    proprias: ContadorPilhas = ContadorPilhas()
+    inclusivas: ContadorPilhas = ContadorPilhas()
+    for linha, quantidade in pilhas.items():
+        funcoes = linha.split(";")
+        proprias[funcoes[-1]] += quantidade
+        for funcao in set(funcoes):
+            inclusivas[funcao] += quantidade
+    return [
+        {"funcao": funcao, "inclusivas": quantidade, "proprias": proprias.get(funcao, 0)}
+        for funcao, quantidade in inclusivas.most_common(limite)
+    ]
+
+
+def salvar_perfil(dados: Dict) -> str:
+    """
+    Grava um perfil em disco e remove os mais antigos acima do limite.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    perfil_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    dados = {"id": perfil_id, **dados, "top_funcoes": _top_funcoes(dados.get("pilhas", {}))}
+    with open(os.path.join(PROFILE_DIR, f"{perfil_id}.json"), "w", encoding="utf-8") as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False)
+
+    arquivos = sorted(Path(PROFILE_DIR).glob("*.json"))
+    for antigo in arquivos[:-PROFILE_MAX_ARQUIVOS]:
+        try:
+            antigo.unlink()
+        except OSError:
+            pass
+    return perfil_id
+
+
+def carregar_perfil(perfil_id: str) -> Optional[Dict]:
+    if not _ID_VALIDO.match(perfil_id):
+        return None
+    caminho = os.path.join(PROFILE_DIR, f"{perfil_id}.json")
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+def listar_perfis(rota: Optional[str] = None, limite: int = 100) -> List[Dict]:
+    """
+    Lista os perfis gravados (mais recentes primeiro), sem as pilhas.
+    """
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    resultado = []
+    for caminho in sorted(Path(PROFILE_DIR).glob("*.json"), reverse=True):
+        try:
+            with open(caminho, encoding="utf-8") as arquivo:
+                dados = json.load(arquivo)
+        except (OSError, ValueError):
+            continue
+        if rota and dados.get("rota") != rota:
+            continue
+        dados.pop("pilhas", None)
+        dados.pop("top_funcoes", None)
+        resultado.append(dados)
+        if len(resultado) >= limite:
+            break
+    return resultado
+
+
+def comparar_perfis(base: Dict, atual: Dict, limite: int = 30) -> Dict:
+    """
+    Compara dois perfis: tempos, queries e a fração de amostras de cada função.
+    """
+    def fracoes(perfil: Dict) -> Dict[str, float]:
+        total = sum(perfil.get("pilhas", {}).values()) or 1
+        return {item["funcao"]: item["inclusivas"] / total for item in _top_funcoes(perfil.get("pilhas", {}), limite=500)}
+
+    fracoes_base, fracoes_atual = fracoes(base), fracoes(atual)
+    funcoes = set(fracoes_base) | set(fracoes_atual)
+    diferencas = sorted(
+        (
+            {
+                "funcao": funcao,
+                "base": round(fracoes_base.get(funcao, 0.0), 4),
+                "atual": round(fracoes_atual.get(funcao, 0.0), 4),
+                "diferenca": round(fracoes_atual.get(funcao, 0.0) - fracoes_base.get(funcao, 0.0), 4),
+            }
+            for funcao in funcoes
+        ),
+        key=lambda item: abs(item["diferenca"]),
+        reverse=True,
+    )
+    return {
+        "base": base["id"],
+        "atual": atual["id"],
+        "duracao_ms": {"base": base.get("duracao_ms"), "atual": atual.get("duracao_ms")},
+        "queries": {"base": base.get("queries"), "atual": atual.get("queries")},
+        "funcoes": diferencas[:limite],
+    }
+
+
+class AmostradorContinuo:
+    """
+    Modo contínuo: amostra todas as threads e grava um perfil a cada janela.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._amostrador: Optional[Amostrador] = None
+        self._gravador: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+        self.janela_s = 0.0
+        self.intervalo_ms = 0.0
+        self.janelas_gravadas: List[str] = []
+        self._inicio_janela = 0.0
+        self._queries_inicio = 0.0
+
+    @property
+    def ativo(self) -> bool:
+        return self._amostrador is not None
+
+    def iniciar(self, janela_s: float = 60.0, intervalo_ms: float = 10.0) -> None:
+        with self._lock:
+            if self._amostrador is not None:
+                raise ValueError("O amostrador contínuo já está em execução")
+            self.janela_s = janela_s
+            self.intervalo_ms = intervalo_ms
+            self.janelas_gravadas = []
+            self._inicio_janela = time.time()
+            self._queries_inicio = DB_QUERIES.valor()
+            self._parar.clear()
+            self._amostrador = Amostrador(intervalo_ms=intervalo_ms)
+            self._amostrador.start()
+            self._gravador = threading.Thread(target=self._gravar_janelas, daemon=True, name="amostrador-janelas")
+            self._gravador.start()
+
+    def parar(self) -> Optional[str]:
+        """
+        Para o amostrador e grava a janela em andamento.
+        """
+        with self._lock:
+            if self._amostrador is None:
+                return None
+            self._parar.set()
+            self._gravador.join(timeout=self.janela_s + 1)
+            self._amostrador.parar()
+            perfil_id = self._gravar_janela(self._amostrador, self._inicio_janela, self._queries_inicio)
+            self._amostrador = None
+            self._gravador = None
+            return perfil_id
+
+    def status(self) -> Dict:
+        return {
+            "ativo": self.ativo,
+            "janela_s": self.janela_s,
+            "intervalo_ms": self.intervalo_ms,
+            "janelas_gravadas": list(self.janelas_gravadas),
+        }
+
+    def _gravar_janelas(self) -> None:
+        amostrador = self._amostrador
+        while not self._parar.wait(self.janela_s):
+            inicio, queries_inicio = self._inicio_janela, self._queries_inicio
+            self._inicio_janela = time.time()
+            self._queries_inicio = DB_QUERIES.valor()
+            self._gravar_janela(amostrador, inicio, queries_inicio)
+
+    def _gravar_janela(self, amostrador: Amostrador, inicio: float, queries_inicio: float) -> str:
+        pilhas = amostrador.coletar()
+        perfil_id = salvar_perfil({
+            "modo": "continuo",
+            "rota": None,
+            "metodo": None,
+            "inicio": datetime.fromtimestamp(inicio, timezone.utc).isoformat(),
+            "duracao_ms": round((time.time() - inicio) * 1000, 3),
+            "queries": int(DB_QUERIES.valor() - queries_inicio),
+            "intervalo_ms": amostrador.intervalo * 1000,
+            "amostras": sum(pilhas.values()),
+            "pilhas": pilhas,
+        })
+        self.janelas_gravadas.append(perfil_id)
+        return perfil_id
+
+
+AMOSTRADOR_CONTINUO = AmostradorContinuo()
+
+
+def _pedido_de_perfil(scope: Scope) -> bool:
+    for nome, valor in scope.get("headers", []):
+        if nome == b"x-profile" and valor.strip() in (b"1", b"true"):
+            return True
+    query = scope.get("query_string", b"")
+    return any(parte in (b"profile=1", b"profile=true") for parte in query.split(b"&"))
+
+
+def _autorizacao(scope: Scope) -> str:
+    for nome, valor in scope.get("headers", []):
+        if nome == b"authorization":
+            return valor.decode("latin-1")
+    return ""
+
+
+def _eh_admin(authorization: str) -> bool:
+    """
+    Valida o token usando as mesmas dependências das rotas administrativas.
+    """
+    from core.dependencies import get_current_user, get_current_active_admin
+    from db.session import SessionLocal
+
+    esquema, _, token = authorization.partition(" ")
+    if esquema.lower() != "bearer" or not token:
+        return False
+
+    db = SessionLocal()
+    try:
+        usuario = get_current_user(HTTPAuthorizationCredentials(scheme=esquema, credentials=token), db)
+        get_current_active_admin(usuario)
+        return True
+    except HTTPException:
+        return False
+    finally:
+        db.close()
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que executa a requisição sob o amostrador quando solicitado
+    por um administrador. O ID do perfil gravado volta no header X-Profile-Id.
+
+    Observação: a thread que executa as queries da requisição é identificada pelo
+    listener do SQLAlchemy; trechos antes da primeira query não são amostrados.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not _pedido_de_perfil(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not await run_in_threadpool(_eh_admin, _autorizacao(scope)):
+            resposta = JSONResponse(
+                status_code=403,
+                content={"detail": "Acesso negado. Apenas administradores podem solicitar profiling."},
+            )
+            await resposta(scope, receive, send)
+            return
+
+        perfil = PerfilRequisicao()
+        amostrador = Amostrador(threads=perfil.threads)
+        token = _perfil_atual.set(perfil)
+        inicio_relogio = time.time()
+        inicio = time.perf_counter()
+        amostrador.start()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Grava o perfil antes de enviar a resposta para devolver o ID no header
+                amostrador.parar()
+                perfil_id = await run_in_threadpool(salvar_perfil, {
+                    "modo": "requisicao",
+                    "rota": nome_da_rota(scope),
+                    "metodo": scope.get("method"),
+                    "caminho": scope.get("path"),
+                    "status": message["status"],
+                    "inicio": datetime.fromtimestamp(inicio_relogio, timezone.utc).isoformat(),
+                    "duracao_ms": round((time.perf_counter() - inicio) * 1000, 3),
+                    "queries": perfil.queries,
+                    "tempo_queries_ms": round(perfil.tempo_queries * 1000, 3),
+                    "intervalo_ms": amostrador.intervalo * 1000,
+                    "amostras": amostrador.amostras,
+                    "pilhas": amostrador.coletar(),
+                })
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", perfil_id.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            amostrador.parar()
+            _perfil_atual.reset(token)
@@ -0,0 +1,319 @@
+"""
+Log de acesso e trilha de auditoria, gravados fora da requisição.
+
+Gravar um log de forma síncrona soma latência a toda requisição (e, na
+auditoria, uma ida a mais ao banco em cada escrita). Aqui a requisição só põe
+o registro em uma fila limitada; uma thread por destino tira os registros em
+lotes e os grava:
+- acessos: uma linha JSON por requisição (método, rota, status, duração,
+  usuário e id da requisição) em ACESSO_LOG_ARQUIVO (vazio: desligado);
+- auditoria: as escritas em clientes e procedimentos, com o usuário do token,
+  na tabela auditoria, com um INSERT por lote. Os registros são separados na
+  transação da escrita (auditar) e só entram na fila depois do commit.
+
+Cada fila guarda até REGISTROS_FILA_MAX registros. Com ela cheia (o destino
+não acompanha), o registro é descartado e contado em
+log_records_dropped_total, em vez de segurar a requisição ou crescer sem
+limite; um lote que falha ao gravar também é descartado e contado. Os lotes
+saem com REGISTROS_LOTE registros ou REGISTROS_INTERVALO_S segundos depois
+do primeiro, o que vier antes. No encerramento do worker a fila é esvaziada.
+
+O id da requisição (header X-Request-ID, recebido ou gerado) volta na
+resposta e liga as linhas do log de acesso às da auditoria.
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import REGISTRY, Counter, Gauge, nome_da_rota
+
+logger = logging.getLogger(__name__)
+
+ACESSO_LOG_ARQUIVO = os.getenv("ACESSO_LOG_ARQUIVO", "logs/acesso.jsonl")
+AUDITORIA_ATIVA = os.getenv("AUDITORIA_ATIVA", "1") == "1"
+REGISTROS_FILA_MAX = int(os.getenv("REGISTROS_FILA_MAX", "10000"))
+REGISTROS_LOTE = int(os.getenv("REGISTROS_LOTE", "500"))
+REGISTROS_INTERVALO_S = float(os.getenv("REGISTROS_INTERVALO_S", "1"))
+
+_ID_VALIDO = re.compile(r"^[A-Za-z0-9._-]{1,36}$")
+
+REGISTROS_GRAVADOS = Counter("log_records_written_total", "Registros de log gravados por destino", ("destino",))
+REGISTROS_DESCARTADOS = Counter(
+    "log_records_dropped_total", "Registros de log descartados por destino e motivo", ("destino", "motivo")
+)
+REGISTROS_FILA = Gauge("log_queue_depth", "Registros de log aguardando gravação por destino", ("destino",))
+
+
+class Requisicao:
+    """
+    Dados da requisição em curso. O objeto é o mesmo nas threads do pool (o
+    anyio copia o contexto, não o objeto): o que get_current_user preenche
+    aparece para o middleware e para a auditoria.
+    """
+
+    __slots__ = ("id", "metodo", "caminho", "usuario_id", "usuario")
+
+    def __init__(self, requisicao_id: str, metodo: str, caminho: str):
+        self.id = requisicao_id
+        self.metodo = metodo
+        self.caminho = caminho
+        self.usuario_id: Optional[int] = None
+        self.usuario: Optional[str] = None
+
+
+_requisicao_atual: contextvars.ContextVar[Optional[Requisicao]] = contextvars.ContextVar(
+    "requisicao_atual", default=None
+)
+
+
+def identificar_usuario(usuario_id: int, usuario: str) -> None:
+    """
+    Marca o usuário autenticado na requisição em curso (se houver uma).
+    """
+    requisicao = _requisicao_atual.get()
+    if requisicao is not None:
+        requisicao.usuario_id = usuario_id
+        requisicao.usuario = usuario
+
+
+_FIM = object()
+
+
+class EscritorEmLote:
+    """
+    Fila limitada de registros e a thread que os grava em lotes com
+    `gravar(lote)`.
+    """
+
+    def __init__(
+        self,
+        destino: str,
+        gravar: Callable[[List[Dict[str, Any]]], None],
+        fila_max: int = REGISTROS_FILA_MAX,
+        lote: int = REGISTROS_LOTE,
+        intervalo_s: float = REGISTROS_INTERVALO_S
+    ):
+        self.destino = destino
+        self.gravar = gravar
+        self.lote = lote
+        self.intervalo_s = intervalo_s
+        self.fila: "queue.Queue[Any]" = queue.Queue(maxsize=fila_max)
+        self._thread: Optional[threading.Thread] = None
+
+    def enfileirar(self, registros: Iterable[Dict[str, Any]]) -> None:
+        """
+        Não bloqueia: com a fila cheia, o registro é descartado e contado.
+        """
+        for registro in registros:
+            try:
+                self.fila.put_nowait(registro)
+            except queue.Full:
+                REGISTROS_DESCARTADOS.inc(destino=self.destino, motivo="fila_cheia")
+
+    def iniciar(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._executar, daemon=True, name=f"registros-{self.destino}")
+            self._thread.start()
+
+    def parar(self, timeout: float = 5.0) -> None:
+        """
+        Grava o que está na fila e encerra a thread.
+        """
+        if self._thread is None:
+            return
+        try:
+            self.fila.put(_FIM, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _executar(self) -> None:
+        while True:
+            lote = [self.fila.get()]
+            prazo = time.monotonic() + self.intervalo_s
+            while len(lote) < self.lote and lote[-1] is not _FIM:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self.fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+            fim = lote[-1] is _FIM
+            self._gravar([registro for registro in lote if registro is not _FIM])
+            if fim:
+                return
+
+    def _gravar(self, lote: List[Dict[str, Any]]) -> None:
+        if not lote:
+            return
+        try:
+            self.gravar(lote)
+            REGISTROS_GRAVADOS.inc(len(lote), destino=self.destino)
+        except Exception as exc:
+            REGISTROS_DESCARTADOS.inc(len(lote), destino=self.destino, motivo="falha")
+            logger.warning("Falha ao gravar %d registros de %s: %s", len(lote), self.destino, exc)
+
+
+def _serializar(valor: Any) -> Any:
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _gravar_acessos(lote: List[Dict[str, Any]]) -> None:
+    diretorio = os.path.dirname(ACESSO_LOG_ARQUIVO)
+    if diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+    linhas = "".join(json.dumps(registro, default=_serializar, ensure_ascii=False) + "\n" for registro in lote)
+    with open(ACESSO_LOG_ARQUIVO, "a", encoding="utf-8") as arquivo:
+        arquivo.write(linhas)
+
+
+def _gravar_auditoria(lote: List[Dict[str, Any]]) -> None:
+    from db.session import SessionLocal
+    from models.auditoria import Auditoria
+
+    with SessionLocal() as db:
+        db.execute(insert(Auditoria), lote)
+        db.commit()
+
+
+ACESSOS = EscritorEmLote("acessos", _gravar_acessos)
+AUDITORIA = EscritorEmLote("auditoria", _gravar_auditoria)
+
+
+def coletar_registros() -> None:
+    for escritor in (ACESSOS, AUDITORIA):
+        REGISTROS_FILA.set(escritor.fila.qsize(), destino=escritor.destino)
+
+
+REGISTRY.registrar_coletor(coletar_registros)
+
+
+def iniciar_registros() -> None:
+    if ACESSO_LOG_ARQUIVO:
+        ACESSOS.iniciar()
+    if AUDITORIA_ATIVA:
+        AUDITORIA.iniciar()
+
+
+def parar_registros() -> None:
+    ACESSOS.parar()
+    AUDITORIA.parar()
+
+
+def auditar(db: Session, tabela: str, acao: str, registros: Iterable[Dict[str, Any]]) -> None:
+    """
+    Registra na transação corrente de `db` a escrita `acao` (criado,
+    atualizado, arquivado, restaurado, mesclado, removido) dos `registros`
+    de `tabela`, com o usuário e a requisição em curso. Deve ser chamada
+    antes do commit; os registros vão para a fila só se ele acontecer.
+    Cada registro precisa de "id" e, em procedimentos, de "cliente_id".
+    """
+    if not AUDITORIA_ATIVA:
+        return
+    requisicao = _requisicao_atual.get()
+    contexto = {
+        "usuario_id": requisicao.usuario_id if requisicao else None,
+        "usuario": requisicao.usuario if requisicao else None,
+        "requisicao_id": requisicao.id if requisicao else None,
+        "metodo": requisicao.metodo if requisicao else None,
+        "caminho": requisicao.caminho if requisicao else None,
+    }
+    db.info.setdefault("auditoria", []).extend(
+        {
+            **contexto,
+            "tabela": tabela,
+            "acao": acao,
+            "registro_id": registro["id"],
+            "cliente_id": registro["id"] if tabela == "clientes" else registro.get("cliente_id"),
+        }
+        for registro in registros
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _enfileirar_auditoria(db: Session) -> None:
+    pendentes = db.info.pop("auditoria", None)
+    if pendentes:
+        em = datetime.now(timezone.utc)
+        AUDITORIA.enfileirar({**registro, "em": em} for registro in pendentes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_auditoria(db: Session) -> None:
+    db.info.pop("auditoria", None)
+
+
+def _id_da_requisicao(scope: Scope) -> str:
+    for nome, valor in scope.get("headers", []):
+        if nome == b"x-request-id":
+            recebido = valor.decode("latin-1")
+            if _ID_VALIDO.match(recebido):
+                return recebido
+            break
+    return str(uuid.uuid4())
+
+
+class AcessoMiddleware:
+    """
+    Middleware ASGI que abre o contexto da requisição (id e usuário), devolve
+    o id no header X-Request-ID e enfileira a linha do log de acesso.
+    """
+
+    def __init__(self, app: ASGIApp, ignorar: Optional[Iterable[str]] = ("/metrics",)):
+        self.app = app
+        self.ignorar = set(ignorar or ())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope.get("path") in self.ignorar:
+            await self.app(scope, receive, send)
+            return
+
+        requisicao = Requisicao(_id_da_requisicao(scope), scope.get("method", ""), scope.get("path", ""))
+        token = _requisicao_atual.set(requisicao)
+        status_code = 500
+        inicio_relogio = datetime.now(timezone.utc)
+        inicio = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", requisicao.id.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _requisicao_atual.reset(token)
+            if ACESSO_LOG_ARQUIVO:
+                cliente = scope.get("client")
+                ACESSOS.enfileirar([{
+                    "em": inicio_relogio,
+                    "requisicao_id": requisicao.id,
+                    "metodo": requisicao.metodo,
+                    "rota": nome_da_rota(scope),
+                    "caminho": requisicao.caminho,
+                    "status": status_code,
+                    "duracao_ms": round((time.perf_counter() - inicio) * 1000, 3),
+                    "usuario_id": requisicao.usuario_id,
+                    "usuario": requisicao.usuario,
+                    "ip": cliente[0] if cliente else None,
+                }])
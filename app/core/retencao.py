@@ -0,0 +1,176 @@
+"""
+Estatísticas de retorno dos clientes, calculadas com NumPy.
+
+A partir das colunas (cliente_id, dia, valor, tonalizante) de todos os
+procedimentos, calcula por cliente, sem laço em Python por cliente:
+- visitas, primeira e última visita;
+- intervalo médio entre visitas e a data prevista de retorno
+  (última visita + intervalo médio);
+- valor total, ticket médio e tendência do valor (inclinação da reta de
+  mínimos quadrados do valor pela data, em reais por 30 dias);
+- tonalizante médio por visita em que foi usado, a previsão para o retorno.
+
+As linhas são ordenadas por (cliente, dia) uma vez e os agrupamentos são
+feitos com np.bincount sobre os trechos de cada cliente, O(n log n) no
+total. Dias são contados desde 1970-01-01 (datetime64[D]).
+
+O NumPy só é importado ao calcular ou consultar as estatísticas, fora do
+caminho de inicialização dos workers.
+"""
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Dias usados na tendência de valor (reais por mês)
+DIAS_POR_MES = 30
+
+# Idade máxima das estatísticas guardadas, mesmo sem escrita conhecida (com o
+# cache em memória, escritas de outro worker só chegam pelo NOTIFY do Postgres)
+RETENCAO_TTL_S = float(os.getenv("RETENCAO_TTL_S", "300"))
+
+
+class Estatisticas:
+    """
+    Arrays alinhados por cliente, ordenados por cliente_id.
+    """
+
+    def __init__(self, colunas: Dict[str, "np.ndarray"]):
+        self.colunas = colunas
+        self.cliente_id = colunas["cliente_id"]
+
+    def __len__(self) -> int:
+        return len(self.cliente_id)
+
+    def posicao(self, cliente_id: int) -> Optional[int]:
+        import numpy as np
+
+        posicao = int(np.searchsorted(self.cliente_id, cliente_id))
+        if posicao < len(self.cliente_id) and self.cliente_id[posicao] == cliente_id:
+            return posicao
+        return None
+
+
+def _media_por_grupo(somas: "np.ndarray", quantidades: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    resultado = np.full(len(somas), np.nan)
+    np.divide(somas, quantidades, out=resultado, where=quantidades > 0)
+    return resultado
+
+
+def calcular(cliente_id: "np.ndarray", dia: "np.ndarray", valor: "np.ndarray", tonalizante: "np.ndarray") -> Estatisticas:
+    """
+    Estatísticas por cliente. `dia` em dias desde 1970-01-01 e `tonalizante`
+    com NaN onde não foi informado.
+    """
+    import numpy as np
+
+    ordem = np.lexsort((dia, cliente_id))
+    cliente_id, dia = cliente_id[ordem], dia[ordem].astype(np.float64)
+    valor, tonalizante = valor[ordem].astype(np.float64), tonalizante[ordem].astype(np.float64)
+
+    # Com as linhas ordenadas, cada cliente é um trecho contíguo
+    inicio = np.flatnonzero(np.r_[True, cliente_id[1:] != cliente_id[:-1]]) if len(cliente_id) else np.zeros(0, np.int64)
+    visitas = np.diff(np.r_[inicio, len(cliente_id)])
+    clientes = cliente_id[inicio]
+    grupo = np.repeat(np.arange(len(clientes)), visitas)
+    fim = inicio + visitas - 1
+    primeira, ultima = dia[inicio], dia[fim]
+
+    # Com os dias em ordem, a média dos intervalos é (última - primeira) / (n - 1)
+    intervalo = np.full(len(clientes), np.nan)
+    np.divide(ultima - primeira, visitas - 1, out=intervalo, where=visitas > 1)
+
+    valor_total = np.bincount(grupo, weights=valor, minlength=len(clientes))
+    ticket = valor_total / np.maximum(visitas, 1)
+
+    # Inclinação por grupo: soma((x - x̄)(y - ȳ)) / soma((x - x̄)²)
+    dia_medio = np.bincount(grupo, weights=dia, minlength=len(clientes)) / np.maximum(visitas, 1)
+    desvio_dia = dia - dia_medio[grupo]
+    desvio_valor = valor - ticket[grupo]
+    variancia = np.bincount(grupo, weights=desvio_dia * desvio_dia, minlength=len(clientes))
+    covariancia = np.bincount(grupo, weights=desvio_dia * desvio_valor, minlength=len(clientes))
+    tendencia = np.full(len(clientes), np.nan)
+    np.divide(covariancia * DIAS_POR_MES, variancia, out=tendencia, where=variancia > 0)
+
+    usou = ~np.isnan(tonalizante) & (tonalizante > 0)
+    tonalizante_medio = _media_por_grupo(
+        np.bincount(grupo, weights=np.where(usou, tonalizante, 0.0), minlength=len(clientes)),
+        np.bincount(grupo, weights=usou, minlength=len(clientes)),
+    )
+
+    return Estatisticas({
+        "cliente_id": clientes,
+        "visitas": visitas,
+        "primeira_visita": primeira.astype(np.int64),
+        "ultima_visita": ultima.astype(np.int64),
+        "intervalo_medio_dias": intervalo,
+        # NaN (um cliente com uma visita só) continua NaN
+        "retorno_previsto": np.round(ultima + intervalo),
+        "valor_total": valor_total,
+        "ticket_medio": ticket,
+        "tendencia_valor_mensal": tendencia,
+        "tonalizante_previsto": tonalizante_medio,
+    })
+
+
+class CacheEstatisticas:
+    """
+    Guarda, por origem da leitura (primário ou réplica), as últimas
+    estatísticas calculadas e a chave (gerações das tabelas) em que valem,
+    por até `ttl` segundos. As origens ficam separadas porque uma réplica
+    atrasada calcula sobre dados de antes da geração atual. Um cálculo por
+    vez: quem chega durante o cálculo espera e reaproveita o resultado.
+    """
+
+    def __init__(self, ttl: float = RETENCAO_TTL_S):
+        self.ttl = ttl
+        # origem -> (chave, calculado_em, estatísticas), trocados juntos
+        self._atuais: Dict[str, Tuple[Optional[Hashable], float, Estatisticas]] = {}
+        self._lock = threading.Lock()
+
+    def _valido(self, origem: str, chave: Optional[Hashable]) -> Optional[Estatisticas]:
+        atual_chave, calculado_em, atual = self._atuais.get(origem, (None, 0.0, None))
+        if chave is not None and atual_chave == chave and time.monotonic() - calculado_em < self.ttl:
+            return atual
+        return None
+
+    def obter(
+        self, origem: str, chave: Optional[Hashable], calcular_valor: Callable[[], Estatisticas]
+    ) -> Estatisticas:
+        """
+        Retorna as estatísticas de `chave` lidas em `origem`, calculando-as
+        se preciso. Chave None (geração indisponível) sempre recalcula e não
+        guarda.
+        """
+        atual = self._valido(origem, chave)
+        if atual is not None:
+            return atual
+        with self._lock:
+            atual = self._valido(origem, chave)
+            if atual is not None:
+                return atual
+            valor = calcular_valor()
+            if chave is not None:
+                self._atuais[origem] = (chave, time.monotonic(), valor)
+            return valor
+
+
+ESTATISTICAS = CacheEstatisticas()
+
+
+def registro(estatisticas: Estatisticas, posicao: int) -> Dict[str, Any]:
+    """
+    As estatísticas de um cliente como tipos do Python (NaN vira None).
+    """
+    valores: Dict[str, Any] = {}
+    for nome, coluna in estatisticas.colunas.items():
+        valor = coluna[posicao].item()
+        if isinstance(valor, float) and valor != valor:
+            valor = None
+        valores[nome] = valor
+    return valores
@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional, Dict
-from jose import JWTError, jwt
 from fastapi import HTTPException, status
 
 # Configurações de segurança
@@ -10,10 +10,22 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 
+@lru_cache(maxsize=None)
+def _jose():
+    """
+    Importa o python-jose sob demanda: o import (com os backends de criptografia)
+    é um dos mais caros da inicialização e só é necessário ao tratar tokens.
+    """
+    import jose
+    from jose import jwt
+    return jose, jwt
+
+
 def create_access_token(data: Dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Cria um token JWT de acesso.
     """
+    _, jwt = _jose()
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -30,6 +42,7 @@ def decode_access_token(token: str) -> Optional[Dict]:
     Decodifica e valida um token JWT.
     Retorna o payload se válido, None caso contrário.
     """
+    jose, jwt = _jose()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
@@ -39,6 +52,6 @@ def decode_access_token(token: str) -> Optional[Dict]:
     except jwt.InvalidTokenError:
         # Token inválido (formato incorreto, assinatura inválida, etc)
         return None
-    except JWTError:
+    except jose.JWTError:
         return None
 
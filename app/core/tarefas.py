@@ -0,0 +1,338 @@
+"""
+Tarefas em segundo plano, com fila durável no banco.
+
+Efeitos colaterais lentos das escritas (apagar fotos e o arquivo frio,
+e-mails) rodavam na thread da requisição ou como BackgroundTasks, que somem
+se o worker cair e não tentam de novo. Agora a escrita grava a tarefa na
+tabela tarefas dentro da própria transação (agendar): a tarefa existe se, e
+só se, a escrita foi confirmada.
+
+Execução:
+- TAREFAS_WORKERS threads por worker da API (padrão 2; 0 desliga, para
+  deixar tudo com o processo dedicado `cd app && python -m core.tarefas`)
+  pegam uma tarefa por vez, a vencida mais antiga, com um UPDATE ...
+  RETURNING (no Postgres com FOR UPDATE SKIP LOCKED: threads e processos
+  não disputam a mesma linha). Um commit com tarefa agendada acorda as
+  threads do próprio worker; as dos outros acham a tarefa na próxima
+  consulta, a cada TAREFAS_INTERVALO_S segundos;
+- a tarefa em execução tem prazo de TAREFAS_PRAZO_S segundos: se o worker
+  cair no meio, ela volta a ser pega depois do prazo. Por isso (e pelas
+  novas tentativas) as tarefas precisam ser idempotentes;
+- uma falha agenda nova tentativa com espera exponencial
+  (TAREFAS_ESPERA_BASE_S, dobrando a cada tentativa até
+  TAREFAS_ESPERA_MAXIMA_S, com variação aleatória para as tentativas não
+  se sincronizarem). Esgotadas as tentativas, a tarefa fica como "falhou",
+  com o último erro, até ser reexecutada (POST
+  /api/v1/diagnostico/tarefas/{id}/reexecutar);
+- a chave de idempotência impede que a mesma tarefa seja agendada duas
+  vezes (ex.: um e-mail de boas-vindas por usuário);
+- tarefas concluídas há mais de TAREFAS_RETENCAO_DIAS dias são apagadas.
+
+Os tipos ficam em TIPOS ("tipo": "modulo:funcao") e só são importados
+quando executados; a função recebe os argumentos (JSON) como parâmetros
+nomeados.
+"""
+import argparse
+import importlib
+import logging
+import os
+import random
+import signal
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from core.metrics import Counter, Gauge, Histogram
+from models.tarefa import Tarefa
+
+logger = logging.getLogger(__name__)
+
+TAREFAS_WORKERS = int(os.getenv("TAREFAS_WORKERS", "2"))
+TAREFAS_INTERVALO_S = float(os.getenv("TAREFAS_INTERVALO_S", "2"))
+TAREFAS_PRAZO_S = float(os.getenv("TAREFAS_PRAZO_S", "300"))
+TAREFAS_MAX_TENTATIVAS = int(os.getenv("TAREFAS_MAX_TENTATIVAS", "5"))
+TAREFAS_ESPERA_BASE_S = float(os.getenv("TAREFAS_ESPERA_BASE_S", "5"))
+TAREFAS_ESPERA_MAXIMA_S = float(os.getenv("TAREFAS_ESPERA_MAXIMA_S", "3600"))
+TAREFAS_RETENCAO_DIAS = int(os.getenv("TAREFAS_RETENCAO_DIAS", "7"))
+# Intervalo entre limpezas e entre atualizações do gauge de tarefas por estado
+TAREFAS_MANUTENCAO_S = 60
+
+TIPOS = {
+    "remover_fotos": "core.fotos:remover_fotos",
+    "remover_historico_arquivado": "core.arquivamento:remover_historico_arquivado",
+    "transferir_historico_arquivado": "core.arquivamento:transferir_historico_arquivado",
+    "email_boas_vindas": "core.email:enviar_boas_vindas",
+}
+
+TAREFAS_EXECUTADAS = Counter(
+    "jobs_total", "Execuções de tarefas em segundo plano por tipo e resultado", ("tipo", "resultado")
+)
+TAREFAS_DURACAO = Histogram("job_duration_seconds", "Duração das execuções de tarefas por tipo", ("tipo",))
+TAREFAS_POR_ESTADO = Gauge("jobs_queued", "Tarefas na fila por estado (exceto concluídas)", ("estado",))
+
+
+def _agora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _insert_ignorando_conflito(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as insert_dialeto
+    else:
+        from sqlalchemy.dialects.sqlite import insert as insert_dialeto
+    return insert_dialeto(Tarefa)
+
+
+def agendar(
+    db: Session,
+    tipo: str,
+    argumentos: Dict[str, Any],
+    chave: Optional[str] = None,
+    atraso_s: float = 0,
+    max_tentativas: int = TAREFAS_MAX_TENTATIVAS
+) -> None:
+    """
+    Agenda a tarefa `tipo` na transação corrente de `db` (antes do commit
+    da escrita). Com `chave`, uma tarefa já agendada com a mesma chave
+    mantém-se e esta é ignorada.
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de tarefa desconhecido: {tipo}")
+    valores = {
+        "tipo": tipo,
+        "argumentos": argumentos,
+        "chave": chave,
+        "estado": "pendente",
+        "tentativas": 0,
+        "max_tentativas": max_tentativas,
+        "executar_em": _agora() + timedelta(seconds=atraso_s),
+    }
+    if chave is None:
+        db.execute(insert(Tarefa).values(**valores))
+    else:
+        db.execute(_insert_ignorando_conflito(db).values(**valores).on_conflict_do_nothing(index_elements=["chave"]))
+    db.info["tarefas_agendadas"] = True
+
+
+def espera(tentativas: int) -> float:
+    """
+    Segundos até a próxima tentativa depois de `tentativas` falhas: dobra a
+    cada falha, até o máximo, e sorteia entre a metade e o valor cheio.
+    """
+    teto = min(TAREFAS_ESPERA_MAXIMA_S, TAREFAS_ESPERA_BASE_S * 2 ** (tentativas - 1))
+    return teto * (0.5 + random.random() / 2)
+
+
+def pegar_tarefa(db: Session) -> Optional[Dict[str, Any]]:
+    """
+    Marca como em execução a tarefa vencida mais antiga (pendente, ou em
+    execução com o prazo esgotado) e a retorna; None se não houver.
+    """
+    agora = _agora()
+    proxima = (
+        select(Tarefa.id)
+        .where(
+            Tarefa.estado.in_(("pendente", "executando")),
+            Tarefa.executar_em <= agora,
+            Tarefa.tentativas < Tarefa.max_tentativas,
+        )
+        .order_by(Tarefa.executar_em)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    tarefa = db.execute(
+        update(Tarefa)
+        .where(Tarefa.id == proxima)
+        .values(
+            estado="executando",
+            tentativas=Tarefa.tentativas + 1,
+            executar_em=agora + timedelta(seconds=TAREFAS_PRAZO_S),
+        )
+        .returning(Tarefa.id, Tarefa.tipo, Tarefa.argumentos, Tarefa.tentativas, Tarefa.max_tentativas)
+        .execution_options(synchronize_session=False)
+    ).mappings().one_or_none()
+    db.commit()
+    return dict(tarefa) if tarefa is not None else None
+
+
+def _funcao(tipo: str) -> Callable[..., None]:
+    modulo, _, nome = TIPOS[tipo].partition(":")
+    return getattr(importlib.import_module(modulo), nome)
+
+
+def executar_tarefa(db: Session, tarefa: Dict[str, Any]) -> str:
+    """
+    Executa a tarefa pega por pegar_tarefa e grava o resultado. Retorna
+    "concluida", "nova_tentativa" ou "falhou".
+    """
+    inicio = time.perf_counter()
+    try:
+        _funcao(tarefa["tipo"])(**tarefa["argumentos"])
+    except Exception as exc:
+        erro = f"{type(exc).__name__}: {exc}"
+        if tarefa["tentativas"] >= tarefa["max_tentativas"]:
+            resultado, valores = "falhou", {"estado": "falhou", "erro": erro}
+        else:
+            resultado = "nova_tentativa"
+            valores = {
+                "estado": "pendente",
+                "erro": erro,
+                "executar_em": _agora() + timedelta(seconds=espera(tarefa["tentativas"])),
+            }
+        logger.warning("Tarefa %s (%s), tentativa %d: %s", tarefa["id"], tarefa["tipo"], tarefa["tentativas"], erro)
+    else:
+        resultado, valores = "concluida", {"estado": "concluida", "erro": None, "concluido_em": _agora()}
+    TAREFAS_DURACAO.observe(time.perf_counter() - inicio, tipo=tarefa["tipo"])
+    TAREFAS_EXECUTADAS.inc(tipo=tarefa["tipo"], resultado=resultado)
+
+    # Só se a tarefa ainda é desta execução: com o prazo esgotado, outra
+    # thread pode tê-la pego de novo (e a tentativa mudou)
+    db.execute(
+        update(Tarefa)
+        .where(Tarefa.id == tarefa["id"], Tarefa.tentativas == tarefa["tentativas"])
+        .values(**valores)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return resultado
+
+
+def manter_tarefas(db: Session) -> None:
+    """
+    Apaga as tarefas concluídas há mais de TAREFAS_RETENCAO_DIAS dias, marca
+    como falhou as que esgotaram as tentativas sem terminar (o worker caiu
+    na última) e atualiza o gauge de tarefas por estado.
+    """
+    agora = _agora()
+    db.execute(
+        delete(Tarefa)
+        .where(Tarefa.estado == "concluida", Tarefa.concluido_em < agora - timedelta(days=TAREFAS_RETENCAO_DIAS))
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(Tarefa)
+        .where(
+            Tarefa.estado == "executando",
+            Tarefa.executar_em < agora,
+            Tarefa.tentativas >= Tarefa.max_tentativas,
+        )
+        .values(estado="falhou", erro="Prazo de execução esgotado")
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+    contagens = dict(db.execute(
+        select(Tarefa.estado, func.count())
+        .where(Tarefa.estado.in_(("pendente", "executando", "falhou")))
+        .group_by(Tarefa.estado)
+    ).all())
+    for estado in ("pendente", "executando", "falhou"):
+        TAREFAS_POR_ESTADO.set(contagens.get(estado, 0), estado=estado)
+
+
+class Executor:
+    """
+    Threads que executam as tarefas, uma por vez cada. Sem tarefa vencida,
+    esperam TAREFAS_INTERVALO_S segundos ou até acordar().
+    """
+
+    def __init__(self, intervalo_s: float = TAREFAS_INTERVALO_S):
+        self.intervalo_s = intervalo_s
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._manutencao_em = 0.0
+        self._lock = threading.Lock()
+
+    def iniciar(self, workers: int = TAREFAS_WORKERS) -> None:
+        if self._threads or workers <= 0:
+            return
+        self._parar.clear()
+        for numero in range(workers):
+            thread = threading.Thread(target=self._executar, daemon=True, name=f"tarefas-{numero}")
+            thread.start()
+            self._threads.append(thread)
+
+    def acordar(self) -> None:
+        self._acordar.set()
+
+    def parar(self, timeout: float = 10.0) -> None:
+        """
+        Espera as tarefas em execução terminarem (até `timeout`); as que não
+        terminarem voltam para a fila quando o prazo delas esgotar.
+        """
+        self._parar.set()
+        self._acordar.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _hora_da_manutencao(self) -> bool:
+        with self._lock:
+            if time.monotonic() - self._manutencao_em < TAREFAS_MANUTENCAO_S:
+                return False
+            self._manutencao_em = time.monotonic()
+            return True
+
+    def _executar(self) -> None:
+        from db.session import SessionLocal
+
+        while not self._parar.is_set():
+            try:
+                with SessionLocal() as db:
+                    if self._hora_da_manutencao():
+                        manter_tarefas(db)
+                    tarefa = pegar_tarefa(db)
+                    if tarefa is not None:
+                        executar_tarefa(db, tarefa)
+                        continue
+            except Exception as exc:
+                logger.warning("Falha no executor de tarefas: %s", exc)
+            self._acordar.wait(self.intervalo_s)
+            self._acordar.clear()
+
+
+EXECUTOR = Executor()
+
+
+def iniciar_tarefas() -> None:
+    EXECUTOR.iniciar()
+
+
+def parar_tarefas() -> None:
+    EXECUTOR.parar()
+
+
+@event.listens_for(Session, "after_commit")
+def _acordar_executor(db: Session) -> None:
+    if db.info.pop("tarefas_agendadas", False):
+        EXECUTOR.acordar()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_agendadas(db: Session) -> None:
+    db.info.pop("tarefas_agendadas", None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa as tarefas em segundo plano")
+    parser.add_argument("--workers", type=int, default=max(TAREFAS_WORKERS, 1), help="Threads de execução")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    signal.signal(signal.SIGINT, lambda *_: parar.set())
+    EXECUTOR.iniciar(args.workers)
+    print(f"Executando tarefas com {args.workers} threads (Ctrl+C para parar)")
+    parar.wait()
+    EXECUTOR.parar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+Normalização de texto para comparações sem acento e sem maiúsculas.
+"""
+import unicodedata
+
+
+def normalizar(texto: str) -> str:
+    """
+    Remove acentos, ignora maiúsculas e junta espaços repetidos.
+    """
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acento = "".join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+    return " ".join(sem_acento.casefold().split())
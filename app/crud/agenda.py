@@ -0,0 +1,365 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import date, datetime, timedelta
+
+from core.agenda import AGENDA_DURACAO_MAX, IndiceIntervalos, horarios_livres, todos_ocupados
+from core.cache import CACHE, LISTAGENS, anexar
+from core.invalidacao import publicar
+from crud.procedimento import inserir_procedimento
+from models.agendamento import Agendamento
+from models.cadeira import Cadeira
+from models.procedimento import Procedimento
+from models.profissional import Profissional
+from schemas.agenda import (
+    AgendamentoConclusao,
+    AgendamentoCreate,
+    AgendamentoUpdate,
+    CadeiraCreate,
+    ProfissionalCreate,
+)
+
+
+class ConflitoAgenda(ValueError):
+    """
+    O horário pedido se sobrepõe a outro agendamento do profissional ou da
+    cadeira, ou o agendamento não pode mais mudar.
+    """
+
+
+def _violou_exclusao(exc: IntegrityError) -> bool:
+    # Restrições de exclusão do Postgres (SQLSTATE 23P01)
+    return getattr(exc.orig, "pgcode", None) == "23P01" or "exclusion constraint" in str(exc.orig).lower()
+
+
+def _confirmar_agendamento(db: Session, valores: Dict[str, Any]) -> Agendamento:
+    publicar(db, "agendamento", [valores["id"]], tabelas=["agendamentos"])
+    db.commit()
+    LISTAGENS.nova_geracao("agendamentos")
+    return anexar(db, Agendamento, valores)
+
+
+def criar_profissional(db: Session, profissional: ProfissionalCreate) -> Profissional:
+    db_profissional = Profissional(**profissional.model_dump())
+    db.add(db_profissional)
+    db.commit()
+    db.refresh(db_profissional)
+    return db_profissional
+
+
+def get_profissionais(db: Session, apenas_ativos: bool = True) -> List[Profissional]:
+    query = db.query(Profissional)
+    if apenas_ativos:
+        query = query.filter(Profissional.ativo.is_(True))
+    return query.order_by(Profissional.nome, Profissional.id).all()
+
+
+def criar_cadeira(db: Session, cadeira: CadeiraCreate) -> Cadeira:
+    db_cadeira = Cadeira(**cadeira.model_dump())
+    db.add(db_cadeira)
+    db.commit()
+    db.refresh(db_cadeira)
+    return db_cadeira
+
+
+def get_cadeiras(db: Session, apenas_ativas: bool = True) -> List[Cadeira]:
+    query = db.query(Cadeira)
+    if apenas_ativas:
+        query = query.filter(Cadeira.ativa.is_(True))
+    return query.order_by(Cadeira.nome, Cadeira.id).all()
+
+
+def _sobrepostos(
+    db: Session,
+    inicio: datetime,
+    fim: datetime,
+    profissional_id: Optional[int] = None,
+    cadeira_id: Optional[int] = None,
+    ignorar_id: Optional[int] = None,
+) -> List:
+    """
+    Agendamentos ativos que se sobrepõem a [inicio, fim), do profissional ou
+    da cadeira (de todas as cadeiras quando cadeira_id é None). Como nenhum
+    agendamento dura mais que AGENDA_DURACAO_MAX, o início também fica
+    limitado por baixo e a busca percorre só um trecho dos índices
+    (recurso, inicio).
+    """
+    query = select(Agendamento.id, Agendamento.profissional_id, Agendamento.cadeira_id).where(
+        Agendamento.status != "cancelado",
+        Agendamento.inicio < fim,
+        Agendamento.inicio > inicio - AGENDA_DURACAO_MAX,
+        Agendamento.fim > inicio,
+    )
+    if cadeira_id is not None:
+        query = query.where(or_(
+            Agendamento.profissional_id == profissional_id,
+            Agendamento.cadeira_id == cadeira_id,
+        ))
+    if ignorar_id is not None:
+        query = query.where(Agendamento.id != ignorar_id)
+    return db.execute(query).all()
+
+
+def _reservar(
+    db: Session,
+    inicio: datetime,
+    fim: datetime,
+    profissional_id: int,
+    cadeira_id: Optional[int],
+    ignorar_id: Optional[int] = None,
+) -> int:
+    """
+    Confere o horário e retorna a cadeira do agendamento: a informada ou,
+    sem ela, a primeira cadeira ativa livre.
+    """
+    ocupados = _sobrepostos(db, inicio, fim, profissional_id, cadeira_id, ignorar_id)
+    if any(ocupado.profissional_id == profissional_id for ocupado in ocupados):
+        raise ConflitoAgenda("O profissional já tem um agendamento nesse horário")
+    if cadeira_id is not None:
+        if any(ocupado.cadeira_id == cadeira_id for ocupado in ocupados):
+            raise ConflitoAgenda("A cadeira já está ocupada nesse horário")
+        return cadeira_id
+
+    cadeiras_ocupadas = {ocupado.cadeira_id for ocupado in ocupados}
+    livre = db.execute(
+        select(Cadeira.id)
+        .where(Cadeira.ativa.is_(True), Cadeira.id.not_in(cadeiras_ocupadas))
+        .order_by(Cadeira.id)
+        .limit(1)
+    ).scalar()
+    if livre is None:
+        raise ConflitoAgenda("Nenhuma cadeira livre nesse horário")
+    return livre
+
+
+def criar_agendamento(db: Session, agendamento: AgendamentoCreate) -> Agendamento:
+    """
+    Marca um horário. Conflitos com outro agendamento ativo do profissional
+    ou da cadeira levantam ConflitoAgenda; no Postgres as restrições de
+    exclusão garantem o mesmo entre escritas concorrentes.
+    """
+    valores = agendamento.model_dump(exclude={"duracao_min"})
+    try:
+        valores["cadeira_id"] = _reservar(
+            db, valores["inicio"], valores["fim"], valores["profissional_id"], valores["cadeira_id"]
+        )
+        criado = dict(db.execute(
+            insert(Agendamento)
+            .values(**valores)
+            .returning(*Agendamento.__table__.columns)
+        ).mappings().one())
+    except IntegrityError as exc:
+        db.rollback()
+        if _violou_exclusao(exc):
+            raise ConflitoAgenda("O horário acabou de ser ocupado por outro agendamento")
+        if "foreign key" in str(exc.orig).lower():
+            raise ValueError("Cliente, profissional ou cadeira não encontrado")
+        raise
+    except ValueError:
+        db.rollback()
+        raise
+    return _confirmar_agendamento(db, criado)
+
+
+def get_agendamento(db: Session, agendamento_id: int) -> Optional[Agendamento]:
+    return db.query(Agendamento).filter(Agendamento.id == agendamento_id).first()
+
+
+def get_agendamentos(
+    db: Session,
+    inicio: datetime,
+    fim: datetime,
+    profissional_id: Optional[int] = None,
+    cadeira_id: Optional[int] = None,
+    cliente_id: Optional[int] = None,
+    incluir_cancelados: bool = False,
+) -> List[Agendamento]:
+    """
+    Agendamentos que começam em [inicio, fim), em ordem de horário.
+    """
+    query = db.query(Agendamento).filter(Agendamento.inicio >= inicio, Agendamento.inicio < fim)
+    if profissional_id:
+        query = query.filter(Agendamento.profissional_id == profissional_id)
+    if cadeira_id:
+        query = query.filter(Agendamento.cadeira_id == cadeira_id)
+    if cliente_id:
+        query = query.filter(Agendamento.cliente_id == cliente_id)
+    if not incluir_cancelados:
+        query = query.filter(Agendamento.status != "cancelado")
+    return query.order_by(Agendamento.inicio, Agendamento.id).all()
+
+
+def atualizar_agendamento(
+    db: Session,
+    agendamento_id: int,
+    agendamento_update: AgendamentoUpdate
+) -> Optional[Agendamento]:
+    """
+    Remarca, troca profissional/cadeira ou cancela um agendamento. O novo
+    horário é conferido como na criação; agendamentos concluídos não mudam.
+    """
+    atual = db.execute(
+        select(Agendamento).where(Agendamento.id == agendamento_id).with_for_update()
+    ).scalar_one_or_none()
+    if atual is None:
+        db.rollback()
+        return None
+    if atual.status == "concluido":
+        db.rollback()
+        raise ConflitoAgenda("Agendamento já concluído")
+
+    update_data = agendamento_update.model_dump(exclude_unset=True)
+    inicio = update_data.get("inicio", atual.inicio)
+    fim = update_data.get("fim", atual.fim)
+    if "inicio" in update_data and "fim" not in update_data:
+        fim = inicio + (atual.fim - atual.inicio)
+        update_data["fim"] = fim
+    if fim <= inicio or fim - inicio > AGENDA_DURACAO_MAX:
+        db.rollback()
+        raise ValueError("Horário final deve ser depois do inicial, dentro da duração máxima")
+
+    try:
+        if update_data.get("status", atual.status) != "cancelado":
+            update_data["cadeira_id"] = _reservar(
+                db,
+                inicio,
+                fim,
+                update_data.get("profissional_id", atual.profissional_id),
+                update_data.get("cadeira_id", atual.cadeira_id),
+                ignorar_id=agendamento_id,
+            )
+        atualizado = dict(db.execute(
+            update(Agendamento)
+            .where(Agendamento.id == agendamento_id)
+            .values(**update_data)
+            .returning(*Agendamento.__table__.columns)
+            .execution_options(synchronize_session=False)
+        ).mappings().one())
+    except IntegrityError as exc:
+        db.rollback()
+        if _violou_exclusao(exc):
+            raise ConflitoAgenda("O horário acabou de ser ocupado por outro agendamento")
+        if "foreign key" in str(exc.orig).lower():
+            raise ValueError("Profissional ou cadeira não encontrado")
+        raise
+    except ValueError:
+        db.rollback()
+        raise
+    return _confirmar_agendamento(db, atualizado)
+
+
+def concluir_agendamento(
+    db: Session,
+    agendamento_id: int,
+    conclusao: AgendamentoConclusao
+) -> Optional[Procedimento]:
+    """
+    Registra o atendimento: cria o procedimento do cliente e marca o
+    agendamento como concluído na mesma transação.
+    """
+    agendamento = db.execute(
+        select(Agendamento).where(Agendamento.id == agendamento_id).with_for_update()
+    ).scalar_one_or_none()
+    if agendamento is None:
+        db.rollback()
+        return None
+    if agendamento.status != "agendado":
+        db.rollback()
+        raise ConflitoAgenda(f"Agendamento {agendamento.status}")
+
+    valor = conclusao.valor_procedimento
+    if valor is None:
+        valor = agendamento.valor_previsto
+    if valor is None:
+        db.rollback()
+        raise ValueError("Informe o valor do procedimento")
+
+    criado = inserir_procedimento(db, {
+        "cliente_id": agendamento.cliente_id,
+        "data_procedimento": agendamento.inicio.date(),
+        "tipo_procedimento": conclusao.tipo_procedimento or agendamento.tipo_procedimento,
+        "valor_procedimento": valor,
+        "qtd_tonalizante": conclusao.qtd_tonalizante,
+        "observacao": conclusao.observacao if conclusao.observacao is not None else agendamento.observacao,
+        "corte": conclusao.corte,
+    })
+    concluido = dict(db.execute(
+        update(Agendamento)
+        .where(Agendamento.id == agendamento_id)
+        .values(status="concluido", procedimento_id=criado["id"])
+        .returning(*Agendamento.__table__.columns)
+        .execution_options(synchronize_session=False)
+    ).mappings().one())
+    _confirmar_agendamento(db, concluido)
+    CACHE.set("procedimento", criado["id"], criado)
+    LISTAGENS.nova_geracao("procedimentos")
+    return anexar(db, Procedimento, criado)
+
+
+def _ocupacao_periodo(db: Session, inicio: datetime, fim: datetime) -> List[Dict[str, Any]]:
+    """
+    Horários ativos que tocam [inicio, fim), com uma única consulta pelo
+    índice de inicio. Fica no cache de listagens até a próxima escrita.
+    """
+    chave, linhas = LISTAGENS.get(db, "agendamentos", ("ocupacao", inicio, fim))
+    if linhas is not None:
+        return linhas
+
+    resultado = db.execute(
+        select(Agendamento.profissional_id, Agendamento.cadeira_id, Agendamento.inicio, Agendamento.fim)
+        .where(
+            Agendamento.status != "cancelado",
+            Agendamento.inicio < fim,
+            Agendamento.inicio > inicio - AGENDA_DURACAO_MAX,
+            Agendamento.fim > inicio,
+        )
+    ).mappings().all()
+    linhas = [dict(ocupado) for ocupado in resultado]
+    LISTAGENS.set(chave, linhas)
+    return linhas
+
+
+def disponibilidade(
+    db: Session,
+    inicio: date,
+    dias: int,
+    duracao: timedelta,
+    profissional_id: Optional[int] = None,
+    a_partir_de: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Janelas livres de cada profissional ativo nos `dias` dias a partir de
+    `inicio`: dentro do expediente, sem agendamento do profissional e com
+    ao menos uma cadeira livre. Lê os agendamentos do período de uma vez e
+    monta os índices de intervalos em memória.
+    """
+    profissionais = get_profissionais(db)
+    if profissional_id:
+        profissionais = [profissional for profissional in profissionais if profissional.id == profissional_id]
+    cadeiras = {cadeira.id for cadeira in get_cadeiras(db)}
+
+    periodo_inicio = datetime.combine(inicio, datetime.min.time())
+    periodo_fim = periodo_inicio + timedelta(days=dias)
+    por_profissional: Dict[int, List[Tuple[datetime, datetime]]] = {}
+    por_cadeira: Dict[int, List[Tuple[datetime, datetime]]] = {cadeira_id: [] for cadeira_id in cadeiras}
+    for ocupado in _ocupacao_periodo(db, periodo_inicio, periodo_fim):
+        intervalo = (ocupado["inicio"], ocupado["fim"])
+        por_profissional.setdefault(ocupado["profissional_id"], []).append(intervalo)
+        if ocupado["cadeira_id"] in por_cadeira:
+            por_cadeira[ocupado["cadeira_id"]].append(intervalo)
+
+    # Sem cadeira ativa nada pode ser marcado
+    sem_cadeira = todos_ocupados([IndiceIntervalos(intervalos) for intervalos in por_cadeira.values()])
+    resultado = []
+    for profissional in profissionais:
+        janelas: List[Tuple[datetime, datetime]] = []
+        if cadeiras:
+            ocupado = IndiceIntervalos(por_profissional.get(profissional.id, []) + list(sem_cadeira))
+            janelas = horarios_livres(ocupado, inicio, dias, duracao, a_partir_de)
+        resultado.append({
+            "profissional_id": profissional.id,
+            "nome": profissional.nome,
+            "janelas": [{"inicio": janela_inicio, "fim": janela_fim} for janela_inicio, janela_fim in janelas],
+        })
+    return resultado
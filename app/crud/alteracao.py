@@ -0,0 +1,113 @@
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import and_, delete, func, insert, literal, select, tuple_
+from typing import Dict, Iterable, Optional, Tuple
+
+from models.alteracao import Alteracao
+from models.cliente import Cliente
+from models.procedimento import Procedimento
+
+# Token do início do log: a primeira sincronização recebe tudo
+TOKEN_INICIAL = (0, 0)
+
+MODELOS = {"clientes": Cliente, "procedimentos": Procedimento}
+
+# Linhas por INSERT multi-valores
+LOTE = 1000
+
+
+def _postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def registrar_alteracoes(db: Session, tabela: str, acao: str, ids: Iterable[int]) -> None:
+    """
+    Grava no log, na transação corrente, que os registros `ids` de `tabela`
+    foram gravados (acao="upsert") ou removidos (acao="removido"). Deve ser
+    chamada antes do commit da escrita.
+    """
+    ids = list(ids)
+    transacao = func.txid_current() if _postgres(db) else literal(0)
+    for inicio in range(0, len(ids), LOTE):
+        db.execute(insert(Alteracao.__table__).values([
+            {"transacao": transacao, "tabela": tabela, "registro_id": registro_id, "acao": acao}
+            for registro_id in ids[inicio:inicio + LOTE]
+        ]))
+
+
+def ler_token(token: Optional[str]) -> Tuple[int, int]:
+    """
+    Converte o token "<transacao>-<id>" devolvido pela sincronização.
+    """
+    if not token:
+        return TOKEN_INICIAL
+    transacao, _, alteracao_id = token.partition("-")
+    return int(transacao), int(alteracao_id)
+
+
+def formatar_token(posicao: Tuple[int, int]) -> str:
+    return f"{posicao[0]}-{posicao[1]}"
+
+
+def alteracoes_desde(db: Session, desde: Tuple[int, int], limit: int = 500) -> Dict:
+    """
+    Alterações posteriores a `desde`, na ordem (transacao, id), com no máximo
+    `limit` entradas do log.
+
+    No Postgres a ordem do id não é a ordem dos commits: uma transação mais
+    antiga pode confirmar depois de uma mais nova. Por isso só entram
+    transações anteriores ao xmin do snapshot (todas já encerradas), e o
+    token é a posição (transacao, id): qualquer transação que ainda vá
+    confirmar tem id de transação maior que tudo que já foi devolvido.
+
+    Retorna o novo token, se há mais páginas, os registros atuais de cada
+    tabela alterada e os ids removidos. Um registro que mudou várias vezes
+    no intervalo aparece uma vez, no estado atual.
+    """
+    posicao = tuple_(Alteracao.transacao, Alteracao.id)
+    query = select(Alteracao.transacao, Alteracao.id, Alteracao.tabela, Alteracao.registro_id, Alteracao.acao)
+    query = query.where(posicao > tuple_(literal(desde[0]), literal(desde[1])))
+    if _postgres(db):
+        query = query.where(Alteracao.transacao < func.txid_snapshot_xmin(func.txid_current_snapshot()))
+    linhas = db.execute(query.order_by(Alteracao.transacao, Alteracao.id).limit(limit + 1)).all()
+
+    mais = len(linhas) > limit
+    linhas = linhas[:limit]
+
+    # Última ação de cada registro na página
+    ultimas: Dict[Tuple[str, int], str] = {}
+    for linha in linhas:
+        ultimas[(linha.tabela, linha.registro_id)] = linha.acao
+
+    resultado: Dict = {
+        "token": formatar_token((linhas[-1].transacao, linhas[-1].id) if linhas else desde),
+        "mais": mais,
+    }
+    for tabela, modelo in MODELOS.items():
+        gravados = [registro_id for (nome, registro_id), acao in ultimas.items() if nome == tabela and acao == "upsert"]
+        resultado[tabela] = (
+            db.query(modelo).filter(modelo.id.in_(gravados)).order_by(modelo.id).all() if gravados else []
+        )
+        resultado[f"{tabela}_removidos"] = sorted(
+            registro_id for (nome, registro_id), acao in ultimas.items() if nome == tabela and acao == "removido"
+        )
+    return resultado
+
+
+def compactar_alteracoes(db: Session) -> int:
+    """
+    Remove entradas do log superadas por uma entrada mais nova do mesmo
+    registro. Nenhum token deixa de valer: quem estava antes da entrada
+    removida também está antes da mais nova, que traz o estado atual.
+    Retorna quantas entradas foram removidas.
+    """
+    nova = aliased(Alteracao)
+    superadas = select(nova.id).where(and_(
+        nova.tabela == Alteracao.tabela,
+        nova.registro_id == Alteracao.registro_id,
+        tuple_(nova.transacao, nova.id) > tuple_(Alteracao.transacao, Alteracao.id),
+    ))
+    removidas = db.execute(
+        delete(Alteracao).where(superadas.exists()).execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return removidas
@@ -1,6 +1,10 @@
 from sqlalchemy.orm import Session
 from typing import Optional
-import bcrypt
+from core.cache import CACHE, anexar, linha
+from core.invalidacao import publicar
+from core.email import EMAIL_ATIVO
+from core.metrics import BCRYPT_DURATION
+from core.tarefas import agendar
 from models.usuario import Usuario
 from schemas.login import UsuarioCreate
 
@@ -9,6 +13,8 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verifica se a senha fornecida corresponde ao hash armazenado.
     """
+    import bcrypt  # import sob demanda, fora do caminho de inicialização
+
     try:
         # Converte a senha para bytes se necessário
         if isinstance(plain_password, str):
@@ -16,7 +22,8 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         if isinstance(hashed_password, str):
             hashed_password = hashed_password.encode('utf-8')
         
-        return bcrypt.checkpw(plain_password, hashed_password)
+        with BCRYPT_DURATION.time(operation="verify"):
+            return bcrypt.checkpw(plain_password, hashed_password)
     except Exception:
         return False
 
@@ -25,13 +32,16 @@ def get_password_hash(password: str) -> str:
     """
     Gera o hash da senha usando bcrypt.
     """
+    import bcrypt
+
     # Converte a senha para bytes
     if isinstance(password, str):
         password = password.encode('utf-8')
     
     # Gera o salt e faz o hash
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password, salt)
+    with BCRYPT_DURATION.time(operation="hash"):
+        salt = bcrypt.gensalt()
+        hashed = bcrypt.hashpw(password, salt)
     
     # Retorna como string
     return hashed.decode('utf-8')
@@ -53,9 +63,19 @@ def get_usuario_by_email(db: Session, email: str) -> Optional[Usuario]:
 
 def get_usuario_by_id(db: Session, usuario_id: int) -> Optional[Usuario]:
     """
-    Busca um usuário pelo ID.
+    Busca um usuário pelo ID (chamada em toda requisição autenticada),
+    consultando o cache antes do banco. O hash da senha não vai para o cache:
+    se for acessado, é carregado do banco.
     """
-    return db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    valores = CACHE.get("usuario", usuario_id)
+    if valores is not None:
+        return anexar(db, Usuario, valores)
+
+    geracao = CACHE.geracao("usuario")
+    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    if usuario is not None:
+        CACHE.preencher("usuario", usuario_id, linha(usuario, excluir=("hashed_password",)), geracao)
+    return usuario
 
 
 def autenticar_usuario(db: Session, email: str, password: str) -> Optional[Usuario]:
@@ -78,7 +98,8 @@ def autenticar_usuario(db: Session, email: str, password: str) -> Optional[Usuar
 
 def criar_usuario(db: Session, usuario: UsuarioCreate) -> Usuario:
     """
-    Cria um novo usuário no banco de dados.
+    Cria um novo usuário no banco de dados. Com e-mail configurado
+    (core/email.py), agenda na mesma transação o e-mail de boas-vindas.
     """
     # Verifica se já existe usuário com mesmo username ou email
     if get_usuario_by_username(db, usuario.username):
@@ -99,7 +120,12 @@ def criar_usuario(db: Session, usuario: UsuarioCreate) -> Usuario:
     )
     
     db.add(db_usuario)
+    db.flush()
+    publicar(db, "usuario", [db_usuario.id])
+    if EMAIL_ATIVO:
+        agendar(db, "email_boas_vindas", {"usuario_id": db_usuario.id}, chave=f"email_boas_vindas:{db_usuario.id}")
     db.commit()
     db.refresh(db_usuario)
+    CACHE.set("usuario", db_usuario.id, linha(db_usuario, excluir=("hashed_password",)))
     return db_usuario
 
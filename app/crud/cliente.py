@@ -1,40 +1,69 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List, Optional
+from sqlalchemy import delete, func, insert, or_, select, update
+from typing import Any, Dict, Iterable, List, Optional
 
+from core.autocompletar import indexar
+from core.cache import CACHE, LISTAGENS, anexar, linha
+from core.eventos import emitir
+from core.registros import auditar
+from core.tarefas import agendar
+from crud.alteracao import registrar_alteracoes
+from core.invalidacao import publicar
+from models.agendamento import Agendamento
 from models.cliente import Cliente
+from models.procedimento import Procedimento
 from schemas.cliente import ClienteCreate, ClienteUpdate
 
 
 def criar_cliente(db: Session, cliente: ClienteCreate) -> Cliente:
     """
-    Cria um novo cliente no banco de dados.
+    Cria um novo cliente no banco de dados com um único INSERT ... RETURNING.
     """
-    db_cliente = Cliente(nome=cliente.nome)
-    db.add(db_cliente)
+    criado = dict(db.execute(
+        insert(Cliente).values(nome=cliente.nome).returning(*Cliente.__table__.columns)
+    ).mappings().one())
+    publicar(db, "cliente", [criado["id"]])
+    emitir(db, "cliente", "criado", [criado])
+    auditar(db, "clientes", "criado", [criado])
+    indexar(db, {criado["id"]: criado["nome"]})
+    registrar_alteracoes(db, "clientes", "upsert", [criado["id"]])
     db.commit()
-    db.refresh(db_cliente)
-    return db_cliente
+    CACHE.set("cliente", criado["id"], criado)
+    return anexar(db, Cliente, criado)
 
 
 def get_cliente(db: Session, cliente_id: int) -> Optional[Cliente]:
     """
-    Retorna um cliente pelo seu ID.
+    Retorna um cliente pelo seu ID, consultando o cache antes do banco.
     """
-    return db.query(Cliente).filter(Cliente.id == cliente_id).first()
+    valores = CACHE.get("cliente", cliente_id)
+    if valores is not None:
+        return anexar(db, Cliente, valores)
+
+    # Lida antes da consulta: uma escrita no meio impede gravar a linha velha
+    geracao = CACHE.geracao("cliente")
+    db_cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
+    if db_cliente is not None:
+        CACHE.preencher("cliente", cliente_id, linha(db_cliente), geracao, ttl=CACHE.ttl_leitura(db))
+    return db_cliente
 
 
 def get_clientes(
     db: Session,
     skip: int = 0,
     limit: int = 100,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    include_archived: bool = False
 ) -> List[Cliente]:
     """
     Retorna uma lista de clientes com filtros opcionais.
+    Clientes arquivados só aparecem com include_archived=True.
     """
     query = db.query(Cliente)
 
+    if not include_archived:
+        query = query.filter(Cliente.arquivado_em.is_(None))
+
     # Filtro por busca de nome
     if search:
         query = query.filter(Cliente.nome.ilike(f"%{search}%"))
@@ -45,6 +74,35 @@ def get_clientes(
     return query.offset(skip).limit(limit).all()
 
 
+def _atualizar(db: Session, cliente_id: int, valores: Dict[str, Any]) -> Optional[Cliente]:
+    """
+    UPDATE ... RETURNING em uma ida ao banco: a linha atualizada volta na
+    própria resposta do UPDATE (sem SELECT antes nem refresh depois) e a
+    ausência de linha indica que o cliente não existe.
+    """
+    resultado = db.execute(
+        update(Cliente)
+        .where(Cliente.id == cliente_id)
+        .values(**valores)
+        .returning(*Cliente.__table__.columns)
+        .execution_options(synchronize_session=False)
+    ).mappings().one_or_none()
+    if resultado is None:
+        db.rollback()
+        return None
+
+    atualizado = dict(resultado)
+    publicar(db, "cliente", [cliente_id])
+    emitir(db, "cliente", "atualizado", [atualizado])
+    auditar(db, "clientes", "atualizado", [atualizado])
+    if "nome" in valores:
+        indexar(db, {cliente_id: atualizado["nome"] if atualizado["arquivado_em"] is None else None})
+    registrar_alteracoes(db, "clientes", "upsert", [cliente_id])
+    db.commit()
+    CACHE.set("cliente", cliente_id, atualizado)
+    return anexar(db, Cliente, atualizado)
+
+
 def atualizar_cliente(
     db: Session,
     cliente_id: int,
@@ -53,17 +111,10 @@ def atualizar_cliente(
     """
     Atualiza as informações de um cliente existente.
     """
-    db_cliente = get_cliente(db, cliente_id)
-    if not db_cliente:
-        return None
-
     update_data = cliente_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_cliente, field, value)
-
-    db.commit()
-    db.refresh(db_cliente)
-    return db_cliente
+    if not update_data:
+        return get_cliente(db, cliente_id)
+    return _atualizar(db, cliente_id, update_data)
 
 
 def atualizar_foto_cliente(
@@ -72,27 +123,202 @@ def atualizar_foto_cliente(
     caminho_foto: str
 ) -> Optional[Cliente]:
     """
-    Atualiza o caminho da foto de um cliente.
+    Atualiza o caminho da foto de um cliente. A foto anterior é apagada por
+    uma tarefa agendada na mesma transação (core/tarefas.py): só depois do
+    commit, e não some se a atualização falhar.
     """
-    db_cliente = get_cliente(db, cliente_id)
-    if not db_cliente:
-        return None
+    anterior = db.execute(
+        select(Cliente.caminho_foto).where(Cliente.id == cliente_id).with_for_update()
+    ).scalar()
+    if anterior and anterior != caminho_foto:
+        agendar(db, "remover_fotos", {"caminhos": [anterior]})
+    return _atualizar(db, cliente_id, {"caminho_foto": caminho_foto})
+
 
-    db_cliente.caminho_foto = caminho_foto
+def deletar_clientes(db: Session, cliente_ids: Iterable[int]) -> Dict[int, Optional[str]]:
+    """
+    Deleta vários clientes com um único DELETE ... RETURNING; os procedimentos
+    saem pelo ON DELETE CASCADE da chave estrangeira, sem serem carregados.
+    As fotos e o arquivo frio são apagados por tarefas agendadas na mesma
+    transação (core/tarefas.py). Retorna {id: caminho_foto} dos clientes
+    removidos (os ids inexistentes ficam de fora).
+    """
+    ids = sorted(set(cliente_ids))
+    if not ids:
+        return {}
+
+    # Só os ids (varredura do índice cliente_data), para tirar do cache os
+    # procedimentos que o cascade vai remover e registrar seus tombstones
+    procedimento_ids = db.execute(
+        select(Procedimento.id).where(Procedimento.cliente_id.in_(ids))
+    ).scalars().all()
+    removidos = dict(db.execute(
+        delete(Cliente)
+        .where(Cliente.id.in_(ids))
+        .returning(Cliente.id, Cliente.caminho_foto)
+        .execution_options(synchronize_session=False)
+    ).all())
+    if not removidos:
+        db.rollback()
+        return {}
+
+    # O cascade também remove os agendamentos dos clientes
+    publicar(db, "cliente", list(removidos), tabelas=["agendamentos"])
+    emitir(db, "cliente", "removido", [{"id": cliente_id} for cliente_id in removidos])
+    auditar(db, "clientes", "removido", [{"id": cliente_id} for cliente_id in removidos])
+    indexar(db, {cliente_id: None for cliente_id in removidos})
+    registrar_alteracoes(db, "clientes", "removido", removidos)
+    if procedimento_ids:
+        publicar(db, "procedimento", procedimento_ids, tabelas=["procedimentos"])
+        registrar_alteracoes(db, "procedimentos", "removido", procedimento_ids)
+    fotos = [caminho for caminho in removidos.values() if caminho]
+    if fotos:
+        agendar(db, "remover_fotos", {"caminhos": fotos})
+    agendar(db, "remover_historico_arquivado", {"cliente_ids": list(removidos)})
     db.commit()
-    db.refresh(db_cliente)
-    return db_cliente
+    CACHE.delete("cliente", *removidos)
+    LISTAGENS.nova_geracao("agendamentos")
+    if procedimento_ids:
+        CACHE.delete("procedimento", *procedimento_ids)
+        LISTAGENS.nova_geracao("procedimentos")
+    return removidos
 
 
 def deletar_cliente(db: Session, cliente_id: int) -> bool:
     """
     Deleta um cliente do banco de dados.
     """
-    db_cliente = get_cliente(db, cliente_id)
-    if not db_cliente:
-        return False
+    return bool(deletar_clientes(db, [cliente_id]))
+
+
+def arquivar_clientes(db: Session, cliente_ids: Iterable[int], arquivar: bool = True) -> List[int]:
+    """
+    Arquiva (ou desarquiva) vários clientes com um único UPDATE ... RETURNING.
+    Clientes arquivados saem das listagens, mas mantêm histórico e foto.
+    Retorna os ids afetados.
+    """
+    ids = sorted(set(cliente_ids))
+    if not ids:
+        return []
+
+    # Arquivar de novo mantém a data original
+    valor = func.coalesce(Cliente.arquivado_em, func.now()) if arquivar else None
+    linhas = db.execute(
+        update(Cliente)
+        .where(Cliente.id.in_(ids))
+        .values(arquivado_em=valor)
+        .returning(*Cliente.__table__.columns)
+        .execution_options(synchronize_session=False)
+    ).mappings().all()
+    if not linhas:
+        db.rollback()
+        return []
+
+    atualizados = [dict(registro) for registro in linhas]
+    # A geração de clientes invalida as estatísticas de retorno (crud/retencao.py)
+    publicar(db, "cliente", [valores["id"] for valores in atualizados], tabelas=["clientes"])
+    emitir(db, "cliente", "atualizado", atualizados)
+    auditar(db, "clientes", "arquivado" if arquivar else "restaurado", atualizados)
+    indexar(db, {valores["id"]: None if valores["arquivado_em"] else valores["nome"] for valores in atualizados})
+    registrar_alteracoes(db, "clientes", "upsert", [valores["id"] for valores in atualizados])
+    db.commit()
+    CACHE.set_varios("cliente", {valores["id"]: valores for valores in atualizados})
+    LISTAGENS.nova_geracao("clientes")
+    return [valores["id"] for valores in atualizados]
+
+
+def mesclar_clientes(db: Session, cliente_id: int, duplicado_ids: Iterable[int]) -> Optional[Dict[str, Any]]:
+    """
+    Junta os clientes `duplicado_ids` em `cliente_id` em uma única transação,
+    com um UPDATE por tabela (sem carregar objetos):
+    - procedimentos e agendamentos passam para `cliente_id`;
+    - a foto: o cliente mantém a sua; sem foto, fica com a do primeiro
+      duplicado (menor id) que tiver uma;
+    - os duplicados são removidos (os pares de clientes_duplicados saem pela
+      chave estrangeira).
+    As fotos que deixaram de ser usadas e o arquivo frio dos duplicados são
+    tratados por tarefas agendadas na mesma transação (core/tarefas.py).
+
+    Retorna None se `cliente_id` não existe. Senão, um dicionário com o
+    cliente atualizado, os ids mesclados e os não encontrados e a contagem
+    de procedimentos e agendamentos movidos.
+    """
+    ids = sorted(set(duplicado_ids) - {cliente_id})
+
+    # FOR UPDATE no Postgres: uma mesclagem concorrente dos mesmos clientes
+    # espera esta terminar (no SQLite a transação já é exclusiva na escrita)
+    principal = db.execute(
+        select(Cliente.caminho_foto).where(Cliente.id == cliente_id).with_for_update()
+    ).one_or_none()
+    if principal is None:
+        db.rollback()
+        return None
+    duplicados = db.execute(
+        select(Cliente.id, Cliente.caminho_foto).where(Cliente.id.in_(ids)).order_by(Cliente.id).with_for_update()
+    ).all() if ids else []
+    mesclados = [duplicado.id for duplicado in duplicados]
+    nao_encontrados = sorted(set(ids) - set(mesclados))
+    if not mesclados:
+        db.rollback()
+        return {"cliente": None, "mesclados": [], "nao_encontrados": nao_encontrados,
+                "procedimentos_movidos": 0, "agendamentos_movidos": 0}
+
+    fotos = [duplicado.caminho_foto for duplicado in duplicados if duplicado.caminho_foto]
+    foto = principal.caminho_foto or (fotos[0] if fotos else None)
+    fotos_descartadas = [caminho for caminho in fotos if caminho != foto]
+
+    procedimentos = [dict(registro) for registro in db.execute(
+        update(Procedimento)
+        .where(Procedimento.cliente_id.in_(mesclados))
+        .values(cliente_id=cliente_id)
+        .returning(*Procedimento.__table__.columns)
+        .execution_options(synchronize_session=False)
+    ).mappings().all()]
+    agendamento_ids = db.execute(
+        update(Agendamento)
+        .where(Agendamento.cliente_id.in_(mesclados))
+        .values(cliente_id=cliente_id)
+        .returning(Agendamento.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    atualizado = dict(db.execute(
+        update(Cliente)
+        .where(Cliente.id == cliente_id)
+        .values(caminho_foto=foto)
+        .returning(*Cliente.__table__.columns)
+        .execution_options(synchronize_session=False)
+    ).mappings().one())
+    db.execute(delete(Cliente).where(Cliente.id.in_(mesclados)).execution_options(synchronize_session=False))
 
-    db.delete(db_cliente)
+    procedimento_ids = [valores["id"] for valores in procedimentos]
+    publicar(db, "cliente", [cliente_id, *mesclados], tabelas=["agendamentos"])
+    emitir(db, "cliente", "atualizado", [atualizado])
+    emitir(db, "cliente", "removido", [{"id": removido} for removido in mesclados])
+    auditar(db, "clientes", "atualizado", [atualizado])
+    auditar(db, "clientes", "mesclado", [{"id": removido} for removido in mesclados])
+    indexar(db, {removido: None for removido in mesclados})
+    registrar_alteracoes(db, "clientes", "upsert", [cliente_id])
+    registrar_alteracoes(db, "clientes", "removido", mesclados)
+    if procedimentos:
+        publicar(db, "procedimento", procedimento_ids, tabelas=["procedimentos"])
+        emitir(db, "procedimento", "atualizado", procedimentos)
+        auditar(db, "procedimentos", "atualizado", procedimentos)
+        registrar_alteracoes(db, "procedimentos", "upsert", procedimento_ids)
+    if fotos_descartadas:
+        agendar(db, "remover_fotos", {"caminhos": fotos_descartadas})
+    agendar(db, "transferir_historico_arquivado", {"origens": mesclados, "destino": cliente_id})
     db.commit()
-    return True
 
+    CACHE.set("cliente", cliente_id, atualizado)
+    CACHE.delete("cliente", *mesclados)
+    LISTAGENS.nova_geracao("agendamentos")
+    if procedimentos:
+        CACHE.set_varios("procedimento", {valores["id"]: valores for valores in procedimentos})
+        LISTAGENS.nova_geracao("procedimentos")
+    return {
+        "cliente": anexar(db, Cliente, atualizado),
+        "mesclados": mesclados,
+        "nao_encontrados": nao_encontrados,
+        "procedimentos_movidos": len(procedimentos),
+        "agendamentos_movidos": len(agendamento_ids),
+    }
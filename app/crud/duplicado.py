@@ -0,0 +1,52 @@
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func, select, update
+from typing import Any, Dict, List
+
+from models.cliente import Cliente
+from models.cliente_duplicado import ClienteDuplicado
+
+
+def get_duplicados(db: Session, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+    """
+    Pares pendentes (não descartados) de possíveis duplicados, do mais
+    parecido para o menos, com o nome dos dois clientes.
+    """
+    cliente = aliased(Cliente)
+    duplicado = aliased(Cliente)
+    linhas = db.execute(
+        select(
+            ClienteDuplicado.id,
+            ClienteDuplicado.similaridade,
+            ClienteDuplicado.detectado_em,
+            cliente.id.label("cliente_id"),
+            cliente.nome.label("cliente_nome"),
+            duplicado.id.label("duplicado_id"),
+            duplicado.nome.label("duplicado_nome"),
+        )
+        .join(cliente, cliente.id == ClienteDuplicado.cliente_id)
+        .join(duplicado, duplicado.id == ClienteDuplicado.duplicado_id)
+        .where(ClienteDuplicado.descartado_em.is_(None))
+        .order_by(ClienteDuplicado.similaridade.desc(), ClienteDuplicado.id)
+        .offset(skip)
+        .limit(limit)
+    ).mappings().all()
+    return [dict(linha) for linha in linhas]
+
+
+def descartar_duplicado(db: Session, par_id: int) -> bool:
+    """
+    Marca o par como "não é a mesma pessoa": ele sai da lista e o job não
+    o sugere de novo.
+    """
+    descartado = db.execute(
+        update(ClienteDuplicado)
+        .where(ClienteDuplicado.id == par_id)
+        .values(descartado_em=func.coalesce(ClienteDuplicado.descartado_em, func.now()))
+        .returning(ClienteDuplicado.id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if descartado is None:
+        db.rollback()
+        return False
+    db.commit()
+    return True
@@ -1,42 +1,72 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List, Optional
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from typing import Any, Dict, List, Optional
 from datetime import date
 
+from core.cache import CACHE, LISTAGENS, anexar, linha
+from core.catalogo import CATALOGO
+from core.eventos import emitir
+from core.registros import auditar
+from crud.alteracao import registrar_alteracoes
+from core.invalidacao import publicar
 from models.procedimento import Procedimento
-from models.cliente import Cliente
 from schemas.procedimento import ProcedimentoCreate, ProcedimentoUpdate
 
 
+def inserir_procedimento(db: Session, valores: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    INSERT ... RETURNING do procedimento com a invalidação, o evento e o log
+    de alterações, sem commit: quem chama confirma a transação e depois
+    atualiza os caches. O tipo é resolvido no catálogo (e criado nele, se
+    for novo). Retorna a linha criada.
+    """
+    valores = dict(valores)
+    valores["tipo_procedimento_id"], valores["tipo_procedimento"] = CATALOGO.resolver(db, valores["tipo_procedimento"])
+    criado = dict(db.execute(
+        insert(Procedimento)
+        .values(**valores)
+        .returning(*Procedimento.__table__.columns)
+    ).mappings().one())
+    publicar(db, "procedimento", [criado["id"]], tabelas=["procedimentos"])
+    emitir(db, "procedimento", "criado", [criado])
+    auditar(db, "procedimentos", "criado", [criado])
+    registrar_alteracoes(db, "procedimentos", "upsert", [criado["id"]])
+    return criado
+
+
 def criar_procedimento(db: Session, procedimento: ProcedimentoCreate) -> Procedimento:
     """
-    Cria um novo procedimento para um cliente.
+    Cria um novo procedimento para um cliente com um único INSERT ... RETURNING.
+    A existência do cliente é garantida pela chave estrangeira.
     """
-    # Verifica se o cliente existe
-    cliente = db.query(Cliente).filter(Cliente.id == procedimento.cliente_id).first()
-    if not cliente:
-        raise ValueError("Cliente não encontrado")
-    
-    db_procedimento = Procedimento(
-        cliente_id=procedimento.cliente_id,
-        data_procedimento=procedimento.data_procedimento,
-        tipo_procedimento=procedimento.tipo_procedimento,
-        qtd_tonalizante=procedimento.qtd_tonalizante,
-        valor_procedimento=procedimento.valor_procedimento,
-        observacao=procedimento.observacao,
-        corte=procedimento.corte
-    )
-    db.add(db_procedimento)
+    try:
+        criado = inserir_procedimento(db, procedimento.model_dump())
+    except IntegrityError as exc:
+        db.rollback()
+        if "foreign key" in str(exc.orig).lower():
+            raise ValueError("Cliente não encontrado")
+        raise
+
     db.commit()
-    db.refresh(db_procedimento)
-    return db_procedimento
+    CACHE.set("procedimento", criado["id"], criado)
+    LISTAGENS.nova_geracao("procedimentos")
+    return anexar(db, Procedimento, criado)
 
 
 def get_procedimento(db: Session, procedimento_id: int) -> Optional[Procedimento]:
     """
-    Retorna um procedimento pelo seu ID.
+    Retorna um procedimento pelo seu ID, consultando o cache antes do banco.
     """
-    return db.query(Procedimento).filter(Procedimento.id == procedimento_id).first()
+    valores = CACHE.get("procedimento", procedimento_id)
+    if valores is not None:
+        return anexar(db, Procedimento, valores)
+
+    geracao = CACHE.geracao("procedimento")
+    db_procedimento = db.query(Procedimento).filter(Procedimento.id == procedimento_id).first()
+    if db_procedimento is not None:
+        CACHE.preencher("procedimento", procedimento_id, linha(db_procedimento), geracao, ttl=CACHE.ttl_leitura(db))
+    return db_procedimento
 
 
 def get_procedimentos(
@@ -48,11 +78,46 @@ def get_procedimentos(
     tipo_procedimento: Optional[str] = None,
     data_inicio: Optional[date] = None,
     data_fim: Optional[date] = None,
-    corte: Optional[bool] = None
+    corte: Optional[bool] = None,
+    tipo_procedimento_id: Optional[int] = None
 ) -> List[Procedimento]:
     """
     Retorna uma lista de procedimentos com filtros opcionais.
+
+    O filtro por nome de tipo é resolvido no catálogo em memória (tipos cujo
+    nome contém o texto, sem acento) e vira tipo_procedimento_id IN (...).
+
+    O resultado fica no cache de listagens por alguns segundos, com chave nos
+    filtros normalizados e na página (skip, limit); qualquer escrita em
+    procedimentos invalida todas as listagens.
     """
+    tipo_ids = None
+    if tipo_procedimento_id:
+        tipo_ids = [tipo_procedimento_id]
+    if tipo_procedimento:
+        encontrados = CATALOGO.ids_contendo(tipo_procedimento, db)
+        tipo_ids = [tipo_id for tipo_id in encontrados if tipo_ids is None or tipo_id in tipo_ids]
+    if tipo_ids == []:
+        return []
+
+    # O mesmo texto normalizado vai na chave do cache e na consulta: o ilike
+    # já ignora maiúsculas, e os espaços das pontas mudariam o resultado
+    search = search.strip().lower() if search else None
+
+    filtros = (
+        cliente_id or None,
+        search or None,
+        tipo_ids,
+        data_inicio,
+        data_fim,
+        corte,
+        skip,
+        limit,
+    )
+    chave, linhas = LISTAGENS.get(db, "procedimentos", filtros)
+    if linhas is not None:
+        return [anexar(db, Procedimento, valores) for valores in linhas]
+
     query = db.query(Procedimento)
 
     # Filtro por cliente
@@ -68,11 +133,12 @@ def get_procedimentos(
             )
         )
 
-    # Filtro por tipo de procedimento
-    if tipo_procedimento:
-        query = query.filter(Procedimento.tipo_procedimento.ilike(f"%{tipo_procedimento}%"))
+    # Filtro por tipo de procedimento: igualdade no id, pelo índice (tipo, data)
+    if tipo_ids is not None:
+        query = query.filter(Procedimento.tipo_procedimento_id.in_(tipo_ids))
 
-    # Filtro por data (período)
+    # Filtro por data (período). A coluna é comparada direto com as datas,
+    # sem função ou cast, para o Postgres descartar as partições fora do período
     if data_inicio:
         query = query.filter(Procedimento.data_procedimento >= data_inicio)
     if data_fim:
@@ -82,10 +148,15 @@ def get_procedimentos(
     if corte is not None:
         query = query.filter(Procedimento.corte == corte)
 
-    # Ordena por data do procedimento (mais recente primeiro)
-    query = query.order_by(Procedimento.data_procedimento.desc())
+    # Ordena por data do procedimento (mais recente primeiro); o id desempata
+    # e permite ler direto do índice (data_procedimento, id). Com a tabela
+    # particionada, a ordem pela chave de partição deixa o Postgres ler as
+    # partições da mais recente para a mais antiga e parar no LIMIT
+    query = query.order_by(Procedimento.data_procedimento.desc(), Procedimento.id.desc())
 
-    return query.offset(skip).limit(limit).all()
+    procedimentos = query.offset(skip).limit(limit).all()
+    LISTAGENS.set(chave, [linha(procedimento) for procedimento in procedimentos])
+    return procedimentos
 
 
 def atualizar_procedimento(
@@ -94,30 +165,93 @@ def atualizar_procedimento(
     procedimento_update: ProcedimentoUpdate
 ) -> Optional[Procedimento]:
     """
-    Atualiza as informações de um procedimento existente.
+    Atualiza as informações de um procedimento existente com um único
+    UPDATE ... RETURNING; só os campos enviados são alterados.
     """
-    db_procedimento = get_procedimento(db, procedimento_id)
-    if not db_procedimento:
-        return None
-
     update_data = procedimento_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_procedimento, field, value)
+    if not update_data:
+        return get_procedimento(db, procedimento_id)
+    if update_data.get("tipo_procedimento") is not None:
+        update_data["tipo_procedimento_id"], update_data["tipo_procedimento"] = CATALOGO.resolver(
+            db, update_data["tipo_procedimento"]
+        )
 
+    resultado = db.execute(
+        update(Procedimento)
+        .where(Procedimento.id == procedimento_id)
+        .values(**update_data)
+        .returning(*Procedimento.__table__.columns)
+        .execution_options(synchronize_session=False)
+    ).mappings().one_or_none()
+    if resultado is None:
+        db.rollback()
+        return None
+
+    atualizado = dict(resultado)
+    publicar(db, "procedimento", [procedimento_id], tabelas=["procedimentos"])
+    emitir(db, "procedimento", "atualizado", [atualizado])
+    auditar(db, "procedimentos", "atualizado", [atualizado])
+    registrar_alteracoes(db, "procedimentos", "upsert", [procedimento_id])
     db.commit()
-    db.refresh(db_procedimento)
-    return db_procedimento
+    CACHE.set("procedimento", procedimento_id, atualizado)
+    LISTAGENS.nova_geracao("procedimentos")
+    return anexar(db, Procedimento, atualizado)
 
 
 def deletar_procedimento(db: Session, procedimento_id: int) -> bool:
     """
-    Deleta um procedimento do banco de dados.
+    Deleta um procedimento do banco de dados com DELETE ... RETURNING,
+    sem carregar a linha antes.
     """
-    db_procedimento = get_procedimento(db, procedimento_id)
-    if not db_procedimento:
+    removido = db.execute(
+        delete(Procedimento)
+        .where(Procedimento.id == procedimento_id)
+        .returning(Procedimento.id, Procedimento.cliente_id, Procedimento.data_procedimento)
+        .execution_options(synchronize_session=False)
+    ).mappings().one_or_none()
+    if removido is None:
+        db.rollback()
         return False
 
-    db.delete(db_procedimento)
+    publicar(db, "procedimento", [procedimento_id], tabelas=["procedimentos"])
+    emitir(db, "procedimento", "removido", [dict(removido)])
+    auditar(db, "procedimentos", "removido", [dict(removido)])
+    registrar_alteracoes(db, "procedimentos", "removido", [procedimento_id])
     db.commit()
+    CACHE.delete("procedimento", procedimento_id)
+    LISTAGENS.nova_geracao("procedimentos")
     return True
 
+
+def resumo_por_tipo(
+    db: Session,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None
+) -> List[Dict[str, Any]]:
+    """
+    Quantidade e valor total de procedimentos por tipo no período, com
+    GROUP BY no id do tipo; os nomes vêm do catálogo em memória.
+    """
+    query = select(
+        Procedimento.tipo_procedimento_id,
+        func.count().label("quantidade"),
+        func.sum(Procedimento.valor_procedimento).label("valor_total"),
+    )
+    if data_inicio:
+        query = query.where(Procedimento.data_procedimento >= data_inicio)
+    if data_fim:
+        query = query.where(Procedimento.data_procedimento <= data_fim)
+    linhas = db.execute(query.group_by(Procedimento.tipo_procedimento_id)).all()
+    return sorted(
+        (
+            {
+                "tipo_procedimento_id": linha.tipo_procedimento_id,
+                "nome": CATALOGO.nome(linha.tipo_procedimento_id, db),
+                "quantidade": linha.quantidade,
+                "valor_total": linha.valor_total or 0.0,
+            }
+            for linha in linhas
+        ),
+        key=lambda item: item["quantidade"],
+        reverse=True,
+    )
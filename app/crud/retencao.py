@@ -0,0 +1,122 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import BigInteger, cast, extract, select
+from typing import Any, Dict, List, Optional
+from datetime import date, timedelta
+
+from core.cache import LISTAGENS, DesligadoBackend
+from core.retencao import ESTATISTICAS, Estatisticas, calcular, registro
+from models.cliente import Cliente
+from models.procedimento import Procedimento
+
+_EPOCA = date(1970, 1, 1)
+SEGUNDOS_POR_DIA = 86400
+
+
+def _carregar(db: Session) -> Estatisticas:
+    """
+    Uma consulta com as quatro colunas de todos os procedimentos, lida pelo
+    cursor do driver direto em um array (sem montar um Row por linha), e o
+    cálculo das estatísticas sobre ela. A data vem do banco já em segundos
+    desde 1970 e os clientes arquivados saem no NumPy: no SQLite o JOIN com
+    clientes custa mais que a própria leitura.
+    """
+    import numpy as np  # import sob demanda, fora do caminho de inicialização
+
+    consulta = select(
+        Procedimento.cliente_id,
+        cast(extract("epoch", Procedimento.data_procedimento), BigInteger),
+        Procedimento.valor_procedimento,
+        Procedimento.qtd_tonalizante,
+    )
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.execute(str(consulta.compile(db.get_bind())))
+        # None (tonalizante não informado) vira NaN
+        colunas = np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 4)
+    finally:
+        cursor.close()
+
+    arquivados = db.execute(select(Cliente.id).where(Cliente.arquivado_em.isnot(None))).scalars().all()
+    if arquivados:
+        colunas = colunas[~np.isin(colunas[:, 0], np.array(arquivados, dtype=np.float64))]
+    return calcular(
+        colunas[:, 0].astype(np.int64),
+        colunas[:, 1].astype(np.int64) // SEGUNDOS_POR_DIA,
+        colunas[:, 2],
+        colunas[:, 3],
+    )
+
+
+def estatisticas(db: Session) -> Estatisticas:
+    """
+    Estatísticas de todos os clientes ativos, recalculadas quando procedimentos
+    ou clientes mudam de geração (ver core/cache.py).
+    """
+    chave = None
+    if not isinstance(LISTAGENS.backend, DesligadoBackend):
+        geracoes = (LISTAGENS.geracao("procedimentos"), LISTAGENS.geracao("clientes"))
+        if None not in geracoes:
+            chave = geracoes
+    return ESTATISTICAS.obter(db.info.get("replica") or "primario", chave, lambda: _carregar(db))
+
+
+def _como_data(dia: Optional[float]) -> Optional[date]:
+    return None if dia is None else _EPOCA + timedelta(days=int(dia))
+
+
+def _formatar(valores: Dict[str, Any], hoje: date) -> Dict[str, Any]:
+    for campo in ("primeira_visita", "ultima_visita", "retorno_previsto"):
+        valores[campo] = _como_data(valores[campo])
+    previsto = valores["retorno_previsto"]
+    valores["dias_atraso"] = (hoje - previsto).days if previsto else None
+    return valores
+
+
+def retencao_cliente(db: Session, cliente_id: int, hoje: Optional[date] = None) -> Optional[Dict[str, Any]]:
+    """
+    Estatísticas de retorno de um cliente, ou None se ele não tem
+    procedimentos (ou está arquivado).
+    """
+    dados = estatisticas(db)
+    posicao = dados.posicao(cliente_id)
+    if posicao is None:
+        return None
+    return _formatar(registro(dados, posicao), hoje or date.today())
+
+
+def retorno_previsto(
+    db: Session,
+    hoje: Optional[date] = None,
+    dias: int = 0,
+    visitas_minimas: int = 2,
+    skip: int = 0,
+    limit: int = 100
+) -> List[Dict[str, Any]]:
+    """
+    Clientes com retorno previsto até `dias` depois de hoje (0: só os
+    atrasados), do mais atrasado para o menos, com o nome de cada um.
+    """
+    import numpy as np
+
+    hoje = hoje or date.today()
+    dados = estatisticas(db)
+    colunas = dados.colunas
+    previsto = colunas["retorno_previsto"]
+    limite = (hoje - _EPOCA).days + dias
+    # NaN (uma visita só) nunca passa na comparação
+    with np.errstate(invalid="ignore"):
+        selecionados = np.flatnonzero((previsto <= limite) & (colunas["visitas"] >= visitas_minimas))
+    # Mais atrasado primeiro; no empate, menor id
+    ordem = np.lexsort((colunas["cliente_id"][selecionados], previsto[selecionados]))
+    pagina = selecionados[ordem][skip:skip + limit]
+    if len(pagina) == 0:
+        return []
+
+    ids = [int(cliente_id) for cliente_id in colunas["cliente_id"][pagina]]
+    nomes = dict(db.execute(select(Cliente.id, Cliente.nome).where(Cliente.id.in_(ids))).all())
+    resultado = []
+    for posicao in pagina:
+        valores = _formatar(registro(dados, int(posicao)), hoje)
+        valores["nome"] = nomes.get(valores["cliente_id"])
+        resultado.append(valores)
+    return resultado
@@ -0,0 +1,46 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import update
+from typing import List, Optional
+from datetime import datetime, timezone
+
+from core.tarefas import EXECUTOR
+from models.tarefa import Tarefa
+
+
+def get_tarefas(
+    db: Session,
+    estado: Optional[str] = None,
+    tipo: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> List[Tarefa]:
+    """
+    Tarefas da fila, da próxima a executar para a última, com filtros
+    opcionais de estado e tipo.
+    """
+    query = db.query(Tarefa)
+    if estado:
+        query = query.filter(Tarefa.estado == estado)
+    if tipo:
+        query = query.filter(Tarefa.tipo == tipo)
+    return query.order_by(Tarefa.executar_em, Tarefa.id).offset(skip).limit(limit).all()
+
+
+def reexecutar_tarefa(db: Session, tarefa_id: int) -> Optional[Tarefa]:
+    """
+    Devolve à fila uma tarefa que falhou, com as tentativas zeradas.
+    Retorna None se a tarefa não existe ou não está como "falhou".
+    """
+    reexecutada = db.execute(
+        update(Tarefa)
+        .where(Tarefa.id == tarefa_id, Tarefa.estado == "falhou")
+        .values(estado="pendente", tentativas=0, executar_em=datetime.now(timezone.utc))
+        .returning(Tarefa.id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if reexecutada is None:
+        db.rollback()
+        return None
+    db.commit()
+    EXECUTOR.acordar()
+    return db.get(Tarefa, reexecutada, populate_existing=True)
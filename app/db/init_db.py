@@ -1,22 +1,23 @@
 """
-Script para inicializar o banco de dados criando todas as tabelas.
-Execute este script uma vez para criar as tabelas necessárias.
+Script para inicializar o banco de dados aplicando todas as migrações.
+Equivale a executar "alembic upgrade head" a partir da pasta app/.
 """
-from db.base import Base
-from db.session import engine
-from models.usuario import Usuario
-from models.cliente import Cliente
+import os
+
+from alembic import command
+from alembic.config import Config
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
 
 
 def init_db():
     """
-    Cria todas as tabelas definidas nos modelos.
+    Aplica as migrações pendentes do Alembic.
     """
-    print("Criando tabelas no banco de dados...")
-    Base.metadata.create_all(bind=engine)
-    print("Tabelas criadas com sucesso!")
+    print("Aplicando migrações no banco de dados...")
+    command.upgrade(Config(ALEMBIC_INI), "head")
+    print("Banco de dados atualizado com sucesso!")
 
 
 if __name__ == "__main__":
     init_db()
-
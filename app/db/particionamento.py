@@ -0,0 +1,203 @@
+"""
+Particionamento mensal da tabela procedimentos (Postgres).
+
+A migração 0004 transforma procedimentos em uma tabela particionada por
+intervalo de data_procedimento, com uma partição por mês
+(procedimentos_pAAAA_MM) e uma partição DEFAULT para datas sem partição.
+Aqui ficam a criação das partições e a manutenção que garante as partições
+dos próximos PARTICOES_MESES_A_FRENTE meses, executada na inicialização de
+cada worker e a cada PARTICOES_INTERVALO_S segundos.
+
+Uma partição nova é criada como tabela avulsa, recebe as linhas do mês que
+tenham caído na DEFAULT e só então é anexada: assim um mês que recebeu dados
+antes de ter partição (datas retroativas, por exemplo) é corrigido sem erro.
+
+Em SQLite ou com a tabela ainda não particionada, tudo aqui é ignorado.
+"""
+import logging
+import os
+import re
+import threading
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+TABELA = "procedimentos"
+PARTICAO_DEFAULT = f"{TABELA}_default"
+PARTICOES_MESES_A_FRENTE = int(os.getenv("PARTICOES_MESES_A_FRENTE", "3"))
+PARTICOES_INTERVALO_S = float(os.getenv("PARTICOES_INTERVALO_S", "43200"))
+
+# Os mesmos índices da tabela pai (migrações 0002/0004/0007), com nomes previsíveis
+# por partição: o ATTACH aproveita estes em vez de criar outros com nomes
+# gerados, e os planos continuam mostrando o índice esperado
+INDICES_PARTICAO = (
+    ("id", "(id)", ""),
+    ("cliente_data", "(cliente_id, data_procedimento DESC, id DESC)", ""),
+    ("data_id", "(data_procedimento, id)", ""),
+    ("corte_data", "(data_procedimento, id)", " WHERE corte"),
+    ("tipo_data", "(tipo_procedimento_id, data_procedimento)", ""),
+)
+
+
+def inicio_do_mes(dia: date) -> date:
+    return dia.replace(day=1)
+
+
+def proximo_mes(dia: date) -> date:
+    return date(dia.year + dia.month // 12, dia.month % 12 + 1, 1)
+
+
+def nome_particao(inicio: date) -> str:
+    return f"{TABELA}_p{inicio:%Y_%m}"
+
+
+def eh_particao(nome: str) -> bool:
+    return nome == PARTICAO_DEFAULT or re.fullmatch(rf"{TABELA}_p\d{{4}}_\d{{2}}", nome) is not None
+
+
+def particionada(conexao: Connection) -> bool:
+    if conexao.dialect.name != "postgresql":
+        return False
+    return bool(conexao.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:tabela))"
+    ), {"tabela": TABELA}).scalar())
+
+
+def _existe(conexao: Connection, nome: str) -> bool:
+    return conexao.execute(text("SELECT to_regclass(:nome) IS NOT NULL"), {"nome": nome}).scalar()
+
+
+def _colunas(conexao: Connection) -> set:
+    return set(conexao.execute(text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = :tabela"
+    ), {"tabela": TABELA}).scalars())
+
+
+def criar_particao(conexao: Connection, inicio: Optional[date]) -> Optional[str]:
+    """
+    Cria e anexa a partição do mês que começa em `inicio` (None para a
+    DEFAULT). Retorna o nome da partição criada, ou None se ela já existia.
+    """
+    nome = PARTICAO_DEFAULT if inicio is None else nome_particao(inicio)
+    if _existe(conexao, nome):
+        return None
+
+    conexao.execute(text(f"CREATE TABLE {nome} (LIKE {TABELA} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    existentes = _colunas(conexao)
+    for sufixo, colunas, filtro in INDICES_PARTICAO:
+        # A migração 0004 cria partições antes de a 0007 criar
+        # tipo_procedimento_id; lá o índice vem do CREATE INDEX da 0007
+        if any(coluna.split()[0] not in existentes for coluna in colunas.strip("()").split(",")):
+            continue
+        conexao.execute(text(f"CREATE INDEX ix_{nome}_{sufixo} ON {nome} {colunas}{filtro}"))
+
+    if inicio is None:
+        conexao.execute(text(f"ALTER TABLE {TABELA} ATTACH PARTITION {nome} DEFAULT"))
+        return nome
+
+    fim = proximo_mes(inicio)
+    intervalo = {"inicio": inicio, "fim": fim}
+    if _existe(conexao, PARTICAO_DEFAULT):
+        # Linhas do mês que caíram na DEFAULT vão para a partição nova
+        conexao.execute(text(
+            f"INSERT INTO {nome} SELECT * FROM {PARTICAO_DEFAULT} "
+            "WHERE data_procedimento >= :inicio AND data_procedimento < :fim"
+        ), intervalo)
+        conexao.execute(text(
+            f"DELETE FROM {PARTICAO_DEFAULT} WHERE data_procedimento >= :inicio AND data_procedimento < :fim"
+        ), intervalo)
+    conexao.execute(text(
+        f"ALTER TABLE {TABELA} ATTACH PARTITION {nome} FOR VALUES FROM ('{inicio:%Y-%m-%d}') TO ('{fim:%Y-%m-%d}')"
+    ))
+    return nome
+
+
+def garantir_particoes(engine: Engine, meses_a_frente: int = PARTICOES_MESES_A_FRENTE) -> List[str]:
+    """
+    Cria as partições do mês atual e dos próximos `meses_a_frente` meses, e
+    as dos meses que tenham linhas na DEFAULT. Um advisory lock evita que
+    vários workers criem a mesma partição ao mesmo tempo.
+    """
+    if engine.dialect.name != "postgresql":
+        return []
+
+    criadas: List[str] = []
+    with engine.begin() as conexao:
+        if not particionada(conexao):
+            return []
+        conexao.execute(text("SELECT pg_advisory_xact_lock(hashtext('particoes_procedimentos'))"))
+
+        meses = set()
+        mes = inicio_do_mes(date.today())
+        for _ in range(meses_a_frente + 1):
+            meses.add(mes)
+            mes = proximo_mes(mes)
+        if _existe(conexao, PARTICAO_DEFAULT):
+            meses.update(
+                linha[0].date() if hasattr(linha[0], "date") else linha[0]
+                for linha in conexao.execute(text(
+                    f"SELECT DISTINCT date_trunc('month', data_procedimento) FROM {PARTICAO_DEFAULT}"
+                ))
+            )
+
+        for inicio in sorted(meses):
+            nome = criar_particao(conexao, inicio)
+            if nome:
+                criadas.append(nome)
+    if criadas:
+        logger.info("Partições criadas: %s", ", ".join(criadas))
+    return criadas
+
+
+class ManutencaoParticoes(threading.Thread):
+    """
+    Repete garantir_particoes() a cada PARTICOES_INTERVALO_S segundos.
+    """
+
+    def __init__(self, engine: Engine, intervalo_s: float = PARTICOES_INTERVALO_S):
+        super().__init__(daemon=True, name="manutencao-particoes")
+        self.engine = engine
+        self.intervalo_s = intervalo_s
+        self._parar = threading.Event()
+
+    def parar(self) -> None:
+        self._parar.set()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo_s):
+            try:
+                garantir_particoes(self.engine)
+            except Exception as exc:
+                logger.warning("Falha ao criar partições de procedimentos: %s", exc)
+
+
+_manutencao: Optional[ManutencaoParticoes] = None
+
+
+def iniciar_manutencao() -> None:
+    """
+    Garante as partições agora e agenda as próximas verificações (Postgres).
+    """
+    global _manutencao
+    from db.session import engine
+
+    if engine.dialect.name != "postgresql" or _manutencao is not None:
+        return
+    try:
+        garantir_particoes(engine)
+    except Exception as exc:
+        logger.warning("Falha ao criar partições de procedimentos: %s", exc)
+    _manutencao = ManutencaoParticoes(engine)
+    _manutencao.start()
+
+
+def parar_manutencao() -> None:
+    global _manutencao
+    if _manutencao is not None:
+        _manutencao.parar()
+        _manutencao = None
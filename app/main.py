@@ -1,21 +1,44 @@
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from v1 import cliente, login, procedimento
-from db.base import Base
-from db.session import engine
-from models.usuario import Usuario
-from models.cliente import Cliente
-from models.procedimento import Procedimento
+from v1 import cliente, login, procedimento, diagnostico, eventos, sincronizacao, agenda
+from core.metrics import MetricsMiddleware, REGISTRY, CONTENT_TYPE_LATEST, coletar_threadpool
+from core.profiling import ProfilingMiddleware
+from core.memoria import MemoriaMiddleware
+from core.concorrencia import ConcorrenciaMiddleware
+from core.registros import AcessoMiddleware
+from core.inicializacao import lifespan
 
 app = FastAPI(
     title="Sistema de Salão - API",
     description="API para gerenciamento de clientes e procedimentos do salão",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
-# Configurar CORS para permitir requisições do frontend
+# Orçamento de concorrência por classe de rota (503 com Retry-After quando
+# saturada); fica por dentro das métricas para que as recusas sejam contadas
+app.add_middleware(ConcorrenciaMiddleware)
+
+# Métricas por rota (contagem, latência, requisições em andamento)
+app.add_middleware(MetricsMiddleware)
+
+# Profiling sob demanda (header X-Profile: 1, apenas administradores)
+app.add_middleware(ProfilingMiddleware)
+
+# Memória retida por rota (só mede enquanto o tracemalloc estiver ativo)
+app.add_middleware(MemoriaMiddleware)
+
+# Log de acesso em JSON e contexto da auditoria (id da requisição e usuário),
+# gravados em lote fora da requisição; por fora dos demais (menos o CORS)
+# para medir o tempo total
+app.add_middleware(AcessoMiddleware)
+
+# Configurar CORS para permitir requisições do frontend. Adicionado por
+# último para ficar por fora de tudo: os preflights (OPTIONS) são respondidos
+# aqui sem gastar o orçamento de concorrência, e as recusas 503 também levam
+# os cabeçalhos CORS (com Retry-After visível para o navegador)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -28,6 +51,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
 
@@ -58,18 +82,17 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         }
     )
 
-# Criar tabelas automaticamente ao iniciar (apenas se não existirem)
-@app.on_event("startup")
-def on_startup():
-    """
-    Cria as tabelas no banco de dados quando a aplicação inicia.
-    """
-    Base.metadata.create_all(bind=engine)
+# O esquema do banco é gerenciado pelo Alembic (alembic upgrade head), executado
+# uma vez antes de subir os workers, e não mais a cada inicialização.
 
 # Registrar os routers
 app.include_router(login.router, prefix="/api/v1/auth", tags=["Autenticação"])
 app.include_router(cliente.router, prefix="/api/v1/clientes", tags=["Clientes"])
 app.include_router(procedimento.router, prefix="/api/v1/procedimentos", tags=["Procedimentos"])
+app.include_router(diagnostico.router, prefix="/api/v1/diagnostico", tags=["Diagnóstico"])
+app.include_router(eventos.router, prefix="/api/v1/eventos", tags=["Eventos"])
+app.include_router(sincronizacao.router, prefix="/api/v1/sync", tags=["Sincronização"])
+app.include_router(agenda.router, prefix="/api/v1/agenda", tags=["Agenda"])
 
 
 @app.get("/")
@@ -81,3 +104,13 @@ def root():
 def health_check():
     return {"status": "ok"}
 
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Expõe as métricas da aplicação no formato texto do Prometheus.
+    É async para ler o estado do pool de threads de dentro do event loop.
+    """
+    coletar_threadpool()
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
+
@@ -0,0 +1,77 @@
+"""
+Ambiente do Alembic: usa a mesma URL e os mesmos modelos da aplicação.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+
+from db.base import Base
+from db.particionamento import eh_particao
+from db.session import DATABASE_URL
+from models.usuario import Usuario
+from models.cliente import Cliente
+from models.procedimento import Procedimento
+from models.tipo_procedimento import TipoProcedimento
+from models.alteracao import Alteracao
+from models.profissional import Profissional
+from models.cadeira import Cadeira
+from models.agendamento import Agendamento
+from models.cliente_duplicado import ClienteDuplicado
+from models.auditoria import Auditoria
+from models.tarefa import Tarefa
+
+config = context.config
+config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def incluir_objeto(objeto, nome, tipo, refletido, comparado_com) -> bool:
+    """
+    Deixa as partições de procedimentos (e seus índices) fora do autogenerate:
+    elas não existem nos modelos e são criadas pelos workers.
+    """
+    if tipo == "table":
+        return not eh_particao(nome)
+    if tipo == "index" and objeto.table is not None:
+        return not eh_particao(objeto.table.name)
+    return True
+
+
+def run_migrations_offline() -> None:
+    """
+    Gera o SQL das migrações sem conectar ao banco (alembic upgrade head --sql).
+    """
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata, include_object=incluir_objeto)
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,85 @@
+"""esquema inicial
+
+Cria as tabelas usuarios, clientes e procedimentos como estavam antes do
+Alembic (create_all + migrate_db.sql). Em bancos que já têm as tabelas, só
+cria as que faltarem, então pode ser aplicada sobre uma instalação existente.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existe(tabela: str) -> bool:
+    if op.get_context().as_sql:
+        return False  # modo offline (--sql): não há conexão para inspecionar
+    return sa.inspect(op.get_bind()).has_table(tabela)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _existe("usuarios"):
+        op.create_table(
+            "usuarios",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("nome_completo", sa.String(), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("is_admin", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_usuarios_id", "usuarios", ["id"])
+        op.create_index("ix_usuarios_username", "usuarios", ["username"], unique=True)
+        op.create_index("ix_usuarios_email", "usuarios", ["email"], unique=True)
+
+    if not _existe("clientes"):
+        op.create_table(
+            "clientes",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("nome", sa.String(), nullable=False),
+            sa.Column("caminho_foto", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_clientes_id", "clientes", ["id"])
+        op.create_index("ix_clientes_nome", "clientes", ["nome"])
+
+    if not _existe("procedimentos"):
+        op.create_table(
+            "procedimentos",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("cliente_id", sa.Integer(), sa.ForeignKey("clientes.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("data_procedimento", sa.Date(), nullable=False),
+            sa.Column("tipo_procedimento", sa.String(), nullable=False),
+            sa.Column("qtd_tonalizante", sa.Float(), nullable=True),
+            sa.Column("valor_procedimento", sa.Float(), nullable=False),
+            sa.Column("observacao", sa.String(), nullable=True),
+            sa.Column("corte", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_procedimentos_id", "procedimentos", ["id"])
+        op.create_index("ix_procedimentos_cliente_id", "procedimentos", ["cliente_id"])
+        op.create_index("ix_procedimentos_data_procedimento", "procedimentos", ["data_procedimento"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("procedimentos")
+    op.drop_table("clientes")
+    op.drop_table("usuarios")
@@ -0,0 +1,84 @@
+"""índices para as consultas de procedimentos
+
+Índices alinhados aos formatos de consulta do crud:
+- (cliente_id, data_procedimento DESC, id DESC): histórico do cliente já na
+  ordem da listagem (o id desempata visitas no mesmo dia);
+- (data_procedimento, id): listagens e filtros por período, com desempate estável;
+- parcial (data_procedimento, id) WHERE corte: filtro corte=true, que é minoria.
+
+Os índices de coluna única em cliente_id e data_procedimento ficam redundantes
+(são prefixo dos novos) e são removidos para baratear as escritas.
+
+No Postgres tudo é feito com CREATE/DROP INDEX CONCURRENTLY, fora de transação,
+para não bloquear escritas na tabela. Se um CREATE CONCURRENTLY falhar, o índice
+fica INVALID: remova-o (DROP INDEX CONCURRENTLY) e rode a migração de novo.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Índices antigos: os do create_all e os criados à mão pelo migrate_db.sql
+INDICES_REDUNDANTES = (
+    "ix_procedimentos_cliente_id",
+    "ix_procedimentos_data_procedimento",
+    "idx_procedimentos_cliente_id",
+    "idx_procedimentos_data",
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_procedimentos_cliente_data",
+            "procedimentos",
+            ["cliente_id", sa.text("data_procedimento DESC"), sa.text("id DESC")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_procedimentos_data_id",
+            "procedimentos",
+            ["data_procedimento", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_procedimentos_corte_data",
+            "procedimentos",
+            ["data_procedimento", "id"],
+            postgresql_where=sa.text("corte"),
+            sqlite_where=sa.text("corte"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        for nome in INDICES_REDUNDANTES:
+            op.drop_index(nome, table_name="procedimentos", postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_procedimentos_cliente_id", "procedimentos", ["cliente_id"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_procedimentos_data_procedimento", "procedimentos", ["data_procedimento"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        for nome in ("ix_procedimentos_corte_data", "ix_procedimentos_data_id", "ix_procedimentos_cliente_data"):
+            op.drop_index(nome, table_name="procedimentos", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,33 @@
+"""clientes arquivados
+
+Adiciona clientes.arquivado_em, preenchida pelo arquivamento em lote
+(POST /api/v1/clientes/lote). A coluna é nula e sem default, então o ALTER
+TABLE não reescreve a tabela no Postgres.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("clientes", sa.Column("arquivado_em", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("clientes") as batch_op:
+        batch_op.drop_column("arquivado_em")
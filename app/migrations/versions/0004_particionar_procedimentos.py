@@ -0,0 +1,150 @@
+"""procedimentos particionada por mês
+
+Converte procedimentos em tabela particionada por intervalo de
+data_procedimento (Postgres), com uma partição por mês e uma DEFAULT:
+1. a tabela atual vira procedimentos_legado (índices renomeados com _legado);
+2. a nova procedimentos é criada com PARTITION BY RANGE e chave primária
+   (id, data_procedimento), porque toda chave única precisa conter a coluna
+   de particionamento; o id continua vindo da mesma sequence;
+3. são criadas as partições de todos os meses com dados, até
+   PARTICOES_MESES_A_FRENTE meses à frente, e a DEFAULT;
+4. os dados são copiados e a tabela legada é removida.
+
+Tudo roda em uma transação, com a tabela antiga bloqueada durante a cópia:
+em bases grandes, aplique em uma janela de manutenção. As partições dos meses
+seguintes são criadas pelos workers (db/particionamento.py).
+
+Em SQLite a migração não faz nada. Ela precisa de conexão com o banco (os
+meses das partições vêm dos dados), então não roda no modo offline (--sql).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from db.particionamento import PARTICOES_MESES_A_FRENTE, criar_particao, inicio_do_mes, proximo_mes
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUNAS = (
+    "id, cliente_id, data_procedimento, tipo_procedimento, qtd_tonalizante, "
+    "valor_procedimento, observacao, corte, created_at, updated_at"
+)
+INDICES = (
+    "ix_procedimentos_id",
+    "ix_procedimentos_cliente_data",
+    "ix_procedimentos_data_id",
+    "ix_procedimentos_corte_data",
+)
+
+
+def _postgres() -> bool:
+    contexto = op.get_context()
+    if contexto.dialect.name != "postgresql":
+        return False
+    if contexto.as_sql:
+        raise RuntimeError("A migração 0004 precisa de conexão com o banco; rode sem --sql")
+    return True
+
+
+def _criar_indices() -> None:
+    op.create_index("ix_procedimentos_id", "procedimentos", ["id"])
+    op.create_index(
+        "ix_procedimentos_cliente_data", "procedimentos",
+        ["cliente_id", sa.text("data_procedimento DESC"), sa.text("id DESC")],
+    )
+    op.create_index("ix_procedimentos_data_id", "procedimentos", ["data_procedimento", "id"])
+    op.create_index(
+        "ix_procedimentos_corte_data", "procedimentos", ["data_procedimento", "id"],
+        postgresql_where=sa.text("corte"),
+    )
+
+
+def _renomear_legado(tabela: str, pkey: str) -> None:
+    op.execute("LOCK TABLE procedimentos IN ACCESS EXCLUSIVE MODE")
+    op.execute(f"ALTER TABLE procedimentos RENAME TO {tabela}")
+    op.execute(f"ALTER INDEX IF EXISTS procedimentos_pkey RENAME TO {pkey}")
+    for nome in INDICES:
+        op.execute(f"ALTER INDEX IF EXISTS {nome} RENAME TO {nome}_legado")
+    op.execute("ALTER SEQUENCE procedimentos_id_seq OWNED BY NONE")
+
+
+def _remover_legado(tabela: str) -> None:
+    op.execute("SELECT setval('procedimentos_id_seq', (SELECT coalesce(max(id), 0) + 1 FROM procedimentos), false)")
+    op.execute("ALTER SEQUENCE procedimentos_id_seq OWNED BY procedimentos.id")
+    op.execute(f"DROP TABLE {tabela}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _postgres():
+        return
+
+    _renomear_legado("procedimentos_legado", "procedimentos_legado_pkey")
+    op.execute("""
+        CREATE TABLE procedimentos (
+            id integer NOT NULL DEFAULT nextval('procedimentos_id_seq'),
+            cliente_id integer NOT NULL REFERENCES clientes (id) ON DELETE CASCADE,
+            data_procedimento date NOT NULL,
+            tipo_procedimento varchar NOT NULL,
+            qtd_tonalizante double precision,
+            valor_procedimento double precision NOT NULL,
+            observacao varchar,
+            corte boolean,
+            created_at timestamp with time zone DEFAULT now(),
+            updated_at timestamp with time zone,
+            PRIMARY KEY (id, data_procedimento)
+        ) PARTITION BY RANGE (data_procedimento)
+    """)
+    _criar_indices()
+
+    conexao = op.get_bind()
+    primeiro = conexao.execute(sa.text("SELECT min(data_procedimento) FROM procedimentos_legado")).scalar()
+    mes = inicio_do_mes(min(primeiro or date.today(), date.today()))
+    ultimo = inicio_do_mes(date.today())
+    for _ in range(PARTICOES_MESES_A_FRENTE):
+        ultimo = proximo_mes(ultimo)
+    while mes <= ultimo:
+        criar_particao(conexao, mes)
+        mes = proximo_mes(mes)
+    criar_particao(conexao, None)
+
+    op.execute(f"INSERT INTO procedimentos ({COLUNAS}) SELECT {COLUNAS} FROM procedimentos_legado")
+    _remover_legado("procedimentos_legado")
+    op.execute("ANALYZE procedimentos")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not _postgres():
+        return
+
+    _renomear_legado("procedimentos_particionada", "procedimentos_particionada_pkey")
+    op.execute("""
+        CREATE TABLE procedimentos (
+            id integer PRIMARY KEY DEFAULT nextval('procedimentos_id_seq'),
+            cliente_id integer NOT NULL REFERENCES clientes (id) ON DELETE CASCADE,
+            data_procedimento date NOT NULL,
+            tipo_procedimento varchar NOT NULL,
+            qtd_tonalizante double precision,
+            valor_procedimento double precision NOT NULL,
+            observacao varchar,
+            corte boolean,
+            created_at timestamp with time zone DEFAULT now(),
+            updated_at timestamp with time zone
+        )
+    """)
+    op.execute(f"INSERT INTO procedimentos ({COLUNAS}) SELECT {COLUNAS} FROM procedimentos_particionada")
+    _remover_legado("procedimentos_particionada")
+    _criar_indices()
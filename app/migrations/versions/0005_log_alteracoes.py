@@ -0,0 +1,51 @@
+"""log de alterações para a sincronização incremental
+
+Cria a tabela alteracoes (GET /api/v1/sync/alteracoes) e a preenche com uma
+entrada "upsert" para cada cliente e procedimento existente, para que a
+primeira sincronização (sem token) traga a base inteira pelo próprio log.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "alteracoes",
+        sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True),
+        sa.Column("transacao", sa.BigInteger(), nullable=False),
+        sa.Column("tabela", sa.String(length=20), nullable=False),
+        sa.Column("registro_id", sa.Integer(), nullable=False),
+        sa.Column("acao", sa.String(length=10), nullable=False),
+        sa.Column("criado_em", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_alteracoes_transacao_id", "alteracoes", ["transacao", "id"])
+    op.create_index("ix_alteracoes_registro", "alteracoes", ["tabela", "registro_id"])
+
+    transacao = "txid_current()" if op.get_context().dialect.name == "postgresql" else "0"
+    for tabela in ("clientes", "procedimentos"):
+        op.execute(
+            f"INSERT INTO alteracoes (transacao, tabela, registro_id, acao) "
+            f"SELECT {transacao}, '{tabela}', id, 'upsert' FROM {tabela} ORDER BY id"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_alteracoes_registro", table_name="alteracoes")
+    op.drop_index("ix_alteracoes_transacao_id", table_name="alteracoes")
+    op.drop_table("alteracoes")
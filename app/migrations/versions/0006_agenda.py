@@ -0,0 +1,89 @@
+"""agenda: profissionais, cadeiras e agendamentos
+
+No Postgres, duas restrições de exclusão (btree_gist) impedem agendamentos
+ativos sobrepostos no mesmo profissional ou na mesma cadeira, inclusive
+entre escritas concorrentes que passaram juntas pela conferência do crud.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+EXCLUSOES = {
+    "ex_agendamentos_profissional": "profissional_id",
+    "ex_agendamentos_cadeira": "cadeira_id",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "profissionais",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("nome", sa.String(), nullable=False),
+        sa.Column("ativo", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_profissionais_id", "profissionais", ["id"])
+
+    op.create_table(
+        "cadeiras",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("nome", sa.String(), nullable=False),
+        sa.Column("ativa", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_cadeiras_id", "cadeiras", ["id"])
+
+    op.create_table(
+        "agendamentos",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cliente_id", sa.Integer(), sa.ForeignKey("clientes.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("profissional_id", sa.Integer(), sa.ForeignKey("profissionais.id"), nullable=False),
+        sa.Column("cadeira_id", sa.Integer(), sa.ForeignKey("cadeiras.id"), nullable=False),
+        sa.Column("inicio", sa.DateTime(), nullable=False),
+        sa.Column("fim", sa.DateTime(), nullable=False),
+        sa.Column("tipo_procedimento", sa.String(), nullable=False),
+        sa.Column("valor_previsto", sa.Float(), nullable=True),
+        sa.Column("observacao", sa.String(), nullable=True),
+        sa.Column("status", sa.String(length=10), nullable=False),
+        sa.Column("procedimento_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.CheckConstraint("fim > inicio", name="ck_agendamentos_intervalo"),
+    )
+    op.create_index("ix_agendamentos_id", "agendamentos", ["id"])
+    op.create_index("ix_agendamentos_profissional_inicio", "agendamentos", ["profissional_id", "inicio"])
+    op.create_index("ix_agendamentos_cadeira_inicio", "agendamentos", ["cadeira_id", "inicio"])
+    op.create_index("ix_agendamentos_inicio", "agendamentos", ["inicio"])
+    op.create_index("ix_agendamentos_cliente_inicio", "agendamentos", ["cliente_id", "inicio"])
+
+    if op.get_context().dialect.name == "postgresql":
+        # btree_gist permite combinar igualdade de inteiro e sobreposição de
+        # intervalo na mesma restrição; intervalos [inicio, fim) que só se
+        # encostam não conflitam
+        op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+        for nome, coluna in EXCLUSOES.items():
+            op.execute(
+                f"ALTER TABLE agendamentos ADD CONSTRAINT {nome} EXCLUDE USING gist "
+                f"({coluna} WITH =, tsrange(inicio, fim) WITH &&) WHERE (status <> 'cancelado')"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("agendamentos")
+    op.drop_table("cadeiras")
+    op.drop_table("profissionais")
@@ -0,0 +1,148 @@
+"""catálogo de tipos de procedimento
+
+Cria tipos_procedimento e a chave estrangeira procedimentos.tipo_procedimento_id:
+1. os textos distintos de procedimentos.tipo_procedimento são agrupados pela
+   forma normalizada (sem acento, minúsculo, espaços simples), de modo que
+   "Coloração", "coloracao" e "Coloração " viram uma única entrada;
+2. o nome de cada entrada é a variante mais usada (no empate, a com mais
+   acentos, depois a com só a inicial maiúscula, depois a primeira em ordem
+   alfabética);
+3. um único UPDATE preenche o id e troca o texto pelo nome do catálogo, por
+   uma tabela temporária variante -> tipo;
+4. o índice (tipo_procedimento_id, data_procedimento) é criado no fim (no
+   Postgres particionado ele é criado em todas as partições).
+
+O UPDATE reescreve todas as linhas de procedimentos: em bases grandes,
+aplique em uma janela de manutenção. Os agrupamentos dependem dos dados,
+então a migração não roda no modo offline (--sql).
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+
+"""
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Sequence, Tuple, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _normalizar(texto: str) -> str:
+    # Cópia de core/texto.py: a migração não deve mudar se o app mudar
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acento = "".join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+    return " ".join(sem_acento.casefold().split())
+
+
+def _nome_do_grupo(variantes: List[Tuple[str, int]]) -> str:
+    def preferencia(variante: Tuple[str, int]):
+        texto, usos = variante
+        acentos = sum(1 for caractere in texto if not caractere.isascii())
+        capitalizada = texto.strip()[:1].isupper() and not texto.isupper()
+        return (-usos, -acentos, not capitalizada, texto)
+
+    return " ".join(min(variantes, key=preferencia)[0].split())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    contexto = op.get_context()
+    if contexto.as_sql:
+        raise RuntimeError("A migração 0007 precisa de conexão com o banco; rode sem --sql")
+    conexao = op.get_bind()
+
+    op.create_table(
+        "tipos_procedimento",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("nome", sa.String(length=100), nullable=False),
+        sa.Column("chave", sa.String(length=100), nullable=False, unique=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_tipos_procedimento_id", "tipos_procedimento", ["id"])
+    if conexao.dialect.name == "sqlite":
+        # SQLite aceita a referência no ADD COLUMN; o modo batch recriaria a
+        # tabela e perderia a ordem DESC de ix_procedimentos_cliente_data
+        op.execute("ALTER TABLE procedimentos ADD COLUMN tipo_procedimento_id INTEGER REFERENCES tipos_procedimento (id)")
+    else:
+        op.add_column("procedimentos", sa.Column("tipo_procedimento_id", sa.Integer(), nullable=True))
+        op.create_foreign_key(
+            "procedimentos_tipo_procedimento_id_fkey", "procedimentos", "tipos_procedimento",
+            ["tipo_procedimento_id"], ["id"],
+        )
+
+    # 1-2. Agrupamento das variantes existentes
+    grupos: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+    for texto, usos in conexao.execute(sa.text(
+        "SELECT tipo_procedimento, COUNT(*) FROM procedimentos GROUP BY tipo_procedimento"
+    )):
+        chave = _normalizar(texto)
+        if chave:
+            grupos[chave].append((texto, usos))
+
+    tipos = sa.table(
+        "tipos_procedimento", sa.column("id", sa.Integer), sa.column("nome", sa.String), sa.column("chave", sa.String)
+    )
+    variantes = sa.table("tipos_procedimento_variantes", sa.column("variante", sa.String), sa.column("tipo_id", sa.Integer))
+    op.create_table(
+        "tipos_procedimento_variantes",
+        sa.Column("variante", sa.String(), primary_key=True),
+        sa.Column("tipo_id", sa.Integer(), nullable=False),
+    )
+    linhas_variantes = []
+    for chave in sorted(grupos):
+        nome = _nome_do_grupo(grupos[chave])
+        tipo_id = conexao.execute(tipos.insert().values(nome=nome, chave=chave).returning(tipos.c.id)).scalar()
+        linhas_variantes.extend({"variante": texto, "tipo_id": tipo_id} for texto, _ in grupos[chave])
+    if linhas_variantes:
+        op.bulk_insert(variantes, linhas_variantes)
+
+    # 3. Um UPDATE para a tabela inteira, pela chave primária da tabela de variantes
+    op.execute("""
+        UPDATE procedimentos SET
+            tipo_procedimento_id = (
+                SELECT v.tipo_id FROM tipos_procedimento_variantes v
+                WHERE v.variante = procedimentos.tipo_procedimento
+            ),
+            tipo_procedimento = (
+                SELECT t.nome FROM tipos_procedimento_variantes v
+                JOIN tipos_procedimento t ON t.id = v.tipo_id
+                WHERE v.variante = procedimentos.tipo_procedimento
+            )
+        WHERE tipo_procedimento IN (SELECT variante FROM tipos_procedimento_variantes)
+    """)
+    op.drop_table("tipos_procedimento_variantes")
+
+    # 4. Índice de filtro e agregação por tipo
+    op.create_index("ix_procedimentos_tipo_data", "procedimentos", ["tipo_procedimento_id", "data_procedimento"])
+    if conexao.dialect.name == "postgresql":
+        op.execute("ANALYZE procedimentos")
+        op.execute("ANALYZE tipos_procedimento")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_procedimentos_tipo_data", table_name="procedimentos")
+    if op.get_context().dialect.name == "sqlite":
+        # SQLite não remove coluna com chave estrangeira: recria a tabela e
+        # refaz o índice com DESC, que o modo batch não preserva
+        with op.batch_alter_table("procedimentos", recreate="always") as batch:
+            batch.drop_column("tipo_procedimento_id")
+        op.drop_index("ix_procedimentos_cliente_data", table_name="procedimentos")
+        op.create_index(
+            "ix_procedimentos_cliente_data", "procedimentos",
+            ["cliente_id", sa.text("data_procedimento DESC"), sa.text("id DESC")],
+        )
+    else:
+        op.drop_constraint("procedimentos_tipo_procedimento_id_fkey", "procedimentos", type_="foreignkey")
+        op.drop_column("procedimentos", "tipo_procedimento_id")
+    op.drop_index("ix_tipos_procedimento_id", table_name="tipos_procedimento")
+    op.drop_table("tipos_procedimento")
@@ -0,0 +1,45 @@
+"""clientes duplicados
+
+Cria clientes_duplicados, preenchida pelo job de detecção de duplicados
+(python -m core.duplicados).
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "clientes_duplicados",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cliente_id", sa.Integer(), sa.ForeignKey("clientes.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("duplicado_id", sa.Integer(), sa.ForeignKey("clientes.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("similaridade", sa.Float(), nullable=False),
+        sa.Column("detectado_em", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("descartado_em", sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint("cliente_id", "duplicado_id", name="uq_clientes_duplicados_par"),
+        sa.CheckConstraint("cliente_id < duplicado_id", name="ck_clientes_duplicados_ordem"),
+    )
+    op.create_index("ix_clientes_duplicados_id", "clientes_duplicados", ["id"])
+    op.create_index("ix_clientes_duplicados_duplicado", "clientes_duplicados", ["duplicado_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_clientes_duplicados_duplicado", table_name="clientes_duplicados")
+    op.drop_index("ix_clientes_duplicados_id", table_name="clientes_duplicados")
+    op.drop_table("clientes_duplicados")
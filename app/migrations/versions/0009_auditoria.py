@@ -0,0 +1,48 @@
+"""auditoria
+
+Cria a trilha de auditoria das escritas em clientes e procedimentos,
+gravada em lote fora da requisição (core/registros.py).
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, Sequence[str], None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "auditoria",
+        sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True),
+        sa.Column("em", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("usuario_id", sa.Integer(), nullable=True),
+        sa.Column("usuario", sa.String(), nullable=True),
+        sa.Column("tabela", sa.String(length=20), nullable=False),
+        sa.Column("registro_id", sa.Integer(), nullable=False),
+        sa.Column("acao", sa.String(length=10), nullable=False),
+        sa.Column("cliente_id", sa.Integer(), nullable=True),
+        sa.Column("requisicao_id", sa.String(length=36), nullable=True),
+        sa.Column("metodo", sa.String(length=10), nullable=True),
+        sa.Column("caminho", sa.String(), nullable=True),
+    )
+    op.create_index("ix_auditoria_registro", "auditoria", ["tabela", "registro_id"])
+    op.create_index("ix_auditoria_usuario_em", "auditoria", ["usuario_id", "em"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_auditoria_usuario_em", table_name="auditoria")
+    op.drop_index("ix_auditoria_registro", table_name="auditoria")
+    op.drop_table("auditoria")
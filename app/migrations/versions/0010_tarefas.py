@@ -0,0 +1,46 @@
+"""tarefas
+
+Cria a fila durável das tarefas em segundo plano (core/tarefas.py).
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, Sequence[str], None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "tarefas",
+        sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True),
+        sa.Column("tipo", sa.String(length=50), nullable=False),
+        sa.Column("argumentos", sa.JSON(), nullable=False),
+        sa.Column("chave", sa.String(length=200), nullable=True),
+        sa.Column("estado", sa.String(length=10), nullable=False),
+        sa.Column("tentativas", sa.Integer(), nullable=False),
+        sa.Column("max_tentativas", sa.Integer(), nullable=False),
+        sa.Column("executar_em", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("erro", sa.Text(), nullable=True),
+        sa.Column("criado_em", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("concluido_em", sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint("chave", name="uq_tarefas_chave"),
+    )
+    op.create_index("ix_tarefas_estado_executar_em", "tarefas", ["estado", "executar_em"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tarefas_estado_executar_em", table_name="tarefas")
+    op.drop_table("tarefas")
@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, CheckConstraint
+from sqlalchemy.sql import func
+from db.base import Base
+
+
+class Agendamento(Base):
+    """
+    Horário marcado de um cliente com um profissional em uma cadeira.
+    inicio/fim são horários locais do salão (sem fuso).
+
+    No Postgres, restrições de exclusão (GiST sobre tsrange, migração 0006)
+    impedem dois agendamentos ativos sobrepostos no mesmo profissional ou na
+    mesma cadeira, mesmo com escritas concorrentes.
+    """
+    __tablename__ = "agendamentos"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cliente_id = Column(Integer, ForeignKey("clientes.id", ondelete="CASCADE"), nullable=False)
+    profissional_id = Column(Integer, ForeignKey("profissionais.id"), nullable=False)
+    cadeira_id = Column(Integer, ForeignKey("cadeiras.id"), nullable=False)
+    inicio = Column(DateTime, nullable=False)
+    fim = Column(DateTime, nullable=False)
+    tipo_procedimento = Column(String, nullable=False)
+    valor_previsto = Column(Float, nullable=True)
+    observacao = Column(String, nullable=True)
+    # agendado, concluido ou cancelado
+    status = Column(String(10), nullable=False, default="agendado")
+    # Procedimento gerado ao concluir o atendimento (sem chave estrangeira:
+    # no Postgres a chave de procedimentos é (id, data_procedimento))
+    procedimento_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        CheckConstraint("fim > inicio", name="ck_agendamentos_intervalo"),
+        # Conflitos e agenda por recurso: recurso = ? AND inicio entre limites
+        Index("ix_agendamentos_profissional_inicio", profissional_id, inicio),
+        Index("ix_agendamentos_cadeira_inicio", cadeira_id, inicio),
+        # Disponibilidade da semana (todos os recursos) e agenda do cliente
+        Index("ix_agendamentos_inicio", inicio),
+        Index("ix_agendamentos_cliente_inicio", cliente_id, inicio),
+    )
@@ -0,0 +1,28 @@
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String
+from sqlalchemy.sql import func
+from db.base import Base
+
+
+class Alteracao(Base):
+    """
+    Log de alterações usado pela sincronização incremental (/api/v1/sync).
+    Cada escrita em clientes ou procedimentos grava uma linha na mesma
+    transação; remoções ficam como tombstones (acao="removido").
+    """
+    __tablename__ = "alteracoes"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    # ID da transação no Postgres (txid_current); 0 no SQLite, que tem um
+    # único escritor por vez e confirma as transações na ordem dos ids
+    transacao = Column(BigInteger, nullable=False, default=0)
+    tabela = Column(String(20), nullable=False)
+    registro_id = Column(Integer, nullable=False)
+    acao = Column(String(10), nullable=False)
+    criado_em = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Ordem do token (transacao, id)
+        Index("ix_alteracoes_transacao_id", transacao, id),
+        # Compactação: entradas anteriores do mesmo registro
+        Index("ix_alteracoes_registro", tabela, registro_id),
+    )
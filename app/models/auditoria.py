@@ -0,0 +1,33 @@
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String
+from db.base import Base
+
+
+class Auditoria(Base):
+    """
+    Trilha de auditoria das escritas em clientes e procedimentos: quem
+    (usuário do token), o quê e em qual requisição. Gravada em lote por
+    core/registros.py depois do commit da escrita, fora da requisição.
+    """
+    __tablename__ = "auditoria"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    # Instante do commit da escrita (não o da gravação do lote)
+    em = Column(DateTime(timezone=True), nullable=False)
+    # Sem chave estrangeira: o registro fica mesmo se o usuário for removido.
+    # None em escritas fora de requisição (jobs, scripts)
+    usuario_id = Column(Integer, nullable=True)
+    usuario = Column(String, nullable=True)
+    tabela = Column(String(20), nullable=False)
+    registro_id = Column(Integer, nullable=False)
+    acao = Column(String(10), nullable=False)
+    cliente_id = Column(Integer, nullable=True)
+    requisicao_id = Column(String(36), nullable=True)
+    metodo = Column(String(10), nullable=True)
+    caminho = Column(String, nullable=True)
+
+    __table_args__ = (
+        # Histórico de um registro
+        Index("ix_auditoria_registro", tabela, registro_id),
+        # O que um usuário fez, por período
+        Index("ix_auditoria_usuario_em", usuario_id, em),
+    )
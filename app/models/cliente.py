@@ -12,7 +12,12 @@ class Cliente(Base):
     caminho_foto = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Preenchido quando o cliente é arquivado (some das listagens)
+    arquivado_em = Column(DateTime(timezone=True), nullable=True)
 
-    # Relacionamento com Procedimentos
-    procedimentos = relationship("Procedimento", back_populates="cliente", cascade="all, delete-orphan")
+    # Relacionamento com Procedimentos; passive_deletes deixa a remoção dos
+    # procedimentos para o ON DELETE CASCADE do banco, sem carregá-los
+    procedimentos = relationship(
+        "Procedimento", back_populates="cliente", cascade="all, delete-orphan", passive_deletes=True
+    )
 
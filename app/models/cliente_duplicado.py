@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index, UniqueConstraint, CheckConstraint
+from sqlalchemy.sql import func
+from db.base import Base
+
+
+class ClienteDuplicado(Base):
+    """
+    Par de clientes com nomes parecidos, encontrado pelo job de
+    core/duplicados.py e revisado pela recepção: mesclar os dois
+    (POST /clientes/{id}/mesclar) ou descartar o par, que o job não sugere de
+    novo. O menor id fica em cliente_id; remover um dos clientes remove o par.
+    """
+    __tablename__ = "clientes_duplicados"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cliente_id = Column(Integer, ForeignKey("clientes.id", ondelete="CASCADE"), nullable=False)
+    duplicado_id = Column(Integer, ForeignKey("clientes.id", ondelete="CASCADE"), nullable=False)
+    similaridade = Column(Float, nullable=False)
+    detectado_em = Column(DateTime(timezone=True), server_default=func.now())
+    # Preenchido quando a recepção indica que não é a mesma pessoa
+    descartado_em = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("cliente_id", "duplicado_id", name="uq_clientes_duplicados_par"),
+        CheckConstraint("cliente_id < duplicado_id", name="ck_clientes_duplicados_ordem"),
+        # Remoção em cascata pelo segundo cliente do par
+        Index("ix_clientes_duplicados_duplicado", duplicado_id),
+    )
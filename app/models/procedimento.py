@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Float, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, Float, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from db.base import Base
@@ -8,9 +8,12 @@ class Procedimento(Base):
     __tablename__ = "procedimentos"
 
     id = Column(Integer, primary_key=True, index=True)
-    cliente_id = Column(Integer, ForeignKey("clientes.id", ondelete="CASCADE"), nullable=False, index=True)
-    data_procedimento = Column(Date, nullable=False, index=True)
+    cliente_id = Column(Integer, ForeignKey("clientes.id", ondelete="CASCADE"), nullable=False)
+    data_procedimento = Column(Date, nullable=False)
+    # Nome do tipo no catálogo (cópia de tipos_procedimento.nome), mantido
+    # para leitura e compatibilidade; filtros e agregações usam o id
     tipo_procedimento = Column(String, nullable=False)
+    tipo_procedimento_id = Column(Integer, ForeignKey("tipos_procedimento.id"), nullable=True)
     qtd_tonalizante = Column(Float, nullable=True)
     valor_procedimento = Column(Float, nullable=False)
     observacao = Column(String, nullable=True)
@@ -21,3 +24,18 @@ class Procedimento(Base):
     # Relacionamento com Cliente
     cliente = relationship("Cliente", back_populates="procedimentos")
 
+    # Índices alinhados às consultas (criados pela migração 0002). No Postgres
+    # a tabela é particionada por mês de data_procedimento (migração 0004,
+    # db/particionamento.py), com chave primária (id, data_procedimento)
+    __table_args__ = (
+        # Histórico do cliente, já na ordem data desc
+        Index("ix_procedimentos_cliente_data", cliente_id, data_procedimento.desc(), id.desc()),
+        # Listagens e filtros por período
+        Index("ix_procedimentos_data_id", data_procedimento, id),
+        # Filtro e agregação por tipo no período
+        Index("ix_procedimentos_tipo_data", tipo_procedimento_id, data_procedimento),
+        # Filtro corte=true (parcial: só as linhas com corte)
+        Index("ix_procedimentos_corte_data", data_procedimento, id,
+              postgresql_where=corte.is_(True), sqlite_where=corte.is_(True)),
+    )
+
@@ -0,0 +1,34 @@
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Index, Integer, String, Text, UniqueConstraint
+from sqlalchemy.sql import func
+from db.base import Base
+
+
+class Tarefa(Base):
+    """
+    Fila durável das tarefas em segundo plano (core/tarefas.py). A tarefa é
+    gravada na mesma transação da escrita que a originou: só existe se a
+    escrita foi confirmada.
+    """
+    __tablename__ = "tarefas"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    tipo = Column(String(50), nullable=False)
+    argumentos = Column(JSON, nullable=False)
+    # Chave de idempotência: uma segunda tarefa com a mesma chave não é criada
+    chave = Column(String(200), nullable=True)
+    # pendente, executando, concluida ou falhou
+    estado = Column(String(10), nullable=False, default="pendente")
+    tentativas = Column(Integer, nullable=False, default=0)
+    max_tentativas = Column(Integer, nullable=False, default=5)
+    # Próxima tentativa; em execução, o fim do prazo depois do qual a tarefa
+    # volta a ser pega (o worker caiu no meio)
+    executar_em = Column(DateTime(timezone=True), nullable=False)
+    erro = Column(Text, nullable=True)
+    criado_em = Column(DateTime(timezone=True), server_default=func.now())
+    concluido_em = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint(chave, name="uq_tarefas_chave"),
+        # Próxima tarefa vencida
+        Index("ix_tarefas_estado_executar_em", estado, executar_em),
+    )
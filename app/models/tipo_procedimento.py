@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from db.base import Base
+
+
+class TipoProcedimento(Base):
+    """
+    Catálogo de tipos de procedimento. `chave` é o nome normalizado (sem
+    acento, minúsculo, espaços simples) e é única: "Coloração", "coloracao"
+    e "Coloração " são o mesmo tipo, exibido como `nome`.
+    """
+    __tablename__ = "tipos_procedimento"
+
+    id = Column(Integer, primary_key=True, index=True)
+    nome = Column(String(100), nullable=False)
+    chave = Column(String(100), nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
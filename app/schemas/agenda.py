@@ -0,0 +1,133 @@
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import List, Literal, Optional
+from datetime import datetime, timedelta
+
+from core.agenda import AGENDA_DURACAO_MAX
+
+
+class ProfissionalCreate(BaseModel):
+    nome: str = Field(..., min_length=1, max_length=255, description="Nome do profissional")
+    ativo: bool = Field(default=True)
+
+
+class ProfissionalOut(ProfissionalCreate):
+    id: int
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class CadeiraCreate(BaseModel):
+    nome: str = Field(..., min_length=1, max_length=100, description="Nome ou número da cadeira")
+    ativa: bool = Field(default=True)
+
+
+class CadeiraOut(CadeiraCreate):
+    id: int
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class HorarioLocal(BaseModel):
+    """
+    inicio/fim são horários locais do salão; horários com fuso são recusados
+    em vez de convertidos pelo fuso do servidor.
+    """
+
+    @field_validator("inicio", "fim", check_fields=False)
+    @classmethod
+    def _sem_fuso(cls, valor: Optional[datetime]) -> Optional[datetime]:
+        if valor is not None and valor.tzinfo is not None:
+            raise ValueError("Informe o horário local do salão, sem fuso horário")
+        return valor
+
+
+class AgendamentoCreate(HorarioLocal):
+    cliente_id: int = Field(..., description="ID do cliente")
+    profissional_id: int = Field(..., description="ID do profissional")
+    cadeira_id: Optional[int] = Field(None, description="ID da cadeira (sem ela, a primeira livre)")
+    inicio: datetime = Field(..., description="Início, horário local do salão (YYYY-MM-DDTHH:MM)")
+    fim: Optional[datetime] = Field(None, description="Fim, horário local do salão")
+    duracao_min: Optional[int] = Field(None, gt=0, description="Duração em minutos, no lugar de fim")
+    tipo_procedimento: str = Field(..., min_length=1, max_length=100, description="Procedimento previsto")
+    valor_previsto: Optional[float] = Field(None, ge=0, description="Valor previsto")
+    observacao: Optional[str] = Field(None, max_length=1000)
+
+    @model_validator(mode="after")
+    def _calcular_fim(self):
+        if (self.fim is None) == (self.duracao_min is None):
+            raise ValueError("Informe fim ou duracao_min")
+        if self.fim is None:
+            self.fim = self.inicio + timedelta(minutes=self.duracao_min)
+        if self.fim <= self.inicio:
+            raise ValueError("O fim deve ser depois do início")
+        if self.fim - self.inicio > AGENDA_DURACAO_MAX:
+            raise ValueError(f"Duração máxima de {AGENDA_DURACAO_MAX} por agendamento")
+        return self
+
+
+class AgendamentoUpdate(HorarioLocal):
+    """
+    Remarcação ou cancelamento; só os campos enviados mudam. Com só o
+    início, a duração é mantida.
+    """
+    profissional_id: Optional[int] = None
+    cadeira_id: Optional[int] = None
+    inicio: Optional[datetime] = None
+    fim: Optional[datetime] = None
+    tipo_procedimento: Optional[str] = Field(None, min_length=1, max_length=100)
+    valor_previsto: Optional[float] = Field(None, ge=0)
+    observacao: Optional[str] = Field(None, max_length=1000)
+    status: Optional[Literal["agendado", "cancelado"]] = None
+
+    @model_validator(mode="after")
+    def _rejeitar_nulos_obrigatorios(self):
+        obrigatorios = ("profissional_id", "cadeira_id", "inicio", "fim", "tipo_procedimento", "status")
+        nulos = [campo for campo in obrigatorios if campo in self.model_fields_set and getattr(self, campo) is None]
+        if nulos:
+            raise ValueError(f"Campos obrigatórios não podem ser nulos: {', '.join(nulos)}")
+        return self
+
+
+class AgendamentoConclusao(BaseModel):
+    """
+    Dados do procedimento gerado ao concluir; o que faltar vem do agendamento.
+    """
+    tipo_procedimento: Optional[str] = Field(None, min_length=1, max_length=100)
+    valor_procedimento: Optional[float] = Field(None, ge=0, description="Padrão: valor previsto")
+    qtd_tonalizante: Optional[float] = Field(None, ge=0)
+    observacao: Optional[str] = Field(None, max_length=1000)
+    corte: bool = Field(default=False)
+
+
+class AgendamentoOut(BaseModel):
+    id: int
+    cliente_id: int
+    profissional_id: int
+    cadeira_id: int
+    inicio: datetime
+    fim: datetime
+    tipo_procedimento: str
+    valor_previsto: Optional[float] = None
+    observacao: Optional[str] = None
+    status: str
+    procedimento_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class JanelaLivre(BaseModel):
+    inicio: datetime
+    fim: datetime
+
+
+class DisponibilidadeOut(BaseModel):
+    profissional_id: int
+    nome: str
+    janelas: List[JanelaLivre] = Field(default_factory=list, description="Horários livres, em ordem")
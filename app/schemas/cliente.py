@@ -1,6 +1,8 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
-from datetime import datetime
+from typing import Literal, Optional, List
+from datetime import date, datetime
+
+from schemas.procedimento import ProcedimentoOut
 
 
 class ClienteBase(BaseModel):
@@ -20,19 +22,85 @@ class ClienteOut(ClienteBase):
     caminho_foto: Optional[str] = Field(None, description="Caminho para a foto do cliente")
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    arquivado_em: Optional[datetime] = Field(None, description="Data de arquivamento (null se ativo)")
 
     class Config:
         from_attributes = True
 
 
+class ClienteSugestao(BaseModel):
+    """
+    Item do autocompletar de clientes.
+    """
+    id: int
+    nome: str
+
+
+class RetencaoClienteOut(BaseModel):
+    """
+    Estatísticas de retorno de um cliente, calculadas sobre os procedimentos
+    ainda no banco (o histórico arquivado fica de fora).
+    """
+    cliente_id: int
+    visitas: int
+    primeira_visita: date
+    ultima_visita: date
+    intervalo_medio_dias: Optional[float] = Field(None, description="Média de dias entre visitas (null com uma visita)")
+    retorno_previsto: Optional[date] = Field(None, description="Última visita + intervalo médio")
+    dias_atraso: Optional[int] = Field(None, description="Dias desde o retorno previsto (negativo: ainda não chegou)")
+    valor_total: float
+    ticket_medio: float
+    tendencia_valor_mensal: Optional[float] = Field(None, description="Variação do valor por visita, em reais por mês")
+    tonalizante_previsto: Optional[float] = Field(None, description="Tonalizante médio das visitas em que foi usado")
+
+
+class ClienteRetornoOut(RetencaoClienteOut):
+    nome: Optional[str] = None
+
+
 class ClienteComProcedimentosOut(ClienteOut):
     """
     Cliente com lista de procedimentos (histórico completo).
     """
-    procedimentos: List["ProcedimentoOut"] = Field(default_factory=list, description="Histórico de procedimentos do cliente")
+    procedimentos: List[ProcedimentoOut] = Field(default_factory=list, description="Histórico de procedimentos do cliente")
 
 
-# Resolve referências forward após importar ProcedimentoOut
-from schemas.procedimento import ProcedimentoOut
-ClienteComProcedimentosOut.model_rebuild()
 
+
+class ClienteLote(BaseModel):
+    """
+    Operação em lote sobre vários clientes.
+    """
+    ids: List[int] = Field(..., min_length=1, max_length=1000, description="IDs dos clientes")
+    acao: Literal["deletar", "arquivar", "desarquivar"] = Field(..., description="Operação a aplicar")
+
+
+class ClienteLoteOut(BaseModel):
+    acao: str
+    afetados: List[int] = Field(default_factory=list, description="IDs processados")
+    nao_encontrados: List[int] = Field(default_factory=list, description="IDs inexistentes")
+
+
+class ClienteDuplicadoOut(BaseModel):
+    """
+    Par de possíveis duplicados encontrado pelo job de detecção.
+    """
+    id: int
+    similaridade: float = Field(..., description="0 a 1; 1 = mesmo nome normalizado")
+    detectado_em: Optional[datetime] = None
+    cliente_id: int
+    cliente_nome: str
+    duplicado_id: int
+    duplicado_nome: str
+
+
+class ClienteMesclar(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=100, description="IDs dos clientes a juntar neste")
+
+
+class ClienteMesclagemOut(BaseModel):
+    cliente: ClienteOut
+    mesclados: List[int] = Field(default_factory=list, description="IDs juntados e removidos")
+    nao_encontrados: List[int] = Field(default_factory=list, description="IDs inexistentes")
+    procedimentos_movidos: int = 0
+    agendamentos_movidos: int = 0
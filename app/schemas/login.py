@@ -8,12 +8,6 @@ class LoginRequest(BaseModel):
     password: str = Field(..., min_length=1, description="Senha")
 
 
-class TokenResponse(BaseModel):
-    access_token: str
-    token_type: str = "bearer"
-    user: "UsuarioOut"
-
-
 class UsuarioBase(BaseModel):
     username: str = Field(..., min_length=3, max_length=50, description="Nome de usuário")
     email: EmailStr = Field(..., description="Email do usuário")
@@ -36,6 +30,8 @@ class UsuarioOut(UsuarioBase):
         from_attributes = True
 
 
-# Atualiza a referência forward
-TokenResponse.model_rebuild()
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    user: UsuarioOut
 
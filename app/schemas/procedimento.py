@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional, List
 from datetime import date, datetime
 
@@ -25,12 +25,40 @@ class ProcedimentoUpdate(BaseModel):
     corte: Optional[bool] = None
 
 
+class ProcedimentoPatch(ProcedimentoUpdate):
+    """
+    Atualização parcial (PATCH): campos ausentes não mudam e null limpa o
+    campo, o que só é aceito nos campos opcionais (qtd_tonalizante, observacao).
+    """
+
+    @model_validator(mode="after")
+    def _rejeitar_nulos_obrigatorios(self):
+        obrigatorios = ("data_procedimento", "tipo_procedimento", "valor_procedimento", "corte")
+        nulos = [campo for campo in obrigatorios if campo in self.model_fields_set and getattr(self, campo) is None]
+        if nulos:
+            raise ValueError(f"Campos obrigatórios não podem ser nulos: {', '.join(nulos)}")
+        return self
+
+
 class ProcedimentoOut(ProcedimentoBase):
     id: int
     cliente_id: int
+    tipo_procedimento_id: Optional[int] = Field(None, description="ID do tipo no catálogo")
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+
+
+class TipoProcedimentoOut(BaseModel):
+    id: int
+    nome: str
+
+
+class ResumoTipoOut(BaseModel):
+    tipo_procedimento_id: Optional[int] = None
+    nome: Optional[str] = None
+    quantidade: int
+    valor_total: float
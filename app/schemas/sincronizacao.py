@@ -0,0 +1,17 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+from schemas.cliente import ClienteOut
+from schemas.procedimento import ProcedimentoOut
+
+
+class AlteracoesOut(BaseModel):
+    """
+    Uma página da sincronização incremental.
+    """
+    token: str = Field(..., description="Token para a próxima chamada (?desde=)")
+    mais: bool = Field(..., description="Há mais alterações: chame de novo com o token")
+    clientes: List[ClienteOut] = Field(default_factory=list, description="Clientes criados ou alterados")
+    procedimentos: List[ProcedimentoOut] = Field(default_factory=list, description="Procedimentos criados ou alterados")
+    clientes_removidos: List[int] = Field(default_factory=list, description="IDs de clientes removidos")
+    procedimentos_removidos: List[int] = Field(default_factory=list, description="IDs de procedimentos removidos")
@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional
+from datetime import datetime
+
+
+class TarefaOut(BaseModel):
+    """
+    Tarefa em segundo plano (core/tarefas.py).
+    """
+    id: int
+    tipo: str
+    argumentos: Dict[str, Any]
+    chave: Optional[str] = Field(None, description="Chave de idempotência")
+    estado: str = Field(..., description="pendente, executando, concluida ou falhou")
+    tentativas: int
+    max_tentativas: int
+    executar_em: datetime = Field(..., description="Próxima tentativa (em execução: fim do prazo)")
+    erro: Optional[str] = Field(None, description="Erro da última tentativa")
+    criado_em: Optional[datetime] = None
+    concluido_em: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,220 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date, datetime, timedelta
+
+from schemas.agenda import (
+    AgendamentoConclusao,
+    AgendamentoCreate,
+    AgendamentoOut,
+    AgendamentoUpdate,
+    CadeiraCreate,
+    CadeiraOut,
+    DisponibilidadeOut,
+    ProfissionalCreate,
+    ProfissionalOut,
+)
+from schemas.procedimento import ProcedimentoOut
+from crud.agenda import (
+    ConflitoAgenda,
+    atualizar_agendamento,
+    concluir_agendamento,
+    criar_agendamento,
+    criar_cadeira,
+    criar_profissional,
+    disponibilidade,
+    get_agendamento,
+    get_agendamentos,
+    get_cadeiras,
+    get_profissionais,
+)
+from core.agenda import AGENDA_DURACAO_MAX
+from core.dependencies import get_db, get_db_leitura, get_current_user, get_current_active_admin
+from models.usuario import Usuario
+
+router = APIRouter()
+
+
+@router.post("/profissionais", response_model=ProfissionalOut, status_code=status.HTTP_201_CREATED)
+def criar_profissional_route(
+    profissional_data: ProfissionalCreate,
+    db: Session = Depends(get_db),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Cadastra um profissional (requer administrador).
+    """
+    return criar_profissional(db, profissional_data)
+
+
+@router.get("/profissionais", response_model=List[ProfissionalOut])
+def listar_profissionais_route(
+    db: Session = Depends(get_db_leitura),
+    incluir_inativos: bool = Query(False, description="Incluir profissionais inativos")
+):
+    return get_profissionais(db, apenas_ativos=not incluir_inativos)
+
+
+@router.post("/cadeiras", response_model=CadeiraOut, status_code=status.HTTP_201_CREATED)
+def criar_cadeira_route(
+    cadeira_data: CadeiraCreate,
+    db: Session = Depends(get_db),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Cadastra uma cadeira (requer administrador).
+    """
+    return criar_cadeira(db, cadeira_data)
+
+
+@router.get("/cadeiras", response_model=List[CadeiraOut])
+def listar_cadeiras_route(
+    db: Session = Depends(get_db_leitura),
+    incluir_inativas: bool = Query(False, description="Incluir cadeiras inativas")
+):
+    return get_cadeiras(db, apenas_ativas=not incluir_inativas)
+
+
+@router.post("/agendamentos", response_model=AgendamentoOut, status_code=status.HTTP_201_CREATED)
+def criar_agendamento_route(
+    agendamento_data: AgendamentoCreate,
+    db: Session = Depends(get_db),
+    _: Usuario = Depends(get_current_user)
+):
+    """
+    Marca um horário. Horários são locais do salão, sem fuso.
+
+    Exemplo de JSON:
+    {
+        "cliente_id": 1,
+        "profissional_id": 2,
+        "inicio": "2024-01-15T14:00",
+        "duracao_min": 60,
+        "tipo_procedimento": "Coloração",
+        "valor_previsto": 150.00
+    }
+
+    Sem cadeira_id, a primeira cadeira livre no horário é reservada.
+    Retorna 409 se o profissional ou a cadeira já estiverem ocupados.
+    """
+    try:
+        return criar_agendamento(db, agendamento_data)
+    except ConflitoAgenda as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/agendamentos", response_model=List[AgendamentoOut])
+def listar_agendamentos_route(
+    db: Session = Depends(get_db_leitura),
+    inicio: date = Query(..., description="Primeiro dia (YYYY-MM-DD)"),
+    dias: int = Query(7, ge=1, le=31, description="Quantidade de dias"),
+    profissional_id: Optional[int] = Query(None, description="Filtrar por profissional"),
+    cadeira_id: Optional[int] = Query(None, description="Filtrar por cadeira"),
+    cliente_id: Optional[int] = Query(None, description="Filtrar por cliente"),
+    incluir_cancelados: bool = Query(False)
+):
+    """
+    Agendamentos que começam no período, em ordem de horário.
+    """
+    periodo_inicio = datetime.combine(inicio, datetime.min.time())
+    return get_agendamentos(
+        db,
+        periodo_inicio,
+        periodo_inicio + timedelta(days=dias),
+        profissional_id=profissional_id,
+        cadeira_id=cadeira_id,
+        cliente_id=cliente_id,
+        incluir_cancelados=incluir_cancelados,
+    )
+
+
+@router.get("/agendamentos/{agendamento_id}", response_model=AgendamentoOut)
+def get_agendamento_route(
+    agendamento_id: int,
+    db: Session = Depends(get_db_leitura)
+):
+    db_agendamento = get_agendamento(db, agendamento_id)
+    if db_agendamento is None:
+        raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+    return db_agendamento
+
+
+@router.patch("/agendamentos/{agendamento_id}", response_model=AgendamentoOut)
+def atualizar_agendamento_route(
+    agendamento_id: int,
+    agendamento_update: AgendamentoUpdate,
+    db: Session = Depends(get_db),
+    _: Usuario = Depends(get_current_user)
+):
+    """
+    Remarca ou cancela ({"status": "cancelado"}) um agendamento.
+    """
+    try:
+        db_agendamento = atualizar_agendamento(db, agendamento_id, agendamento_update)
+    except ConflitoAgenda as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if db_agendamento is None:
+        raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+    return db_agendamento
+
+
+@router.post(
+    "/agendamentos/{agendamento_id}/concluir",
+    response_model=ProcedimentoOut,
+    status_code=status.HTTP_201_CREATED
+)
+def concluir_agendamento_route(
+    agendamento_id: int,
+    conclusao: AgendamentoConclusao,
+    db: Session = Depends(get_db),
+    _: Usuario = Depends(get_current_user)
+):
+    """
+    Conclui o atendimento e cria o procedimento no histórico do cliente,
+    com a data do agendamento. Campos não enviados vêm do agendamento
+    (tipo, valor previsto, observação).
+    """
+    try:
+        db_procedimento = concluir_agendamento(db, agendamento_id, conclusao)
+    except ConflitoAgenda as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if db_procedimento is None:
+        raise HTTPException(status_code=404, detail="Agendamento não encontrado")
+    return db_procedimento
+
+
+@router.get("/disponibilidade", response_model=List[DisponibilidadeOut])
+def disponibilidade_route(
+    db: Session = Depends(get_db_leitura),
+    inicio: Optional[date] = Query(None, description="Primeiro dia (padrão: hoje)"),
+    dias: int = Query(7, ge=1, le=31, description="Quantidade de dias"),
+    duracao_min: int = Query(60, gt=0, description="Duração do atendimento em minutos"),
+    profissional_id: Optional[int] = Query(None, description="Só este profissional")
+):
+    """
+    Horários livres de cada profissional ativo no período: dentro do
+    expediente, sem outro agendamento do profissional e com alguma cadeira
+    livre, com pelo menos `duracao_min` minutos. Horários que já passaram
+    ficam de fora.
+    """
+    duracao = timedelta(minutes=duracao_min)
+    if duracao > AGENDA_DURACAO_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Duração máxima de {AGENDA_DURACAO_MAX} por agendamento"
+        )
+    agora = datetime.now()
+    return disponibilidade(
+        db,
+        inicio or agora.date(),
+        dias,
+        duracao,
+        profissional_id=profissional_id,
+        a_partir_de=agora,
+    )
@@ -1,30 +1,51 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 from datetime import date
+import json
 import os
 import shutil
 import uuid
 from pathlib import Path
 
-from schemas.cliente import ClienteCreate, ClienteUpdate, ClienteOut, ClienteComProcedimentosOut
+from schemas.cliente import (
+    ClienteCreate,
+    ClienteUpdate,
+    ClienteOut,
+    ClienteComProcedimentosOut,
+    ClienteLote,
+    ClienteLoteOut,
+    ClienteSugestao,
+    ClienteRetornoOut,
+    RetencaoClienteOut,
+    ClienteDuplicadoOut,
+    ClienteMesclar,
+    ClienteMesclagemOut
+)
 from crud.cliente import (
     criar_cliente,
     get_cliente,
     get_clientes,
     atualizar_cliente,
-    deletar_cliente,
-    atualizar_foto_cliente
+    deletar_clientes,
+    arquivar_clientes,
+    atualizar_foto_cliente,
+    mesclar_clientes
 )
-from core.dependencies import get_db, get_current_active_admin
+from crud.duplicado import get_duplicados, descartar_duplicado
+from core.arquivamento import historico_arquivado
+from core.autocompletar import INDICE as AUTOCOMPLETAR
+from core.dependencies import get_db, get_db_leitura, get_current_active_admin
+from core.metrics import PHOTO_BYTES_SERVED
+from db.session import SessionLocal
 from models.usuario import Usuario
 
 router = APIRouter()
 
-# Define o diretório para salvar as fotos e o cria se não existir
+# Diretório para salvar as fotos (criado na inicialização, veja core/inicializacao.py)
 UPLOAD_DIR = "uploads/clientes/fotos/"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # Tipos de arquivo permitidos (apenas imagens)
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
@@ -62,10 +83,11 @@ def criar_cliente_route(
 
 @router.get("/", response_model=List[ClienteOut])
 def listar_clientes_route(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     skip: int = Query(0, ge=0, description="Número de registros para pular"),
     limit: int = Query(100, le=100, description="Número máximo de registros a retornar"),
-    search: Optional[str] = Query(None, description="Buscar por nome do cliente")
+    search: Optional[str] = Query(None, description="Buscar por nome do cliente"),
+    include_archived: bool = Query(False, description="Incluir clientes arquivados")
 ):
     """
     Retorna uma lista de todos os clientes cadastrados, com filtros opcionais.
@@ -74,32 +96,131 @@ def listar_clientes_route(
         db=db,
         skip=skip,
         limit=limit,
-        search=search
+        search=search,
+        include_archived=include_archived
     )
     return clientes
 
 
+def _sugestoes_do_banco(q: str, limit: int) -> list:
+    with SessionLocal() as db:
+        return [{"id": c.id, "nome": c.nome} for c in get_clientes(db=db, limit=limit, search=q)]
+
+
+@router.get("/autocompletar", response_model=List[ClienteSugestao])
+async def autocompletar_clientes_route(
+    q: str = Query(..., min_length=1, max_length=255, description="Início do nome ou de uma palavra do nome"),
+    limit: int = Query(10, ge=1, le=50, description="Número máximo de sugestões")
+):
+    """
+    Sugestões de clientes ativos para o campo de busca, a cada tecla.
+
+    Responde do índice em memória do worker (sem acento e sem diferenciar
+    maiúsculas: "jose" acha "José"), sem abrir sessão no banco. Primeiro os
+    nomes que começam com `q`, depois os que têm uma palavra começando com `q`.
+    """
+    if not AUTOCOMPLETAR.pronto:
+        # Índice ainda não carregado (banco indisponível na inicialização)
+        return await run_in_threadpool(_sugestoes_do_banco, q, limit)
+    return [{"id": cliente_id, "nome": nome} for cliente_id, nome in AUTOCOMPLETAR.buscar(q, limit)]
+
+
+@router.get("/retorno-previsto", response_model=List[ClienteRetornoOut])
+def retorno_previsto_route(
+    db: Session = Depends(get_db_leitura),
+    dias: int = Query(0, ge=0, le=365, description="Incluir também quem deve voltar nos próximos N dias"),
+    visitas_minimas: int = Query(2, ge=2, description="Mínimo de visitas para haver intervalo médio"),
+    skip: int = Query(0, ge=0, description="Número de registros para pular"),
+    limit: int = Query(100, ge=1, le=500, description="Número máximo de registros a retornar")
+):
+    """
+    Clientes ativos que já passaram (ou, com `dias`, estão perto) da data
+    prevista de retorno, do mais atrasado para o menos.
+
+    A previsão é a última visita mais o intervalo médio entre as visitas do
+    cliente. As estatísticas de todos os clientes são calculadas de uma vez
+    e reaproveitadas até a próxima escrita em procedimentos ou clientes.
+    """
+    # Sob demanda: o NumPy fica fora da inicialização dos workers
+    from crud.retencao import retorno_previsto
+
+    return retorno_previsto(db, dias=dias, visitas_minimas=visitas_minimas, skip=skip, limit=limit)
+
+
+@router.get("/duplicados", response_model=List[ClienteDuplicadoOut])
+def listar_duplicados_route(
+    db: Session = Depends(get_db_leitura),
+    skip: int = Query(0, ge=0, description="Número de registros para pular"),
+    limit: int = Query(100, ge=1, le=500, description="Número máximo de registros a retornar")
+):
+    """
+    Pares de clientes com nomes parecidos, do mais parecido para o menos,
+    para a recepção mesclar (POST /{cliente_id}/mesclar) ou descartar.
+
+    A lista é montada pelo job de detecção (cd app && python -m core.duplicados).
+    """
+    return get_duplicados(db, skip=skip, limit=limit)
+
+
+@router.post("/duplicados/{par_id}/descartar", status_code=status.HTTP_204_NO_CONTENT)
+def descartar_duplicado_route(
+    par_id: int,
+    db: Session = Depends(get_db),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Indica que os dois clientes do par são pessoas diferentes: o par sai da
+    lista e não é sugerido de novo.
+    """
+    if not descartar_duplicado(db, par_id):
+        raise HTTPException(status_code=404, detail="Par de duplicados não encontrado")
+    return None
+
+
+def _historico(db: Session, cliente_id: int, include_archived: bool, limit: int) -> list:
+    """
+    Procedimentos do cliente (mais recentes primeiro), juntando o arquivo
+    frio quando pedido. Uma linha na tabela prevalece sobre a arquivada.
+    """
+    from crud.procedimento import get_procedimentos
+    from schemas.procedimento import ProcedimentoOut
+
+    procedimentos = [
+        ProcedimentoOut.model_validate(p)
+        for p in get_procedimentos(db=db, cliente_id=cliente_id, limit=limit)
+    ]
+    if include_archived and len(procedimentos) < limit:
+        ids = {p.id for p in procedimentos}
+        procedimentos.extend(
+            ProcedimentoOut.model_validate(item)
+            for item in historico_arquivado(cliente_id)
+            if item["id"] not in ids
+        )
+        procedimentos.sort(key=lambda p: (p.data_procedimento, p.id), reverse=True)
+    return procedimentos[:limit]
+
+
 @router.get("/{cliente_id}/historico", response_model=ClienteComProcedimentosOut)
 def get_cliente_com_historico_route(
     cliente_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_leitura),
+    include_archived: bool = Query(False, description="Incluir procedimentos do arquivo frio")
 ):
     """
     Retorna um cliente com seu histórico completo de procedimentos.
+
+    Procedimentos antigos ficam no arquivo frio (core/arquivamento.py) e só
+    aparecem com include_archived=true.
     """
-    from crud.procedimento import get_procedimentos
-    from schemas.procedimento import ProcedimentoOut
-    
     db_cliente = get_cliente(db, cliente_id)
     if db_cliente is None:
         raise HTTPException(status_code=404, detail="Cliente não encontrado")
     
     # Busca todos os procedimentos do cliente
-    procedimentos = get_procedimentos(db=db, cliente_id=cliente_id, limit=1000)
+    procedimentos_out = _historico(db, cliente_id, include_archived, limit=1000)
     
     # Converte para o schema de saída
     cliente_out = ClienteOut.model_validate(db_cliente)
-    procedimentos_out = [ProcedimentoOut.model_validate(p) for p in procedimentos]
     
     return ClienteComProcedimentosOut(
         **cliente_out.model_dump(),
@@ -107,10 +228,50 @@ def get_cliente_com_historico_route(
     )
 
 
+@router.get("/{cliente_id}/historico/exportar")
+def exportar_historico_route(
+    cliente_id: int,
+    db: Session = Depends(get_db_leitura),
+    include_archived: bool = Query(False, description="Incluir procedimentos do arquivo frio")
+):
+    """
+    Exporta o histórico de procedimentos do cliente em NDJSON (um
+    procedimento por linha, mais recentes primeiro), para download.
+    """
+    db_cliente = get_cliente(db, cliente_id)
+    if db_cliente is None:
+        raise HTTPException(status_code=404, detail="Cliente não encontrado")
+
+    procedimentos = _historico(db, cliente_id, include_archived, limit=100000)
+    linhas = (json.dumps(p.model_dump(mode="json"), ensure_ascii=False) + "\n" for p in procedimentos)
+    return StreamingResponse(
+        linhas,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="historico_cliente_{cliente_id}.ndjson"'}
+    )
+
+
+@router.get("/{cliente_id}/retencao", response_model=RetencaoClienteOut)
+def get_retencao_cliente_route(
+    cliente_id: int,
+    db: Session = Depends(get_db_leitura)
+):
+    """
+    Intervalo médio entre visitas, retorno previsto, tendência de valor e
+    tonalizante previsto de um cliente ativo.
+    """
+    from crud.retencao import retencao_cliente
+
+    retencao = retencao_cliente(db, cliente_id)
+    if retencao is None:
+        raise HTTPException(status_code=404, detail="Cliente não encontrado ou sem procedimentos")
+    return retencao
+
+
 @router.get("/{cliente_id}", response_model=ClienteOut)
 def get_cliente_route(
     cliente_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_leitura)
 ):
     """
     Retorna as informações básicas de um cliente específico pelo seu ID.
@@ -145,25 +306,82 @@ def deletar_cliente_route(
     _: Usuario = Depends(get_current_active_admin)
 ):
     """
-    Deleta um cliente do banco de dados pelo seu ID.
+    Deleta um cliente do banco de dados pelo seu ID, junto com seus
+    procedimentos. A foto e o arquivo frio são apagados em segundo plano.
     """
-    db_cliente = get_cliente(db, cliente_id)
-    if not db_cliente:
-        raise HTTPException(status_code=404, detail="Cliente não encontrado")
-    
-    # Remove a foto se existir
-    if db_cliente.caminho_foto and os.path.exists(db_cliente.caminho_foto):
-        try:
-            os.remove(db_cliente.caminho_foto)
-        except Exception:
-            pass  # Ignora erros ao deletar arquivo
-    
-    success = deletar_cliente(db, cliente_id)
-    if not success:
+    if not deletar_clientes(db, [cliente_id]):
         raise HTTPException(status_code=404, detail="Cliente não encontrado")
     return None
 
 
+@router.post("/lote", response_model=ClienteLoteOut)
+def clientes_em_lote_route(
+    lote: ClienteLote,
+    db: Session = Depends(get_db),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Deleta, arquiva ou desarquiva vários clientes de uma vez (até 1000).
+
+    - deletar: remove os clientes e seus procedimentos; as fotos e o arquivo
+      frio são apagados em segundo plano;
+    - arquivar: tira os clientes das listagens, mantendo histórico e foto;
+    - desarquivar: devolve os clientes às listagens.
+
+    Exemplo de JSON:
+    {
+        "ids": [1, 2, 3],
+        "acao": "arquivar"
+    }
+    """
+    if lote.acao == "deletar":
+        afetados = sorted(deletar_clientes(db, lote.ids))
+    else:
+        afetados = arquivar_clientes(db, lote.ids, arquivar=lote.acao == "arquivar")
+
+    return ClienteLoteOut(
+        acao=lote.acao,
+        afetados=afetados,
+        nao_encontrados=sorted(set(lote.ids) - set(afetados))
+    )
+
+
+@router.post("/{cliente_id}/mesclar", response_model=ClienteMesclagemOut)
+def mesclar_clientes_route(
+    cliente_id: int,
+    mesclagem: ClienteMesclar,
+    db: Session = Depends(get_db),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Junta clientes duplicados neste cliente, em uma transação: os
+    procedimentos e agendamentos passam para ele e os duplicados são
+    removidos. O cliente mantém a foto dele; sem foto, fica com a do primeiro
+    duplicado que tiver. As fotos que sobram são apagadas e o arquivo frio
+    dos duplicados passa para este cliente, em segundo plano.
+
+    Exemplo de JSON:
+    {
+        "ids": [12, 57]
+    }
+    """
+    if cliente_id in mesclagem.ids:
+        raise HTTPException(status_code=400, detail="Um cliente não pode ser mesclado com ele mesmo")
+    resultado = mesclar_clientes(db, cliente_id, mesclagem.ids)
+    if resultado is None:
+        raise HTTPException(status_code=404, detail="Cliente não encontrado")
+    if not resultado["mesclados"]:
+        raise HTTPException(status_code=404, detail="Nenhum dos clientes a mesclar foi encontrado")
+
+    return ClienteMesclagemOut(
+        cliente=resultado["cliente"],
+        mesclados=resultado["mesclados"],
+        nao_encontrados=resultado["nao_encontrados"],
+        procedimentos_movidos=resultado["procedimentos_movidos"],
+        agendamentos_movidos=resultado["agendamentos_movidos"]
+    )
+
+
 @router.post("/{cliente_id}/foto", response_model=ClienteOut, status_code=status.HTTP_200_OK)
 def upload_foto_cliente(
     cliente_id: int,
@@ -206,18 +424,13 @@ def upload_foto_cliente(
     file_path = os.path.join(UPLOAD_DIR, file_name)
     
     try:
-        # Remove a foto antiga se existir
-        if db_cliente.caminho_foto and os.path.exists(db_cliente.caminho_foto):
-            try:
-                os.remove(db_cliente.caminho_foto)
-            except Exception:
-                pass  # Ignora erros ao deletar arquivo antigo
-        
         # Salva o novo arquivo
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
         with open(file_path, "wb") as buffer:
             buffer.write(file_content)
         
-        # Atualiza o caminho da foto no banco de dados
+        # Atualiza o caminho da foto no banco de dados; a foto antiga é
+        # apagada depois, por uma tarefa em segundo plano (core/tarefas.py)
         db_cliente = atualizar_foto_cliente(db, cliente_id, file_path)
         if not db_cliente:
             # Se falhar, remove o arquivo que foi salvo
@@ -243,7 +456,7 @@ def upload_foto_cliente(
 @router.get("/{cliente_id}/foto")
 def get_foto_cliente(
     cliente_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_leitura)
 ):
     """
     Retorna a foto de um cliente específico.
@@ -273,6 +486,7 @@ def get_foto_cliente(
     }
     media_type = media_type_map.get(file_extension, "image/jpeg")
     
+    PHOTO_BYTES_SERVED.inc(os.path.getsize(db_cliente.caminho_foto))
     return FileResponse(
         path=db_cliente.caminho_foto,
         media_type=media_type,
@@ -0,0 +1,284 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from core import memoria
+from core.cache import CACHE
+from core.dependencies import get_db, get_current_active_admin
+from core.profiling import (
+    AMOSTRADOR_CONTINUO,
+    carregar_perfil,
+    listar_perfis,
+    comparar_perfis
+)
+from crud.tarefa import get_tarefas, reexecutar_tarefa
+from models.usuario import Usuario
+from schemas.tarefa import TarefaOut
+
+router = APIRouter()
+
+
+@router.get("/perfis")
+def listar_perfis_route(
+    rota: Optional[str] = Query(None, description="Filtrar pelo template da rota"),
+    limit: int = Query(100, ge=1, le=500, description="Número máximo de perfis a retornar"),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Lista os perfis gravados, do mais recente para o mais antigo.
+
+    Para gerar um perfil de uma requisição, envie-a com o header "X-Profile: 1"
+    (ou ?profile=1) usando um token de administrador. O ID do perfil volta no
+    header X-Profile-Id da resposta.
+    """
+    return listar_perfis(rota=rota, limite=limit)
+
+
+@router.get("/perfis/comparar")
+def comparar_perfis_route(
+    base: str = Query(..., description="ID do perfil de referência"),
+    atual: str = Query(..., description="ID do perfil a comparar"),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Compara dois perfis: duração, queries e fração das amostras por função.
+    """
+    perfil_base = carregar_perfil(base)
+    perfil_atual = carregar_perfil(atual)
+    if perfil_base is None or perfil_atual is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return comparar_perfis(perfil_base, perfil_atual)
+
+
+@router.get("/perfis/{perfil_id}")
+def get_perfil_route(
+    perfil_id: str,
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Retorna um perfil completo (JSON) para download.
+    """
+    perfil = carregar_perfil(perfil_id)
+    if perfil is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return perfil
+
+
+@router.get("/perfis/{perfil_id}/collapsed", response_class=PlainTextResponse)
+def get_perfil_collapsed_route(
+    perfil_id: str,
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Retorna as pilhas no formato "collapsed", aceito por flamegraph.pl e speedscope.
+    """
+    perfil = carregar_perfil(perfil_id)
+    if perfil is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    linhas = [f"{pilha} {quantidade}" for pilha, quantidade in perfil.get("pilhas", {}).items()]
+    return "\n".join(linhas) + "\n"
+
+
+@router.get("/amostrador")
+def status_amostrador_route(
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Retorna o estado do amostrador contínuo.
+    """
+    return AMOSTRADOR_CONTINUO.status()
+
+
+@router.post("/amostrador/iniciar")
+def iniciar_amostrador_route(
+    janela_s: float = Query(60.0, ge=1, le=3600, description="Duração de cada janela gravada (segundos)"),
+    intervalo_ms: float = Query(10.0, ge=1, le=1000, description="Intervalo entre amostras (ms)"),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Inicia o amostrador contínuo. A cada janela um perfil é gravado.
+    """
+    try:
+        AMOSTRADOR_CONTINUO.iniciar(janela_s=janela_s, intervalo_ms=intervalo_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return AMOSTRADOR_CONTINUO.status()
+
+
+@router.post("/amostrador/parar")
+def parar_amostrador_route(
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Para o amostrador contínuo e grava a janela em andamento.
+    """
+    perfil_id = AMOSTRADOR_CONTINUO.parar()
+    if perfil_id is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="O amostrador contínuo não está em execução")
+    return {"perfil_id": perfil_id, **AMOSTRADOR_CONTINUO.status()}
+
+
+@router.get("/memoria")
+def status_memoria_route(
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Estado do rastreamento de memória: tracemalloc, RSS e snapshots guardados.
+    """
+    return memoria.status()
+
+
+@router.post("/memoria/iniciar")
+def iniciar_memoria_route(
+    nframes: int = Query(10, ge=1, le=100, description="Frames guardados por alocação"),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Inicia o tracemalloc. Enquanto ativo, todas as alocações ficam mais lentas.
+    """
+    try:
+        memoria.iniciar(nframes=nframes)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return memoria.status()
+
+
+@router.post("/memoria/parar")
+def parar_memoria_route(
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Para o tracemalloc e descarta os snapshots guardados.
+    """
+    try:
+        memoria.parar()
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return memoria.status()
+
+
+@router.post("/memoria/snapshots", status_code=status.HTTP_201_CREATED)
+def tirar_snapshot_route(
+    rotulo: Optional[str] = Query(None, max_length=100, description="Nome para identificar o snapshot"),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Tira um snapshot do tracemalloc para comparar depois.
+    """
+    try:
+        snapshot_id = memoria.tirar_snapshot(rotulo)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"id": snapshot_id}
+
+
+@router.get("/memoria/top")
+def top_alocacoes_route(
+    agrupar: str = Query("lineno", pattern="^(lineno|filename|traceback)$", description="Agrupamento das alocações"),
+    limit: int = Query(25, ge=1, le=200),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Locais com mais memória alocada e ainda viva.
+    """
+    try:
+        return memoria.top_alocacoes(agrupar=agrupar, limite=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.get("/memoria/diff")
+def comparar_snapshots_route(
+    base: str = Query(..., description="ID do snapshot de referência"),
+    atual: Optional[str] = Query(None, description="ID do snapshot a comparar (padrão: estado atual)"),
+    agrupar: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=200),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Mostra onde a memória cresceu entre dois snapshots.
+    """
+    try:
+        return memoria.comparar(base, atual, agrupar=agrupar, limite=limit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Snapshot não encontrado")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.get("/memoria/rotas")
+def crescimento_por_rota_route(
+    limit: int = Query(50, ge=1, le=500),
+    locais: int = Query(10, ge=0, le=50, description="Locais de alocação por rota"),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Memória retida por rota desde que o tracemalloc foi iniciado, com os
+    locais de alocação que mais cresceram em cada uma.
+    """
+    return memoria.crescimento_por_rota(limite=limit, locais=locais)
+
+
+@router.get("/memoria/orm")
+def objetos_orm_route(
+    incluir_gc: bool = Query(False, description="Também conta instâncias fora das sessões (percorre o heap, lento)"),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Objetos ORM vivos nos identity maps das sessões abertas, por modelo.
+    """
+    return memoria.objetos_orm(incluir_gc=incluir_gc)
+
+
+@router.get("/cache")
+def cache_route(
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Backend, tamanho e taxa de acerto do cache de entidades por tipo
+    (contagens deste worker desde a inicialização).
+    """
+    return CACHE.estatisticas()
+
+
+@router.delete("/cache", status_code=status.HTTP_204_NO_CONTENT)
+def limpar_cache_route(
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Esvazia o cache de entidades e de listagens (só as chaves desta aplicação).
+    """
+    CACHE.limpar()
+    return None
+
+
+@router.get("/tarefas", response_model=List[TarefaOut])
+def listar_tarefas_route(
+    estado: Optional[str] = Query(None, description="pendente, executando, concluida ou falhou"),
+    tipo: Optional[str] = Query(None, description="Tipo da tarefa (ex: remover_fotos)"),
+    skip: int = Query(0, ge=0, description="Número de registros para pular"),
+    limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros a retornar"),
+    db: Session = Depends(get_db),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Tarefas em segundo plano (fotos e arquivo frio a apagar, e-mails), da
+    próxima a executar para a última. As que falharam trazem o último erro.
+    """
+    return get_tarefas(db, estado=estado, tipo=tipo, skip=skip, limit=limit)
+
+
+@router.post("/tarefas/{tarefa_id}/reexecutar", response_model=TarefaOut)
+def reexecutar_tarefa_route(
+    tarefa_id: int,
+    db: Session = Depends(get_db),
+    _: Usuario = Depends(get_current_active_admin)
+):
+    """
+    Devolve à fila, com as tentativas zeradas, uma tarefa que falhou.
+    """
+    tarefa = reexecutar_tarefa(db, tarefa_id)
+    if tarefa is None:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada ou não está como falhou")
+    return tarefa
@@ -0,0 +1,85 @@
+from fastapi import APIRouter, HTTPException, Request, status, Query
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from datetime import date
+import asyncio
+
+from core.dependencies import get_current_user
+from core.eventos import EVENTOS_HEARTBEAT_S, HUB, RESET, Assinante
+from db.session import SessionLocal
+
+router = APIRouter()
+
+
+def _autenticar(token: Optional[str]) -> None:
+    """
+    Valida o token com uma sessão curta: a conexão SSE fica aberta por
+    horas e não pode segurar uma conexão do pool enquanto isso.
+    """
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token de acesso não informado.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    with SessionLocal() as db:
+        get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token), db)
+
+
+@router.get("/")
+async def eventos_route(
+    request: Request,
+    cliente_id: Optional[int] = Query(None, description="Só eventos deste cliente"),
+    data_inicio: Optional[date] = Query(None, description="Só procedimentos a partir desta data"),
+    data_fim: Optional[date] = Query(None, description="Só procedimentos até esta data"),
+    access_token: Optional[str] = Query(None, description="Token, para clientes EventSource sem headers")
+):
+    """
+    Feed de alterações em Server-Sent Events, no lugar de consultar a
+    listagem de procedimentos periodicamente.
+
+    Cada evento tem nome `<tipo>.<acao>` (cliente.criado, procedimento.atualizado,
+    procedimento.removido, ...) e o JSON com id, cliente_id, data_procedimento
+    e, exceto nas remoções, os dados da linha. A remoção de um cliente leva
+    junto seus procedimentos, sem eventos próprios para eles.
+
+    Os filtros de período valem para procedimentos; eventos de clientes passam.
+    Um evento `reset` pede que os dados sejam recarregados (a conexão ficou
+    para trás ou o worker perdeu eventos) e encerra o stream.
+
+    Autenticação pelo header Authorization: Bearer ou por ?access_token=.
+    """
+    autorizacao = request.headers.get("authorization", "")
+    token = autorizacao[7:] if autorizacao.lower().startswith("bearer ") else access_token
+    await run_in_threadpool(_autenticar, token)
+
+    assinante = Assinante(cliente_id=cliente_id, data_inicio=data_inicio, data_fim=data_fim)
+    if not HUB.assinar(assinante):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Limite de conexões de eventos atingido. Tente novamente mais tarde.",
+            headers={"Retry-After": "30"},
+        )
+
+    async def fluxo():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(assinante.fila.get(), EVENTOS_HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"  # mantém proxies e balanceadores com a conexão aberta
+                    continue
+                yield frame
+                if frame is RESET:
+                    break
+        finally:
+            HUB.cancelar(assinante)
+
+    return StreamingResponse(
+        fluxo(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
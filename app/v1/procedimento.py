@@ -3,15 +3,24 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date
 
-from schemas.procedimento import ProcedimentoCreate, ProcedimentoUpdate, ProcedimentoOut
+from schemas.procedimento import (
+    ProcedimentoCreate,
+    ProcedimentoUpdate,
+    ProcedimentoPatch,
+    ProcedimentoOut,
+    ResumoTipoOut,
+    TipoProcedimentoOut
+)
 from crud.procedimento import (
     criar_procedimento,
     get_procedimento,
     get_procedimentos,
     atualizar_procedimento,
-    deletar_procedimento
+    deletar_procedimento,
+    resumo_por_tipo
 )
-from core.dependencies import get_db, get_current_user, get_current_active_admin
+from core.catalogo import CATALOGO
+from core.dependencies import get_db, get_db_leitura, get_current_user, get_current_active_admin
 from models.usuario import Usuario
 
 router = APIRouter()
@@ -65,12 +74,13 @@ def criar_procedimento_route(
 
 @router.get("/", response_model=List[ProcedimentoOut])
 def listar_procedimentos_route(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     skip: int = Query(0, ge=0, description="Número de registros para pular"),
     limit: int = Query(100, le=100, description="Número máximo de registros a retornar"),
     cliente_id: Optional[int] = Query(None, description="Filtrar por ID do cliente"),
     search: Optional[str] = Query(None, description="Buscar por tipo de procedimento ou observação"),
-    tipo_procedimento: Optional[str] = Query(None, description="Filtrar por tipo de procedimento"),
+    tipo_procedimento: Optional[str] = Query(None, description="Filtrar por tipo (nome ou parte, sem acento)"),
+    tipo_procedimento_id: Optional[int] = Query(None, description="Filtrar pelo ID do tipo no catálogo"),
     data_inicio: Optional[date] = Query(None, description="Data inicial do período (YYYY-MM-DD)"),
     data_fim: Optional[date] = Query(None, description="Data final do período (YYYY-MM-DD)"),
     corte: Optional[bool] = Query(None, description="Filtrar por procedimentos com corte")
@@ -85,6 +95,7 @@ def listar_procedimentos_route(
         cliente_id=cliente_id,
         search=search,
         tipo_procedimento=tipo_procedimento,
+        tipo_procedimento_id=tipo_procedimento_id,
         data_inicio=data_inicio,
         data_fim=data_fim,
         corte=corte
@@ -92,10 +103,32 @@ def listar_procedimentos_route(
     return procedimentos
 
 
+@router.get("/tipos", response_model=List[TipoProcedimentoOut])
+def listar_tipos_route():
+    """
+    Catálogo de tipos de procedimento, em ordem alfabética. Tipos novos
+    entram no catálogo ao gravar um procedimento com um nome ainda não usado.
+    """
+    return [{"id": tipo_id, "nome": nome} for tipo_id, nome in CATALOGO.tipos()]
+
+
+@router.get("/tipos/resumo", response_model=List[ResumoTipoOut])
+def resumo_tipos_route(
+    db: Session = Depends(get_db_leitura),
+    data_inicio: Optional[date] = Query(None, description="Data inicial do período (YYYY-MM-DD)"),
+    data_fim: Optional[date] = Query(None, description="Data final do período (YYYY-MM-DD)")
+):
+    """
+    Quantidade e valor total de procedimentos por tipo no período, do tipo
+    mais feito para o menos feito.
+    """
+    return resumo_por_tipo(db, data_inicio=data_inicio, data_fim=data_fim)
+
+
 @router.get("/{procedimento_id}", response_model=ProcedimentoOut)
 def get_procedimento_route(
     procedimento_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_leitura)
 ):
     """
     Retorna as informações de um procedimento específico pelo seu ID.
@@ -122,6 +155,28 @@ def atualizar_procedimento_route(
     return db_procedimento
 
 
+@router.patch("/{procedimento_id}", response_model=ProcedimentoOut)
+def atualizar_parcial_procedimento_route(
+    procedimento_id: int,
+    procedimento_patch: ProcedimentoPatch,
+    db: Session = Depends(get_db),
+    _: Usuario = Depends(get_current_user)
+):
+    """
+    Atualiza apenas os campos enviados de um procedimento.
+
+    Campos ausentes ficam como estão; null limpa qtd_tonalizante ou observacao
+    e é recusado (422) nos campos obrigatórios. Um corpo vazio não altera nada
+    e devolve o procedimento atual.
+
+    Exemplo: {"observacao": null, "valor_procedimento": 120}
+    """
+    db_procedimento = atualizar_procedimento(db, procedimento_id, procedimento_patch)
+    if db_procedimento is None:
+        raise HTTPException(status_code=404, detail="Procedimento não encontrado")
+    return db_procedimento
+
+
 @router.delete("/{procedimento_id}", status_code=status.HTTP_204_NO_CONTENT)
 def deletar_procedimento_route(
     procedimento_id: int,
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from schemas.sincronizacao import AlteracoesOut
+from crud.alteracao import alteracoes_desde, ler_token
+from core.dependencies import get_db_leitura
+
+router = APIRouter()
+
+
+@router.get("/alteracoes", response_model=AlteracoesOut)
+def alteracoes_route(
+    db: Session = Depends(get_db_leitura),
+    desde: Optional[str] = Query(None, description="Token da última sincronização (vazio: carga completa)"),
+    limit: int = Query(500, ge=1, le=5000, description="Máximo de entradas do log por página")
+):
+    """
+    Sincronização incremental para clientes offline: retorna só o que foi
+    criado, alterado ou removido depois do token.
+
+    Fluxo:
+    1. sem `desde`, a primeira chamada começa do início do log (carga completa);
+    2. aplique clientes/procedimentos (estado atual de cada registro) e
+       remova localmente os ids em *_removidos;
+    3. enquanto `mais` for true, chame de novo com o `token` recebido;
+    4. guarde o último `token` e use-o na próxima reconexão.
+
+    A remoção de um cliente traz também os ids dos procedimentos removidos
+    junto com ele.
+    """
+    try:
+        posicao = ler_token(desde)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Token de sincronização inválido. Refaça a carga completa (sem ?desde=)."
+        )
+    return alteracoes_desde(db, posicao, limit)
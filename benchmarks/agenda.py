@@ -0,0 +1,119 @@
+"""
+Tempo da consulta de disponibilidade da agenda.
+
+Cria uma semana de agendamentos (profissionais, cadeiras e ocupação
+configuráveis) em um banco próprio e mede crud.agenda.disponibilidade() para
+toda a equipe, sem o cache de listagens: uma consulta dos agendamentos do
+período mais a montagem dos índices de intervalos em memória.
+
+Uso:
+    python benchmarks/agenda.py
+    python benchmarks/agenda.py --profissionais 40 --cadeiras 30 --ocupacao 0.8 --limite-ms 50
+
+Sai com código 1 quando a mediana passa do limite.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from dados import APP_DIR
+from executar import _url_absoluta
+
+
+def popular(profissionais: int, cadeiras: int, ocupacao: float, inicio: date, semente: int) -> int:
+    from sqlalchemy import insert
+    from core.agenda import expediente
+    from db.base import Base
+    from db.session import engine
+    from models.agendamento import Agendamento
+    from models.cadeira import Cadeira
+    from models.cliente import Cliente
+    from models.profissional import Profissional
+
+    rng = random.Random(semente)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    linhas = []
+    with engine.begin() as conexao:
+        conexao.execute(insert(Cliente), [{"nome": f"Cliente {i}"} for i in range(1, 101)])
+        conexao.execute(insert(Profissional), [{"nome": f"Profissional {i}", "ativo": True} for i in range(profissionais)])
+        conexao.execute(insert(Cadeira), [{"nome": f"Cadeira {i}", "ativa": True} for i in range(cadeiras)])
+
+        # Cada profissional preenche o dia com atendimentos de 30 a 120 min e
+        # intervalos, na primeira cadeira livre no horário
+        livre_ate = {}
+        for dia in range(7):
+            periodo = expediente(inicio + timedelta(days=dia))
+            if periodo is None:
+                continue
+            for profissional_id in range(1, profissionais + 1):
+                cursor = periodo[0]
+                while True:
+                    duracao = timedelta(minutes=rng.choice((30, 45, 60, 90, 120)))
+                    if cursor + duracao > periodo[1]:
+                        break
+                    if rng.random() < ocupacao:
+                        cadeira_id = next(
+                            (cadeira for cadeira in range(1, cadeiras + 1) if livre_ate.get(cadeira, cursor) <= cursor),
+                            None,
+                        )
+                        if cadeira_id is not None:
+                            livre_ate[cadeira_id] = cursor + duracao
+                            linhas.append({
+                                "cliente_id": rng.randint(1, 100), "profissional_id": profissional_id,
+                                "cadeira_id": cadeira_id, "inicio": cursor, "fim": cursor + duracao,
+                                "tipo_procedimento": "Corte", "status": "agendado",
+                            })
+                    cursor += duracao
+        conexao.execute(insert(Agendamento), linhas)
+    return len(linhas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo da disponibilidade semanal da agenda")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_AGENDA_DATABASE_URL", "sqlite:///benchmarks/agenda.db"))
+    parser.add_argument("--profissionais", type=int, default=20)
+    parser.add_argument("--cadeiras", type=int, default=15)
+    parser.add_argument("--ocupacao", type=float, default=0.7, help="Fração do expediente já marcada")
+    parser.add_argument("--repeticoes", type=int, default=50)
+    parser.add_argument("--limite-ms", type=float, default=100, help="Limite para a mediana")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = _url_absoluta(args.database_url)
+    os.environ["CACHE_BACKEND"] = "desligado"
+    sys.path.insert(0, APP_DIR)
+
+    from crud.agenda import disponibilidade
+    from db.session import SessionLocal
+
+    hoje = date.today()
+    inicio = hoje - timedelta(days=hoje.weekday())
+    total = popular(args.profissionais, args.cadeiras, args.ocupacao, inicio, args.semente)
+
+    tempos = []
+    janelas = 0
+    with SessionLocal() as db:
+        for _ in range(args.repeticoes):
+            comeco = time.perf_counter()
+            resultado = disponibilidade(db, inicio, 7, timedelta(minutes=60), a_partir_de=datetime.combine(inicio, datetime.min.time()))
+            tempos.append((time.perf_counter() - comeco) * 1000)
+            janelas = sum(len(item["janelas"]) for item in resultado)
+
+    tempos.sort()
+    mediana = statistics.median(tempos)
+    print(f"{total} agendamentos, {args.profissionais} profissionais, {args.cadeiras} cadeiras: "
+          f"{janelas} janelas livres de 60 min na semana")
+    print(f"mediana {mediana:.1f} ms, p99 {tempos[int(len(tempos) * 0.99) - 1]:.1f} ms")
+    if mediana > args.limite_ms:
+        print(f"Acima do limite de {args.limite_ms:.0f} ms.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
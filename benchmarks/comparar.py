@@ -0,0 +1,70 @@
+"""
+Compara dois resultados de benchmarks/executar.py e aponta regressões.
+
+Uso:
+    python benchmarks/comparar.py resultados/base.json resultados/atual.json --limite 10
+
+Sai com código 1 quando algum cenário piora além do limite (em %) na vazão
+ou no p95/p99, para poder ser usado em CI.
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List
+
+
+def _variacao(base: float, atual: float) -> float:
+    if not base:
+        return 0.0
+    return (atual - base) / base * 100
+
+
+def comparar(base: Dict, atual: Dict, limite: float) -> List[str]:
+    """
+    Imprime a tabela de comparação e retorna a lista de regressões encontradas.
+    """
+    regressoes = []
+    print(f"base:  {base['commit']} ({base['data']})")
+    print(f"atual: {atual['commit']} ({atual['data']})")
+    if base.get("config") != atual.get("config") or base.get("banco") != atual.get("banco"):
+        print("AVISO: configuração ou banco diferentes entre as execuções")
+    print(f"{'cenário':<24} {'req/s':>18} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}")
+
+    for nome, resultado_base in base["cenarios"].items():
+        resultado_atual = atual["cenarios"].get(nome)
+        if resultado_atual is None:
+            continue
+        colunas = []
+        for metrica, maior_eh_melhor in (("rps", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False)):
+            variacao = _variacao(resultado_base[metrica], resultado_atual[metrica])
+            colunas.append(f"{resultado_atual[metrica]:>9.1f} ({variacao:+6.1f}%)")
+            piorou = -variacao if maior_eh_melhor else variacao
+            if metrica != "p50_ms" and piorou > limite:
+                regressoes.append(f"{nome}: {metrica} {variacao:+.1f}%")
+        print(f"{nome:<24} " + " ".join(colunas))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dois resultados de benchmark")
+    parser.add_argument("base")
+    parser.add_argument("atual")
+    parser.add_argument("--limite", type=float, default=10.0, help="Piora máxima aceita, em %% (padrão: 10)")
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as arquivo:
+        base = json.load(arquivo)
+    with open(args.atual, encoding="utf-8") as arquivo:
+        atual = json.load(arquivo)
+
+    regressoes = comparar(base, atual, args.limite)
+    if regressoes:
+        print("\nRegressões acima do limite:")
+        for regressao in regressoes:
+            print(f"  - {regressao}")
+        sys.exit(1)
+    print("\nNenhuma regressão acima do limite.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Gerador de dados sintéticos para os benchmarks.
+
+Popula clientes e procedimentos com distribuições realistas: nomes brasileiros
+com frequências desiguais (e acentos), clientes fiéis com muitas visitas e
+datas concentradas nos anos mais recentes e nos fins de semana.
+
+Uso:
+    python benchmarks/dados.py --database-url sqlite:///benchmarks/bench.db \\
+        --clientes 100000 --procedimentos 5000000 --recriar
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Sequence
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+ADMIN_EMAIL = "benchmark@salao.com.br"
+ADMIN_USERNAME = "bench"
+ADMIN_SENHA = "bench123"
+
+# (nome, peso)
+PRIMEIROS_NOMES = [
+    ("Maria", 30), ("Ana", 18), ("Francisca", 6), ("Antônia", 5), ("Adriana", 5),
+    ("Juliana", 6), ("Márcia", 4), ("Fernanda", 6), ("Patrícia", 5), ("Aline", 5),
+    ("Sandra", 4), ("Camila", 5), ("Amanda", 4), ("Bruna", 4), ("Jéssica", 4),
+    ("Letícia", 3), ("Júlia", 4), ("Luciana", 3), ("Vanessa", 3), ("Mariana", 4),
+    ("Gabriela", 4), ("Beatriz", 3), ("Larissa", 3), ("Conceição", 2), ("Cláudia", 3),
+    ("Débora", 2), ("Renata", 3), ("Simone", 2), ("Tatiane", 2), ("Raquel", 2),
+    ("José", 4), ("João", 4), ("Carlos", 3), ("Paulo", 2), ("Lucas", 3),
+    ("Pedro", 2), ("Rafael", 2), ("Marcos", 2), ("André", 1), ("Luís", 1),
+]
+SOBRENOMES = [
+    ("Silva", 30), ("Santos", 22), ("Oliveira", 15), ("Souza", 14), ("Rodrigues", 10),
+    ("Ferreira", 10), ("Alves", 10), ("Pereira", 9), ("Lima", 9), ("Gomes", 8),
+    ("Costa", 8), ("Ribeiro", 7), ("Martins", 7), ("Carvalho", 6), ("Almeida", 6),
+    ("Lopes", 5), ("Soares", 5), ("Fernandes", 5), ("Vieira", 5), ("Barbosa", 5),
+    ("Rocha", 4), ("Dias", 4), ("Nascimento", 4), ("Andrade", 4), ("Moreira", 4),
+    ("Nunes", 3), ("Marques", 3), ("Machado", 3), ("Mendes", 3), ("Freitas", 3),
+    ("Cardoso", 3), ("Ramos", 3), ("Gonçalves", 3), ("Araújo", 3), ("Conceição", 2),
+    ("Brandão", 1), ("Assunção", 1), ("Magalhães", 1), ("Guimarães", 1), ("Antônio", 1),
+]
+
+# (tipo, peso, valor mínimo, valor máximo, tonalizante (min, max) ou None, sempre corte)
+TIPOS_PROCEDIMENTO = [
+    ("Corte", 35, 40, 90, None, True),
+    ("Coloração", 20, 120, 300, (30, 90), False),
+    ("Escova", 15, 50, 100, None, False),
+    ("Hidratação", 10, 60, 150, None, False),
+    ("Mechas", 7, 200, 500, (40, 120), False),
+    ("Progressiva", 5, 180, 400, None, False),
+    ("Tonalização", 5, 80, 160, (20, 60), False),
+    ("Manicure", 3, 30, 50, None, False),
+]
+OBSERVACOES = [
+    "Cliente satisfeita", "Retocar raiz em 30 dias", "Alergia a amônia",
+    "Prefere horário pela manhã", "Trouxe referência de foto", "Pediu desconto",
+]
+
+TAMANHO_LOTE = 20000
+
+
+def _acumulados(pesos: Sequence[float]) -> List[float]:
+    total = 0.0
+    resultado = []
+    for peso in pesos:
+        total += peso
+        resultado.append(total)
+    return resultado
+
+
+def gerar_nomes(rng: random.Random, quantidade: int) -> Iterator[str]:
+    nomes, pesos_nomes = zip(*PRIMEIROS_NOMES)
+    sobrenomes, pesos_sobrenomes = zip(*SOBRENOMES)
+    acum_nomes = _acumulados(pesos_nomes)
+    acum_sobrenomes = _acumulados(pesos_sobrenomes)
+    for _ in range(quantidade):
+        nome = rng.choices(nomes, cum_weights=acum_nomes)[0]
+        partes = rng.choices(sobrenomes, cum_weights=acum_sobrenomes, k=1 if rng.random() < 0.6 else 2)
+        yield " ".join([nome, *partes])
+
+
+def gerar_data(rng: random.Random, hoje: date, anos: int) -> date:
+    """
+    Datas mais frequentes nos anos recentes (o salão cresce) e aos sábados.
+    """
+    dias = anos * 365
+    # betavariate(2, 1) concentra perto de 1, ou seja, perto de hoje
+    data = hoje - timedelta(days=int((1 - rng.betavariate(2, 1)) * dias))
+    if data.weekday() == 6:  # domingo fechado
+        data -= timedelta(days=1)
+    elif data.weekday() < 4 and rng.random() < 0.25:
+        data += timedelta(days=5 - data.weekday())  # desloca parte da semana para sábado
+    return min(data, hoje)
+
+
+def gerar_procedimentos(
+    rng: random.Random,
+    quantidade: int,
+    cliente_ids: Sequence[int],
+    anos: int,
+) -> Iterator[Dict]:
+    hoje = date.today()
+    # Peso log-normal por cliente: poucos clientes fiéis concentram muitas visitas
+    acum_clientes = _acumulados([rng.lognormvariate(0, 1.2) for _ in cliente_ids])
+    acum_tipos = _acumulados([tipo[1] for tipo in TIPOS_PROCEDIMENTO])
+    # O id no catálogo é a posição em TIPOS_PROCEDIMENTO (veja popular())
+    tipos = [(posicao, *tipo) for posicao, tipo in enumerate(TIPOS_PROCEDIMENTO, start=1)]
+
+    for _ in range(quantidade):
+        tipo_id, tipo, _, minimo, maximo, tonalizante, sempre_corte = rng.choices(
+            tipos, cum_weights=acum_tipos
+        )[0]
+        yield {
+            "cliente_id": rng.choices(cliente_ids, cum_weights=acum_clientes)[0],
+            "data_procedimento": gerar_data(rng, hoje, anos),
+            "tipo_procedimento": tipo,
+            "tipo_procedimento_id": tipo_id,
+            "qtd_tonalizante": round(rng.uniform(*tonalizante), 1) if tonalizante else None,
+            "valor_procedimento": round(rng.uniform(minimo, maximo) / 5) * 5.0,
+            "observacao": rng.choice(OBSERVACOES) if rng.random() < 0.1 else None,
+            "corte": sempre_corte or rng.random() < 0.2,
+        }
+
+
+def _lotes(linhas: Iterator[Dict], tamanho: int) -> Iterator[List[Dict]]:
+    lote: List[Dict] = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _copiar_postgres(connection, tabela: str, colunas: Sequence[str], lote: List[Dict]) -> None:
+    """
+    Insere um lote com COPY, bem mais rápido que INSERT para milhões de linhas.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for linha in lote:
+        escritor.writerow(["\\N" if linha[coluna] is None else linha[coluna] for coluna in colunas])
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(
+        f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        buffer,
+    )
+
+
+def _inserir(connection, tabela, lotes: Iterator[List[Dict]], total: int, rotulo: str) -> None:
+    postgres = connection.dialect.name == "postgresql"
+    inicio = time.perf_counter()
+    inseridos = 0
+    for lote in lotes:
+        if postgres:
+            _copiar_postgres(connection, tabela.name, list(lote[0].keys()), lote)
+        else:
+            connection.execute(tabela.insert(), lote)
+        inseridos += len(lote)
+        print(f"\r  {rotulo}: {inseridos}/{total} ({inseridos / (time.perf_counter() - inicio):.0f}/s)", end="", flush=True)
+    print()
+
+
+def popular(database_url: str, clientes: int, procedimentos: int, anos: int, semente: int, recriar: bool) -> None:
+    sys.path.insert(0, APP_DIR)
+    os.environ["DATABASE_URL"] = database_url
+
+    from sqlalchemy import create_engine, func, select, text
+    from db.base import Base
+    from models.usuario import Usuario
+    from models.cliente import Cliente
+    from models.procedimento import Procedimento
+    from models.tipo_procedimento import TipoProcedimento
+    from core.texto import normalizar
+    from models.alteracao import Alteracao  # noqa: F401 (tabela do log de sincronização)
+    from models.agendamento import Agendamento  # noqa: F401 (agenda)
+    from models.cadeira import Cadeira  # noqa: F401
+    from models.profissional import Profissional  # noqa: F401
+    from models.cliente_duplicado import ClienteDuplicado  # noqa: F401 (detecção de duplicados)
+    from models.auditoria import Auditoria  # noqa: F401 (trilha de auditoria)
+    from models.tarefa import Tarefa  # noqa: F401 (tarefas em segundo plano)
+    from crud.auth import get_password_hash
+
+    engine = create_engine(database_url)
+    rng = random.Random(semente)
+
+    if recriar:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as connection:
+        existentes = connection.execute(select(func.count()).select_from(Cliente.__table__)).scalar()
+        if existentes:
+            raise SystemExit("A tabela clientes já tem dados. Use --recriar para apagar e popular de novo.")
+
+        connection.execute(Usuario.__table__.insert(), [{
+            "username": ADMIN_USERNAME,
+            "email": ADMIN_EMAIL,
+            "hashed_password": get_password_hash(ADMIN_SENHA),
+            "nome_completo": "Usuário de benchmark",
+            "is_active": True,
+            "is_admin": True,
+        }])
+
+        print(f"Gerando {clientes} clientes e {procedimentos} procedimentos (semente {semente})")
+        linhas_clientes = ({"id": i, "nome": nome} for i, nome in enumerate(gerar_nomes(rng, clientes), start=1))
+        _inserir(connection, Cliente.__table__, _lotes(linhas_clientes, TAMANHO_LOTE), clientes, "clientes")
+
+        connection.execute(TipoProcedimento.__table__.insert(), [
+            {"id": posicao, "nome": tipo[0], "chave": normalizar(tipo[0])}
+            for posicao, tipo in enumerate(TIPOS_PROCEDIMENTO, start=1)
+        ])
+
+        cliente_ids = range(1, clientes + 1)
+        linhas_procedimentos = gerar_procedimentos(rng, procedimentos, cliente_ids, anos)
+        _inserir(connection, Procedimento.__table__, _lotes(linhas_procedimentos, TAMANHO_LOTE), procedimentos, "procedimentos")
+
+        if connection.dialect.name == "postgresql":
+            # Os IDs dos clientes foram informados explicitamente; ajusta a sequence
+            connection.execute(text("SELECT setval(pg_get_serial_sequence('clientes', 'id'), (SELECT MAX(id) FROM clientes))"))
+            connection.execute(text(
+                "SELECT setval(pg_get_serial_sequence('tipos_procedimento', 'id'), (SELECT MAX(id) FROM tipos_procedimento))"
+            ))
+
+    with engine.begin() as connection:
+        # Atualiza as estatísticas do planejador depois da carga em massa
+        connection.execute(text("ANALYZE"))
+    print("Dados gerados.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Popula o banco com dados sintéticos para benchmark")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///benchmarks/bench.db"))
+    parser.add_argument("--clientes", type=int, default=10000)
+    parser.add_argument("--procedimentos", type=int, default=200000)
+    parser.add_argument("--anos", type=int, default=5, help="Período coberto pelas datas dos procedimentos")
+    parser.add_argument("--semente", type=int, default=42, help="Semente do gerador (dados reprodutíveis)")
+    parser.add_argument("--recriar", action="store_true", help="Apaga e recria as tabelas antes de popular")
+    args = parser.parse_args()
+
+    if args.clientes < 1:
+        parser.error("--clientes deve ser pelo menos 1")
+    popular(args.database_url, args.clientes, args.procedimentos, args.anos, args.semente, args.recriar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Tempo da detecção de clientes duplicados.
+
+Roda core.duplicados.detectar() sobre os nomes do banco da suíte
+(benchmarks/dados.py), com cópias de uma fração dos clientes com um erro de
+digitação acrescentadas em memória, e informa o tempo e quantos desses
+erros foram encontrados.
+
+Uso:
+    python benchmarks/duplicados.py --popular --clientes 100000
+    python benchmarks/duplicados.py --database-url postgresql://... --limite-s 60
+
+Sai com código 1 quando a detecção passa do limite.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from dados import APP_DIR, popular
+from executar import _url_absoluta
+
+
+def com_erro(rng: random.Random, nome: str) -> str:
+    """
+    O nome com um erro de digitação dentro de uma palavra: uma letra
+    trocada, removida ou repetida, ou duas letras vizinhas invertidas.
+    """
+    posicoes = [
+        posicao for posicao in range(1, len(nome) - 1)
+        if nome[posicao] != " " and nome[posicao - 1] != " "
+    ]
+    posicao = rng.choice(posicoes)
+    erro = rng.choice(("trocar", "remover", "repetir", "inverter"))
+    if erro == "trocar":
+        return nome[:posicao] + rng.choice("aeiourslmnt") + nome[posicao + 1:]
+    if erro == "remover":
+        return nome[:posicao] + nome[posicao + 1:]
+    if erro == "repetir":
+        return nome[:posicao] + nome[posicao] + nome[posicao:]
+    return nome[:posicao - 1] + nome[posicao] + nome[posicao - 1] + nome[posicao + 1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo da detecção de clientes duplicados")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///benchmarks/bench.db"))
+    parser.add_argument("--popular", action="store_true", help="Recria e popula o banco antes de medir")
+    parser.add_argument("--clientes", type=int, default=100000)
+    parser.add_argument("--erros", type=float, default=0.01, help="Fração de clientes copiados com erro de digitação")
+    parser.add_argument("--limite-s", type=float, default=120)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    database_url = _url_absoluta(args.database_url)
+    if args.popular:
+        popular(database_url, args.clientes, args.clientes, anos=1, semente=args.semente, recriar=True)
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, APP_DIR)
+
+    from sqlalchemy import select
+    from core.duplicados import detectar
+    from db.session import SessionLocal
+    from models.cliente import Cliente
+    from models.procedimento import Procedimento  # noqa: F401 (relacionamento de Cliente)
+
+    with SessionLocal() as db:
+        nomes = db.execute(select(Cliente.id, Cliente.nome)).all()
+
+    # Cópias com erro, com ids acima dos existentes
+    rng = random.Random(args.semente)
+    proximo = max((cliente_id for cliente_id, _ in nomes), default=0) + 1
+    copias = {}
+    for cliente_id, nome in rng.sample(nomes, int(len(nomes) * args.erros)):
+        copias[proximo] = cliente_id
+        nomes.append((proximo, com_erro(rng, nome)))
+        proximo += 1
+
+    comeco = time.perf_counter()
+    pares = detectar(nomes)
+    duracao = time.perf_counter() - comeco
+
+    # Uma cópia foi encontrada se caiu no mesmo grupo que o original
+    ligados = {}
+    for a, b, _ in pares:
+        ligados.setdefault(a, set()).add(b)
+        ligados.setdefault(b, set()).add(a)
+
+    def grupo(cliente_id):
+        vistos, pendentes = set(), [cliente_id]
+        while pendentes:
+            atual = pendentes.pop()
+            if atual not in vistos:
+                vistos.add(atual)
+                pendentes.extend(ligados.get(atual, ()))
+        return vistos
+
+    encontradas = sum(1 for copia, original in copias.items() if original in grupo(copia))
+    print(f"{len(nomes)} nomes, {len(pares)} pares sugeridos em {duracao:.1f} s")
+    print(f"erros de digitação encontrados: {encontradas} de {len(copias)}")
+    if duracao > args.limite_s:
+        print(f"Acima do limite de {args.limite_s:.0f} s.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Capacidade do feed de eventos (SSE) de um worker.
+
+Sobe um worker uvicorn, conecta N assinantes em GET /api/v1/eventos/ e cria
+procedimentos, medindo para cada N:
+- quantos assinantes conectaram e quantos receberam todos os eventos;
+- a latência de entrega (do envio do POST até o evento chegar), p50/p99;
+- a memória residente do worker.
+
+N cresce até o worker deixar de entregar tudo ou o p99 passar do limite; o
+maior N aprovado é a capacidade de um worker.
+
+Uso (banco populado com benchmarks/dados.py):
+    python benchmarks/eventos.py
+    python benchmarks/eventos.py --assinantes 500,1000,2000,4000 --eventos 20 --limite-p99-ms 250
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, text
+
+from dados import ADMIN_EMAIL, ADMIN_SENHA
+from executar import _porta_livre, _url_absoluta, percentil, subir_servidor
+
+
+def _login(porta: int) -> str:
+    conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=60)
+    corpo = json.dumps({"email": ADMIN_EMAIL, "password": ADMIN_SENHA})
+    conexao.request("POST", "/api/v1/auth/login/json", body=corpo, headers={"Content-Type": "application/json"})
+    resposta = conexao.getresponse()
+    dados = json.loads(resposta.read() or b"{}")
+    if resposta.status != 200:
+        raise SystemExit(f"Falha no login do usuário de benchmark: {dados}")
+    return dados["access_token"]
+
+
+def _memoria_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as arquivo:
+            for linha in arquivo:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+async def _assinar(porta: int, token: str, esperados: int, enviados: Dict[str, float],
+                   latencias: List[float], conectados: asyncio.Event, contagem: List[int]) -> int:
+    """
+    Mantém uma conexão SSE e devolve quantos eventos do benchmark recebeu.
+    """
+    leitor, escritor = await asyncio.open_connection("127.0.0.1", porta, limit=1 << 20)
+    escritor.write(
+        f"GET /api/v1/eventos/ HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+        f"Authorization: Bearer {token}\r\nAccept: text/event-stream\r\n\r\n".encode()
+    )
+    await escritor.drain()
+    recebidos = 0
+    try:
+        status = await leitor.readline()
+        if b" 200 " not in status:
+            return -1
+        contagem[0] += 1
+        if contagem[0] == contagem[1]:
+            conectados.set()
+        while recebidos < esperados:
+            linha = await leitor.readline()
+            if not linha:
+                break
+            if not linha.startswith(b"data: {"):
+                continue
+            evento = json.loads(linha[6:])
+            marcador = (evento.get("dados") or {}).get("observacao")
+            if evento.get("acao") == "criado" and marcador in enviados:
+                latencias.append(time.perf_counter() - enviados[marcador])
+                recebidos += 1
+    finally:
+        escritor.close()
+    return recebidos
+
+
+def _publicar(porta: int, token: str, cliente_id: int, eventos: int, enviados: Dict[str, float],
+              intervalo_s: float) -> None:
+    conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=60)
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
+    for i in range(eventos):
+        marcador = f"bench-eventos-{time.time_ns()}-{i}"
+        corpo = json.dumps({
+            "cliente_id": cliente_id, "data_procedimento": time.strftime("%Y-%m-%d"),
+            "tipo_procedimento": "Corte", "valor_procedimento": 50, "observacao": marcador,
+        })
+        enviados[marcador] = time.perf_counter()
+        conexao.request("POST", "/api/v1/procedimentos/", body=corpo, headers=headers)
+        resposta = conexao.getresponse()
+        resposta.read()
+        if resposta.status != 201:
+            raise SystemExit(f"Falha ao criar procedimento: {resposta.status}")
+        time.sleep(intervalo_s)
+    conexao.close()
+
+
+async def medir(porta: int, token: str, cliente_id: int, assinantes: int, eventos: int,
+                intervalo_s: float, timeout_s: float) -> Dict:
+    enviados: Dict[str, float] = {}
+    latencias: List[float] = []
+    conectados = asyncio.Event()
+    contagem = [0, assinantes]
+
+    tarefas = [
+        asyncio.create_task(_assinar(porta, token, eventos, enviados, latencias, conectados, contagem))
+        for _ in range(assinantes)
+    ]
+    try:
+        await asyncio.wait_for(conectados.wait(), timeout_s)
+    except asyncio.TimeoutError:
+        pass
+
+    publicador = threading.Thread(
+        target=_publicar, args=(porta, token, cliente_id, eventos, enviados, intervalo_s), daemon=True
+    )
+    publicador.start()
+    concluidas, pendentes = await asyncio.wait(tarefas, timeout=timeout_s + eventos * intervalo_s)
+    for tarefa in pendentes:
+        tarefa.cancel()
+    publicador.join()
+
+    resultados = [tarefa.result() for tarefa in concluidas if not tarefa.exception()]
+    latencias.sort()
+    return {
+        "assinantes": assinantes,
+        "conectados": contagem[0],
+        "completos": sum(1 for recebidos in resultados if recebidos == eventos),
+        "entregas": len(latencias),
+        "p50_ms": round(percentil(latencias, 50) * 1000, 1),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assinantes simultâneos do feed de eventos em um worker")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///benchmarks/bench.db"))
+    parser.add_argument("--assinantes", default="100,500,1000,2000,4000", help="Valores de N, em ordem")
+    parser.add_argument("--eventos", type=int, default=10, help="Procedimentos criados por rodada")
+    parser.add_argument("--intervalo-ms", type=float, default=50, help="Pausa entre os procedimentos")
+    parser.add_argument("--limite-p99-ms", type=float, default=500)
+    parser.add_argument("--timeout", type=float, default=30, help="Espera máxima por rodada (s)")
+    args = parser.parse_args()
+
+    # Cada assinante usa um descritor aqui e outro no servidor
+    _, maximo = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (maximo, maximo))
+
+    database_url = _url_absoluta(args.database_url)
+    engine = create_engine(database_url)
+    with engine.connect() as connection:
+        cliente_id = connection.execute(text("SELECT MIN(id) FROM clientes")).scalar()
+    engine.dispose()
+    if not cliente_id:
+        raise SystemExit("Banco vazio. Rode benchmarks/dados.py antes.")
+
+    porta = _porta_livre()
+    processo = subir_servidor(database_url, porta, 1, tempfile.mkdtemp(prefix="eventos-"))
+    try:
+        token = _login(porta)
+        aprovado = 0
+        print(f"{'assinantes':>10} {'conectados':>10} {'completos':>10} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>8}")
+        for assinantes in (int(valor) for valor in args.assinantes.split(",")):
+            resultado = asyncio.run(medir(
+                porta, token, cliente_id, assinantes, args.eventos, args.intervalo_ms / 1000, args.timeout
+            ))
+            memoria = _memoria_mb(processo.pid)
+            print(f"{assinantes:>10} {resultado['conectados']:>10} {resultado['completos']:>10} "
+                  f"{resultado['p50_ms']:>8} {resultado['p99_ms']:>8} {memoria or 0:>8.0f}")
+            if resultado["completos"] < assinantes or resultado["p99_ms"] > args.limite_p99_ms:
+                break
+            aprovado = assinantes
+            time.sleep(1)  # o servidor fecha as conexões da rodada anterior
+    finally:
+        processo.terminate()
+        processo.wait()
+
+    if not aprovado:
+        print("\nNenhuma rodada entregou todos os eventos dentro do limite.")
+        sys.exit(1)
+    print(f"\nUm worker sustentou {aprovado} assinantes com p99 <= {args.limite_p99_ms:.0f} ms.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+"""
+Executa os cenários de carga contra a API e grava os resultados em JSON.
+
+Sobe o uvicorn apontando para o banco informado (populado antes com
+benchmarks/dados.py), dispara cada cenário com concorrência fixa durante um
+tempo fixo e registra vazão e latências p50/p95/p99.
+
+Uso:
+    python benchmarks/executar.py --database-url sqlite:///benchmarks/bench.db \\
+        --concorrencia 16 --duracao 20
+
+Os resultados vão para benchmarks/resultados/<commit>-<data>.json; use
+benchmarks/comparar.py para comparar dois arquivos.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlparse
+
+from dados import ADMIN_EMAIL, ADMIN_SENHA, APP_DIR
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIR_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+
+# Imagem PNG mínima usada no cenário de upload
+FOTO_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000100e221bc330000000049454e44ae426082"
+)
+
+
+class Contexto:
+    """
+    Dados compartilhados pelos cenários: token e faixa de IDs existentes.
+    """
+
+    def __init__(self, token: str, max_cliente_id: int, total_procedimentos: int):
+        self.token = token
+        self.max_cliente_id = max_cliente_id
+        self.total_procedimentos = total_procedimentos
+        self.clientes_com_foto: List[int] = []
+        self.hoje = date.today()
+
+    def auth(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    def cliente_aleatorio(self) -> int:
+        return random.randint(1, self.max_cliente_id)
+
+
+Requisicao = Tuple[str, str, Optional[bytes], Dict[str, str]]
+
+
+def _json(corpo: Dict) -> Tuple[bytes, Dict[str, str]]:
+    return json.dumps(corpo).encode(), {"Content-Type": "application/json"}
+
+
+def _multipart(nome_arquivo: str, conteudo: bytes, tipo: str) -> Tuple[bytes, Dict[str, str]]:
+    fronteira = uuid.uuid4().hex
+    corpo = (
+        f"--{fronteira}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{nome_arquivo}"\r\n'
+        f"Content-Type: {tipo}\r\n\r\n"
+    ).encode() + conteudo + f"\r\n--{fronteira}--\r\n".encode()
+    return corpo, {"Content-Type": f"multipart/form-data; boundary={fronteira}"}
+
+
+def cenario_login(ctx: Contexto) -> Requisicao:
+    corpo, headers = _json({"email": ADMIN_EMAIL, "password": ADMIN_SENHA})
+    return "POST", "/api/v1/auth/login/json", corpo, headers
+
+
+def cenario_listar_clientes(ctx: Contexto) -> Requisicao:
+    return "GET", f"/api/v1/clientes/?{urlencode({'skip': random.randint(0, 500), 'limit': 100})}", None, {}
+
+
+def cenario_buscar_clientes(ctx: Contexto) -> Requisicao:
+    termo = random.choice(["mar", "silva", "ana sa", "oli", "conce", "jul", "gonç", "fer"])
+    return "GET", f"/api/v1/clientes/?{urlencode({'search': termo})}", None, {}
+
+
+def cenario_get_cliente(ctx: Contexto) -> Requisicao:
+    return "GET", f"/api/v1/clientes/{ctx.cliente_aleatorio()}", None, {}
+
+
+def cenario_historico(ctx: Contexto) -> Requisicao:
+    return "GET", f"/api/v1/clientes/{ctx.cliente_aleatorio()}/historico", None, {}
+
+
+def cenario_listar_procedimentos(ctx: Contexto) -> Requisicao:
+    return "GET", "/api/v1/procedimentos/", None, {}
+
+
+def cenario_filtrar_procedimentos(ctx: Contexto) -> Requisicao:
+    inicio = ctx.hoje - timedelta(days=random.randint(0, 365))
+    filtros = {"data_inicio": inicio.isoformat(), "data_fim": (inicio + timedelta(days=30)).isoformat()}
+    sorteio = random.random()
+    if sorteio < 0.3:
+        filtros["corte"] = "true"
+    elif sorteio < 0.6:
+        filtros = {"cliente_id": ctx.cliente_aleatorio()}
+    return "GET", f"/api/v1/procedimentos/?{urlencode(filtros)}", None, {}
+
+
+def cenario_upload_foto(ctx: Contexto) -> Requisicao:
+    corpo, headers = _multipart("foto.png", FOTO_PNG, "image/png")
+    return "POST", f"/api/v1/clientes/{random.choice(ctx.clientes_com_foto)}/foto", corpo, {**headers, **ctx.auth()}
+
+
+def cenario_download_foto(ctx: Contexto) -> Requisicao:
+    return "GET", f"/api/v1/clientes/{random.choice(ctx.clientes_com_foto)}/foto", None, {}
+
+
+def cenario_criar_cliente(ctx: Contexto) -> Requisicao:
+    corpo, headers = _json({"nome": f"Cliente Benchmark {uuid.uuid4().hex[:8]}"})
+    return "POST", "/api/v1/clientes/", corpo, {**headers, **ctx.auth()}
+
+
+def cenario_atualizar_cliente(ctx: Contexto) -> Requisicao:
+    corpo, headers = _json({"nome": f"Cliente Atualizada {random.randint(1, 10**6)}"})
+    return "PUT", f"/api/v1/clientes/{ctx.cliente_aleatorio()}", corpo, {**headers, **ctx.auth()}
+
+
+def cenario_criar_procedimento(ctx: Contexto) -> Requisicao:
+    corpo, headers = _json({
+        "cliente_id": ctx.cliente_aleatorio(),
+        "data_procedimento": ctx.hoje.isoformat(),
+        "tipo_procedimento": "Corte",
+        "valor_procedimento": 60.0,
+        "corte": True,
+    })
+    return "POST", "/api/v1/procedimentos/", corpo, {**headers, **ctx.auth()}
+
+
+def cenario_atualizar_procedimento(ctx: Contexto) -> Requisicao:
+    corpo, headers = _json({"valor_procedimento": float(random.randint(40, 300))})
+    return "PUT", f"/api/v1/procedimentos/{random.randint(1, max(1, ctx.total_procedimentos))}", corpo, {**headers, **ctx.auth()}
+
+
+CENARIOS: Dict[str, Callable[[Contexto], Requisicao]] = {
+    "login": cenario_login,
+    "listar_clientes": cenario_listar_clientes,
+    "buscar_clientes": cenario_buscar_clientes,
+    "get_cliente": cenario_get_cliente,
+    "historico": cenario_historico,
+    "listar_procedimentos": cenario_listar_procedimentos,
+    "filtrar_procedimentos": cenario_filtrar_procedimentos,
+    "upload_foto": cenario_upload_foto,
+    "download_foto": cenario_download_foto,
+    "criar_cliente": cenario_criar_cliente,
+    "atualizar_cliente": cenario_atualizar_cliente,
+    "criar_procedimento": cenario_criar_procedimento,
+    "atualizar_procedimento": cenario_atualizar_procedimento,
+}
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """
+    Percentil pelo método nearest-rank (valores já ordenados).
+    """
+    if not valores:
+        return 0.0
+    indice = max(0, min(len(valores) - 1, int(round(p / 100 * len(valores) + 0.5)) - 1))
+    return valores[indice]
+
+
+def _enviar(conexao: http.client.HTTPConnection, requisicao: Requisicao) -> int:
+    metodo, caminho, corpo, headers = requisicao
+    conexao.request(metodo, caminho, body=corpo, headers=headers)
+    resposta = conexao.getresponse()
+    resposta.read()
+    return resposta.status
+
+
+def executar_cenario(
+    host: str,
+    porta: int,
+    ctx: Contexto,
+    gerador: Callable[[Contexto], Requisicao],
+    concorrencia: int,
+    duracao: float,
+    aquecimento: float,
+) -> Dict:
+    """
+    Mantém `concorrencia` clientes em laço fechado (cada um com conexão
+    keep-alive própria) e mede só as requisições após o aquecimento.
+    """
+    latencias: List[List[float]] = [[] for _ in range(concorrencia)]
+    erros = [0] * concorrencia
+    status_erro: Dict[int, int] = {}
+    inicio_medicao = time.perf_counter() + aquecimento
+    fim = inicio_medicao + duracao
+
+    def trabalhador(indice: int) -> None:
+        conexao = http.client.HTTPConnection(host, porta, timeout=60)
+        while True:
+            agora = time.perf_counter()
+            if agora >= fim:
+                break
+            requisicao = gerador(ctx)
+            try:
+                status = _enviar(conexao, requisicao)
+            except (OSError, http.client.HTTPException):
+                conexao.close()
+                conexao = http.client.HTTPConnection(host, porta, timeout=60)
+                status = 0
+            depois = time.perf_counter()
+            if agora < inicio_medicao:
+                continue
+            latencias[indice].append(depois - agora)
+            if status == 0 or status >= 400:
+                erros[indice] += 1
+                status_erro[status] = status_erro.get(status, 0) + 1
+        conexao.close()
+
+    threads = [threading.Thread(target=trabalhador, args=(i,)) for i in range(concorrencia)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    todas = sorted(valor for lista in latencias for valor in lista)
+    total = len(todas)
+    return {
+        "requisicoes": total,
+        "erros": sum(erros),
+        "status_erro": {str(codigo): quantidade for codigo, quantidade in status_erro.items()},
+        "rps": round(total / duracao, 2),
+        "media_ms": round(sum(todas) / total * 1000, 3) if total else 0.0,
+        "p50_ms": round(percentil(todas, 50) * 1000, 3),
+        "p95_ms": round(percentil(todas, 95) * 1000, 3),
+        "p99_ms": round(percentil(todas, 99) * 1000, 3),
+        "max_ms": round(todas[-1] * 1000, 3) if todas else 0.0,
+    }
+
+
+def _url_absoluta(database_url: str) -> str:
+    """
+    Converte caminhos relativos do SQLite em absolutos, já que o servidor
+    roda em outro diretório de trabalho.
+    """
+    prefixo = "sqlite:///"
+    if database_url.startswith(prefixo) and not database_url.startswith(prefixo + "/"):
+        return prefixo + os.path.abspath(database_url[len(prefixo):])
+    return database_url
+
+
+def _porta_livre() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def subir_servidor(database_url: str, porta: int, workers: int, diretorio: str) -> subprocess.Popen:
+    """
+    Sobe o uvicorn com o diretório de trabalho em `diretorio`, para que as
+    fotos enviadas durante o benchmark não caiam na árvore do projeto.
+    """
+    env = {**os.environ, "DATABASE_URL": database_url}
+    processo = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--app-dir", os.path.abspath(APP_DIR),
+            "--host", "127.0.0.1", "--port", str(porta),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=diretorio,
+        env=env,
+    )
+    limite = time.time() + 60
+    while time.time() < limite:
+        if processo.poll() is not None:
+            raise SystemExit("O servidor encerrou durante a inicialização")
+        try:
+            conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=2)
+            if _enviar(conexao, ("GET", "/health", None, {})) == 200:
+                return processo
+        except OSError:
+            time.sleep(0.2)
+    processo.terminate()
+    raise SystemExit("O servidor não respondeu ao /health em 60s")
+
+
+def _preparar(host: str, porta: int, database_url: str) -> Contexto:
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(database_url)
+    with engine.connect() as connection:
+        max_cliente_id = connection.execute(text("SELECT MAX(id) FROM clientes")).scalar()
+        total_procedimentos = connection.execute(text("SELECT COUNT(*) FROM procedimentos")).scalar()
+    engine.dispose()
+    if not max_cliente_id:
+        raise SystemExit("Banco vazio. Rode benchmarks/dados.py antes.")
+
+    conexao = http.client.HTTPConnection(host, porta, timeout=60)
+    corpo, headers = _json({"email": ADMIN_EMAIL, "password": ADMIN_SENHA})
+    conexao.request("POST", "/api/v1/auth/login/json", body=corpo, headers=headers)
+    resposta = conexao.getresponse()
+    dados = json.loads(resposta.read() or b"{}")
+    if resposta.status != 200:
+        raise SystemExit(f"Falha no login do usuário de benchmark: {dados}")
+
+    ctx = Contexto(dados["access_token"], max_cliente_id, total_procedimentos)
+
+    # Alguns clientes com foto para o cenário de download
+    for cliente_id in range(1, min(20, max_cliente_id) + 1):
+        corpo, headers = _multipart("foto.png", FOTO_PNG, "image/png")
+        status = _enviar(conexao, ("POST", f"/api/v1/clientes/{cliente_id}/foto", corpo, {**headers, **ctx.auth()}))
+        if status == 200:
+            ctx.clientes_com_foto.append(cliente_id)
+    conexao.close()
+    return ctx
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", *args], cwd=RAIZ, stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga dos endpoints da API")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///benchmarks/bench.db"))
+    parser.add_argument("--url", help="Usa um servidor já em execução em vez de subir um (ex: http://localhost:8000)")
+    parser.add_argument("--workers", type=int, default=1, help="Workers do uvicorn")
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--duracao", type=float, default=15.0, help="Segundos medidos por cenário")
+    parser.add_argument("--aquecimento", type=float, default=3.0, help="Segundos descartados no início de cada cenário")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS), help="Lista separada por vírgulas")
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: benchmarks/resultados/<commit>-<data>.json)")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    cenarios = [nome.strip() for nome in args.cenarios.split(",") if nome.strip()]
+    desconhecidos = [nome for nome in cenarios if nome not in CENARIOS]
+    if desconhecidos:
+        parser.error(f"Cenários desconhecidos: {', '.join(desconhecidos)}")
+    random.seed(args.semente)
+    args.database_url = _url_absoluta(args.database_url)
+
+    processo = None
+    diretorio = tempfile.mkdtemp(prefix="bench-salao-")
+    try:
+        if args.url:
+            alvo = urlparse(args.url)
+            host, porta = alvo.hostname, alvo.port or 80
+        else:
+            host, porta = "127.0.0.1", _porta_livre()
+            processo = subir_servidor(args.database_url, porta, args.workers, diretorio)
+
+        ctx = _preparar(host, porta, args.database_url)
+        resultados = {}
+        for nome in cenarios:
+            resultado = executar_cenario(
+                host, porta, ctx, CENARIOS[nome], args.concorrencia, args.duracao, args.aquecimento
+            )
+            resultados[nome] = resultado
+            print(
+                f"{nome:<24} {resultado['rps']:>9.1f} req/s  p50 {resultado['p50_ms']:>8.2f}ms  "
+                f"p95 {resultado['p95_ms']:>8.2f}ms  p99 {resultado['p99_ms']:>8.2f}ms  erros {resultado['erros']}"
+            )
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait(timeout=30)
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    commit = _git("rev-parse", "--short", "HEAD") or "desconhecido"
+    agora = datetime.now(timezone.utc)
+    relatorio = {
+        "commit": commit,
+        "alteracoes_locais": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "data": agora.isoformat(),
+        "python": sys.version.split()[0],
+        "banco": {
+            "dialeto": urlparse(args.database_url).scheme,
+            "clientes": ctx.max_cliente_id,
+            "procedimentos": ctx.total_procedimentos,
+        },
+        "config": {
+            "workers": args.workers,
+            "concorrencia": args.concorrencia,
+            "duracao_s": args.duracao,
+            "aquecimento_s": args.aquecimento,
+            "semente": args.semente,
+        },
+        "cenarios": resultados,
+    }
+
+    saida = args.saida or os.path.join(DIR_RESULTADOS, f"{commit}-{agora.strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Orçamento de tempo de inicialização dos workers.
+
+Mede, em processos novos:
+- o tempo de `import main` (python -X importtime), listando os módulos mais caros;
+- o tempo do uvicorn até o primeiro /health respondido, e as fases do lifespan
+  (gauge startup_duration_seconds do /metrics).
+
+Uso:
+    python benchmarks/inicializacao.py
+    python benchmarks/inicializacao.py --limite-import-ms 800 --limite-ms 2500 --repeticoes 5
+
+Sai com código 1 quando a mediana de algum dos tempos passa do limite.
+"""
+import argparse
+import http.client
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from dados import APP_DIR
+from executar import _porta_livre, _url_absoluta
+
+
+def medir_import(database_url: str) -> Tuple[float, List[Tuple[float, str]]]:
+    """
+    Importa o main em um interpretador novo e devolve o tempo total (ms) e os
+    módulos ordenados pelo tempo próprio (ms, nome).
+    """
+    env = {**os.environ, "DATABASE_URL": database_url}
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=os.path.abspath(APP_DIR), env=env, capture_output=True, text=True, check=True,
+    )
+    modulos: List[Tuple[float, str]] = []
+    total = 0.0
+    for linha in resultado.stderr.splitlines():
+        encontrado = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", linha)
+        if not encontrado:
+            continue
+        proprio, acumulado, recuo, nome = encontrado.groups()
+        modulos.append((int(proprio) / 1000, nome))
+        if nome == "main" and len(recuo) == 1:
+            total = int(acumulado) / 1000
+    modulos.sort(reverse=True)
+    return total, modulos
+
+
+def _health(porta: int) -> bool:
+    try:
+        conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=1)
+        conexao.request("GET", "/health")
+        return conexao.getresponse().status == 200
+    except OSError:
+        return False
+
+
+def _fases(porta: int) -> Dict[str, float]:
+    conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=5)
+    conexao.request("GET", "/metrics")
+    texto = conexao.getresponse().read().decode()
+    return {
+        fase: float(valor) * 1000
+        for fase, valor in re.findall(r'^startup_duration_seconds\{fase="(\w+)"\} (\S+)$', texto, re.M)
+    }
+
+
+def medir_boot(database_url: str, diretorio: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Sobe o uvicorn e mede o tempo (ms) até o primeiro /health com 200.
+    """
+    porta = _porta_livre()
+    env = {**os.environ, "DATABASE_URL": database_url}
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--app-dir", os.path.abspath(APP_DIR),
+            "--host", "127.0.0.1", "--port", str(porta), "--log-level", "warning",
+        ],
+        cwd=diretorio, env=env,
+    )
+    try:
+        while not _health(porta):
+            if processo.poll() is not None:
+                raise SystemExit("O servidor encerrou durante a inicialização")
+            if time.perf_counter() - inicio > 60:
+                raise SystemExit("O servidor não respondeu ao /health em 60s")
+            time.sleep(0.01)
+        return (time.perf_counter() - inicio) * 1000, _fases(porta)
+    finally:
+        processo.terminate()
+        processo.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de inicialização dos workers")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///benchmarks/bench.db"))
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--limite-import-ms", type=float, default=1000, help="Máximo para o import do main")
+    parser.add_argument("--limite-ms", type=float, default=3000, help="Máximo até o primeiro /health")
+    parser.add_argument("--top", type=int, default=15, help="Quantos módulos listar")
+    args = parser.parse_args()
+
+    database_url = _url_absoluta(args.database_url)
+    diretorio = tempfile.mkdtemp(prefix="inicializacao-")
+
+    imports, boots = [], []
+    modulos: List[Tuple[float, str]] = []
+    fases: Dict[str, float] = {}
+    for _ in range(args.repeticoes):
+        total, modulos = medir_import(database_url)
+        imports.append(total)
+        boot, fases = medir_boot(database_url, diretorio)
+        boots.append(boot)
+
+    print("Módulos mais caros (tempo próprio, última execução):")
+    for ms, nome in modulos[:args.top]:
+        print(f"  {ms:8.1f} ms  {nome}")
+    print("\nFases do lifespan (última execução):")
+    for fase, ms in fases.items():
+        print(f"  {ms:8.1f} ms  {fase}")
+
+    mediana_import = statistics.median(imports)
+    mediana_boot = statistics.median(boots)
+    print(f"\nimport main:     {mediana_import:8.1f} ms (limite {args.limite_import_ms:.0f})")
+    print(f"até o /health:   {mediana_boot:8.1f} ms (limite {args.limite_ms:.0f})")
+
+    falhas = []
+    if mediana_import > args.limite_import_ms:
+        falhas.append("import")
+    if mediana_boot > args.limite_ms:
+        falhas.append("boot")
+    if falhas:
+        print(f"\nOrçamento de inicialização estourado: {', '.join(falhas)}")
+        sys.exit(1)
+    print("\nInicialização dentro do orçamento.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""
+Testes de regressão de planos de execução (EXPLAIN) das queries do crud.
+
+Executa cada função de crud/*.py (e a que pega a próxima tarefa, em
+core/tarefas.py) contra um banco populado, captura o SQL realmente emitido e
+roda EXPLAIN sobre ele. Para cada caso verifica:
+- uso do índice esperado (ex: cliente_id, data_procedimento);
+- ausência de scan sequencial nas tabelas grandes;
+- estimativa de linhas (Postgres);
+- custo total contra a base gravada em planos_base.json (Postgres);
+- com procedimentos particionada (migração 0004), quantas partições o plano
+  lê: filtros por período devem descartar as demais.
+
+Com --popular, além de clientes e procedimentos (benchmarks/dados.py), são
+geradas linhas no log de sincronização, na agenda, nos pares de duplicados
+e na fila de tarefas, para que os planos dessas tabelas sejam os de uma
+tabela com volume, e não os de uma tabela vazia.
+
+Uso:
+    # popula um SQLite temporário e verifica os índices
+    python benchmarks/planos.py --popular
+
+    # Postgres local: grava a base de custos uma vez e depois compara
+    python benchmarks/planos.py --database-url postgresql://... --popular --gravar-base
+    python benchmarks/planos.py --database-url postgresql://...
+
+Sai com código 1 quando algum plano regride.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import random
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dados import APP_DIR, popular
+
+BASE_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "planos_base.json")
+
+
+class Caso:
+    """
+    Uma chamada de crud e o que se espera do plano das queries que ela emite.
+    """
+
+    def __init__(
+        self,
+        nome: str,
+        chamada: Callable,
+        indices: Optional[Dict[str, str]] = None,
+        sem_scan: Tuple[str, ...] = (),
+        sem_sort: bool = False,
+        max_linhas: Optional[int] = None,
+        max_particoes: Optional[int] = None,
+    ):
+        self.nome = nome
+        self.chamada = chamada
+        # tabela -> trecho do nome do índice que deve aparecer no plano
+        self.indices = indices or {}
+        self.sem_scan = sem_scan
+        self.sem_sort = sem_sort
+        self.max_linhas = max_linhas
+        self.max_particoes = max_particoes
+
+
+def popular_auxiliares(database_url: str, clientes: int, procedimentos: int, semente: int) -> None:
+    """
+    Preenche as tabelas que dados.py deixa vazias: o log de alterações (uma
+    entrada a cada dois procedimentos), um ano de agenda em volta de hoje,
+    pares de duplicados e a fila de tarefas (quase todas concluídas, como
+    fica com a retenção de TAREFAS_RETENCAO_DIAS dias).
+    """
+    from sqlalchemy import create_engine, insert, text
+    from models.agendamento import Agendamento
+    from models.alteracao import Alteracao
+    from models.cadeira import Cadeira
+    from models.cliente_duplicado import ClienteDuplicado
+    from models.profissional import Profissional
+    from models.tarefa import Tarefa
+
+    rng = random.Random(semente)
+    engine = create_engine(database_url)
+    postgres = engine.dialect.name == "postgresql"
+    agora = datetime.now(timezone.utc)
+    with engine.begin() as conexao:
+        alteracoes = procedimentos // 2
+        for inicio in range(0, alteracoes, 10000):
+            conexao.execute(insert(Alteracao), [
+                {
+                    # No SQLite a transação é sempre 0 (ver models/alteracao.py)
+                    "transacao": indice // 5 + 1 if postgres else 0,
+                    "tabela": "procedimentos" if rng.random() < 0.8 else "clientes",
+                    "registro_id": rng.randint(1, clientes),
+                    "acao": "removido" if rng.random() < 0.05 else "upsert",
+                }
+                for indice in range(inicio, min(inicio + 10000, alteracoes))
+            ])
+
+        profissionais, cadeiras = 10, 8
+        conexao.execute(insert(Profissional), [{"nome": f"Profissional {i}", "ativo": True} for i in range(profissionais)])
+        conexao.execute(insert(Cadeira), [{"nome": f"Cadeira {i}", "ativa": True} for i in range(cadeiras)])
+        # Uma hora por atendimento, das 9h às 17h, cada profissional na sua cadeira
+        hoje = date.today()
+        agendamentos = []
+        for dia in range(-182, 183):
+            base = datetime.combine(hoje + timedelta(days=dia), datetime.min.time())
+            for profissional_id in range(1, profissionais + 1):
+                for hora in range(9, 17):
+                    if rng.random() < 0.7:
+                        agendamentos.append({
+                            "cliente_id": rng.randint(1, clientes),
+                            "profissional_id": profissional_id,
+                            "cadeira_id": (profissional_id - 1) % cadeiras + 1,
+                            "inicio": base + timedelta(hours=hora),
+                            "fim": base + timedelta(hours=hora + 1),
+                            "tipo_procedimento": "Corte",
+                            "status": "cancelado" if rng.random() < 0.05 else "agendado",
+                        })
+        conexao.execute(insert(Agendamento), agendamentos)
+
+        pares = {tuple(sorted(rng.sample(range(1, clientes + 1), 2))) for _ in range(min(2000, clientes))}
+        conexao.execute(insert(ClienteDuplicado), [
+            {
+                "cliente_id": cliente_id,
+                "duplicado_id": duplicado_id,
+                "similaridade": round(rng.uniform(0.85, 1.0), 4),
+                "descartado_em": agora if rng.random() < 0.3 else None,
+            }
+            for cliente_id, duplicado_id in pares
+        ])
+
+        tarefas = []
+        for indice in range(50000):
+            estado = "concluida" if indice < 49800 else rng.choice(("pendente", "pendente", "falhou"))
+            executar_em = agora - timedelta(seconds=rng.randint(0, 7 * 86400))
+            tarefas.append({
+                "tipo": "remover_fotos",
+                "argumentos": {"caminhos": []},
+                "estado": estado,
+                "tentativas": 1,
+                "max_tentativas": 5,
+                "executar_em": executar_em,
+                "concluido_em": executar_em if estado == "concluida" else None,
+            })
+        conexao.execute(insert(Tarefa), tarefas)
+
+    with engine.begin() as conexao:
+        conexao.execute(text("ANALYZE"))
+    print("Tabelas auxiliares geradas.")
+
+
+def _casos() -> List[Caso]:
+    from core import tarefas
+    from crud import agenda, alteracao, auth, cliente, duplicado, procedimento, retencao, tarefa
+
+    hoje = date.today()
+    semana = datetime.combine(hoje - timedelta(days=hoje.weekday()), datetime.min.time())
+    return [
+        Caso("get_cliente", lambda db: cliente.get_cliente(db, 1),
+             indices={"clientes": "pkey|PRIMARY KEY|ix_clientes_id"}, sem_scan=("clientes",), max_linhas=1),
+        Caso("get_clientes", lambda db: cliente.get_clientes(db),
+             indices={"clientes": "nome"}, sem_sort=True),
+        Caso("get_clientes_busca", lambda db: cliente.get_clientes(db, search="silva")),
+        Caso("get_procedimento", lambda db: procedimento.get_procedimento(db, 1),
+             indices={"procedimentos": "pkey|PRIMARY KEY|ix_procedimentos_id"}, sem_scan=("procedimentos",), max_linhas=1),
+        Caso("get_procedimentos", lambda db: procedimento.get_procedimentos(db),
+             indices={"procedimentos": "data_id"}, sem_scan=("procedimentos",), sem_sort=True),
+        Caso("get_procedimentos_cliente", lambda db: procedimento.get_procedimentos(db, cliente_id=1, limit=1000),
+             indices={"procedimentos": "cliente_data"}, sem_scan=("procedimentos",), sem_sort=True, max_linhas=1000),
+        Caso("get_procedimentos_periodo",
+             lambda db: procedimento.get_procedimentos(db, data_inicio=hoje - timedelta(days=30), data_fim=hoje),
+             indices={"procedimentos": "data_id"}, sem_scan=("procedimentos",), max_particoes=2),
+        Caso("get_procedimentos_periodo_corte",
+             lambda db: procedimento.get_procedimentos(
+                 db, data_inicio=hoje - timedelta(days=30), data_fim=hoje, corte=True),
+             indices={"procedimentos": "corte_data|data_id"}, sem_scan=("procedimentos",), max_particoes=2),
+        Caso("get_procedimentos_tipo_periodo",
+             lambda db: procedimento.get_procedimentos(
+                 db, tipo_procedimento_id=2, data_inicio=hoje - timedelta(days=30), data_fim=hoje),
+             indices={"procedimentos": "tipo_data|data_id"}, sem_scan=("procedimentos",), max_particoes=2),
+        Caso("resumo_por_tipo_periodo",
+             lambda db: procedimento.resumo_por_tipo(db, data_inicio=hoje - timedelta(days=30), data_fim=hoje),
+             indices={"procedimentos": "tipo_data|data_id"}, sem_scan=("procedimentos",), max_particoes=2),
+        Caso("get_usuario_by_email", lambda db: auth.get_usuario_by_email(db, "benchmark@salao.com.br"),
+             indices={"usuarios": "email"}, max_linhas=1),
+        Caso("get_usuario_by_id", lambda db: auth.get_usuario_by_id(db, 1),
+             indices={"usuarios": "pkey|PRIMARY KEY|ix_usuarios_id"}, max_linhas=1),
+        # Sincronização: (transacao, id) > token, na ordem do índice
+        Caso("alteracoes_desde", lambda db: alteracao.alteracoes_desde(db, (0, 0)),
+             indices={"alteracoes": "transacao_id", "clientes": "pkey|PRIMARY KEY|ix_clientes_id",
+                      "procedimentos": "pkey|PRIMARY KEY|ix_procedimentos_id"},
+             sem_scan=("alteracoes", "clientes"), sem_sort=True),
+        Caso("ocupacao_semana", lambda db: agenda._ocupacao_periodo(db, semana, semana + timedelta(days=7)),
+             indices={"agendamentos": "ix_agendamentos_inicio"}, sem_scan=("agendamentos",)),
+        Caso("get_duplicados", lambda db: duplicado.get_duplicados(db),
+             indices={"clientes": "pkey|PRIMARY KEY|ix_clientes_id"}, sem_scan=("clientes",)),
+        # As estatísticas de retorno leem todos os procedimentos de propósito
+        # (pelo cursor do driver, fora do que é capturado aqui); o caso cobre
+        # a busca dos nomes da página
+        Caso("retorno_previsto", lambda db: retencao.retorno_previsto(db, hoje=hoje),
+             indices={"clientes": "pkey|PRIMARY KEY|ix_clientes_id"}),
+        Caso("get_tarefas_falhou", lambda db: tarefa.get_tarefas(db, estado="falhou"),
+             indices={"tarefas": "estado_executar_em"}, sem_scan=("tarefas",)),
+        # Executa de fato: pega (e confirma) uma tarefa pendente do banco
+        Caso("pegar_tarefa", tarefas.pegar_tarefa,
+             indices={"tarefas": "estado_executar_em"}, sem_scan=("tarefas",)),
+    ]
+
+
+def capturar_queries(engine, chamada: Callable) -> List[Tuple[str, object]]:
+    """
+    Executa a chamada de crud e devolve as consultas emitidas (SELECTs e os
+    UPDATEs com subconsulta, como o de pegar_tarefa) com seus parâmetros.
+    """
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    capturadas: List[Tuple[str, object]] = []
+
+    def ouvir(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE")):
+            capturadas.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", ouvir)
+    try:
+        with Session(bind=engine) as db:
+            chamada(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", ouvir)
+    return capturadas
+
+
+# Partições mensais (db/particionamento.py) contam como a tabela pai
+_PARTICAO = re.compile(r"^(\w+?)_(?:p\d{4}_\d{2}|default)$")
+
+
+def _nos_postgres(plano: Dict, nos: List[Dict]) -> None:
+    relacao = plano.get("Relation Name")
+    particao = _PARTICAO.match(relacao) if relacao else None
+    nos.append({
+        "tipo": plano["Node Type"],
+        "tabela": particao.group(1) if particao else relacao,
+        "particao": relacao if particao else None,
+        "indice": plano.get("Index Name"),
+        "linhas": plano.get("Plan Rows"),
+        "custo": plano.get("Total Cost"),
+    })
+    for filho in plano.get("Plans", []):
+        _nos_postgres(filho, nos)
+
+
+_SQLITE_DETALHE = re.compile(
+    r"^(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS \w+)?"
+    r"(?: USING (?:COVERING )?(?:INDEX (\w+)|(INTEGER PRIMARY KEY)))?"
+)
+# O SQLite mostra o nome do alias (aliased() gera clientes_1, clientes_2...)
+_SQLITE_ALIAS = re.compile(r"^(\w+?)_\d+$")
+
+
+def explicar(engine, statement: str, parameters) -> Dict:
+    """
+    Roda EXPLAIN e normaliza o resultado em uma lista de nós
+    {tipo, tabela, indice, linhas, custo} para Postgres e SQLite.
+    """
+    conexao = engine.raw_connection()
+    try:
+        cursor = conexao.cursor()
+        if engine.dialect.name == "postgresql":
+            cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            plano = cursor.fetchone()[0][0]["Plan"]
+            nos: List[Dict] = []
+            _nos_postgres(plano, nos)
+            return {"nos": nos, "custo": plano["Total Cost"], "linhas": plano["Plan Rows"], "texto": json.dumps(plano)}
+
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        linhas = [linha[3] for linha in cursor.fetchall()]
+        nos = []
+        for detalhe in linhas:
+            encontrado = _SQLITE_DETALHE.match(detalhe)
+            if encontrado:
+                operacao, tabela, indice, pk = encontrado.groups()
+                alias = _SQLITE_ALIAS.match(tabela)
+                if alias:
+                    tabela = alias.group(1)
+                nos.append({
+                    "tipo": "Index Scan" if operacao == "SEARCH" or indice or pk else "Seq Scan",
+                    "tabela": tabela,
+                    "indice": indice or ("PRIMARY KEY" if pk else None),
+                    "linhas": None,
+                    "custo": None,
+                })
+            elif "TEMP B-TREE" in detalhe:
+                nos.append({"tipo": "Sort", "tabela": None, "indice": None, "linhas": None, "custo": None})
+        return {"nos": nos, "custo": None, "linhas": None, "texto": "\n".join(linhas)}
+    finally:
+        conexao.close()
+
+
+def verificar(caso: Caso, planos: List[Dict], base: Optional[float], tolerancia: float) -> List[str]:
+    """
+    Retorna as violações do caso (lista vazia quando o plano está ok).
+    """
+    falhas = []
+    nos = [no for plano in planos for no in plano["nos"]]
+
+    for tabela, padrao in caso.indices.items():
+        da_tabela = [no for no in nos if no["tabela"] == tabela]
+        if da_tabela and not any(no["indice"] and re.search(padrao, no["indice"]) for no in da_tabela):
+            usados = ", ".join(f"{no['tipo']}({no['indice'] or '-'})" for no in da_tabela)
+            falhas.append(f"esperava índice /{padrao}/ em {tabela}, plano usa: {usados}")
+
+    for tabela in caso.sem_scan:
+        if any(no["tabela"] == tabela and no["tipo"] in ("Seq Scan", "Parallel Seq Scan") for no in nos):
+            falhas.append(f"scan sequencial em {tabela}")
+
+    if caso.sem_sort and any(no["tipo"] in ("Sort", "Incremental Sort") for no in nos):
+        falhas.append("ordenação explícita: o ORDER BY deveria vir do índice")
+
+    particoes = {no["particao"] for no in nos if no.get("particao")}
+    if caso.max_particoes is not None and len(particoes) > caso.max_particoes:
+        falhas.append(f"{len(particoes)} partições lidas (máximo {caso.max_particoes}): sem partition pruning?")
+
+    linhas = [plano["linhas"] for plano in planos if plano["linhas"] is not None]
+    if caso.max_linhas is not None and linhas and max(linhas) > caso.max_linhas:
+        falhas.append(f"estimativa de {max(linhas)} linhas (máximo {caso.max_linhas})")
+
+    custos = [plano["custo"] for plano in planos if plano["custo"] is not None]
+    if base is not None and custos and sum(custos) > base * (1 + tolerancia):
+        falhas.append(f"custo {sum(custos):.1f} acima da base {base:.1f} (+{tolerancia:.0%})")
+    return falhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regressão de planos EXPLAIN das queries do crud")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"),
+                        help="Banco a usar (padrão: SQLite temporário, exige --popular)")
+    parser.add_argument("--popular", action="store_true", help="Recria e popula o banco antes de verificar")
+    parser.add_argument("--clientes", type=int, default=20000)
+    parser.add_argument("--procedimentos", type=int, default=400000)
+    parser.add_argument("--base", default=BASE_PADRAO, help="Arquivo com os custos de referência")
+    parser.add_argument("--gravar-base", action="store_true", help="Grava os custos atuais como referência")
+    parser.add_argument("--tolerancia", type=float, default=0.5, help="Aumento de custo aceito (0.5 = 50%%)")
+    parser.add_argument("--mostrar", action="store_true", help="Imprime o plano de cada query")
+    args = parser.parse_args()
+
+    # Sem o cache de entidades, para que toda chamada chegue ao banco
+    os.environ["CACHE_BACKEND"] = "desligado"
+
+    database_url = args.database_url
+    if not database_url:
+        if not args.popular:
+            parser.error("informe --database-url ou use --popular para um SQLite temporário")
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='planos-'), 'planos.db')}"
+
+    if args.popular:
+        popular(database_url, args.clientes, args.procedimentos, anos=5, semente=42, recriar=True)
+        popular_auxiliares(database_url, args.clientes, args.procedimentos, semente=42)
+    else:
+        sys.path.insert(0, APP_DIR)
+        os.environ["DATABASE_URL"] = database_url
+
+    from sqlalchemy import create_engine
+
+    engine = create_engine(database_url)
+    dialeto = engine.dialect.name
+
+    bases: Dict = {}
+    if os.path.exists(args.base):
+        with open(args.base, encoding="utf-8") as arquivo:
+            bases = json.load(arquivo)
+    base_dialeto = bases.get(dialeto, {})
+
+    novas_bases: Dict[str, float] = {}
+    total_falhas = 0
+    for caso in _casos():
+        queries = capturar_queries(engine, caso.chamada)
+        planos = [explicar(engine, statement, parametros) for statement, parametros in queries]
+        custos = [plano["custo"] for plano in planos if plano["custo"] is not None]
+        if custos:
+            novas_bases[caso.nome] = round(sum(custos), 2)
+
+        falhas = verificar(caso, planos, None if args.gravar_base else base_dialeto.get(caso.nome), args.tolerancia)
+        total_falhas += len(falhas)
+        custo = f"custo {sum(custos):.1f}" if custos else ""
+        print(f"{'FALHA' if falhas else 'ok':<6} {caso.nome:<34} {custo}")
+        for falha in falhas:
+            print(f"         - {falha}")
+        if args.mostrar or falhas:
+            for plano in planos:
+                print("           " + plano["texto"].replace("\n", "\n           "))
+
+    if args.gravar_base and novas_bases:
+        bases[dialeto] = novas_bases
+        with open(args.base, "w", encoding="utf-8") as arquivo:
+            json.dump(bases, arquivo, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"Base de custos gravada em {args.base}")
+
+    if total_falhas:
+        print(f"\n{total_falhas} regressão(ões) de plano encontrada(s)")
+        sys.exit(1)
+    print("\nTodos os planos estão dentro do esperado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Tempo do cálculo das estatísticas de retorno dos clientes.
+
+Mede, sobre o banco da suíte (benchmarks/dados.py), crud.retencao._carregar():
+a consulta das quatro colunas de todos os procedimentos, a transposição em
+arrays e o cálculo com NumPy, separando o tempo do banco do tempo do cálculo.
+Mede também uma página de GET /clientes/retorno-previsto com as estatísticas
+já em cache.
+
+Uso:
+    python benchmarks/retencao.py --popular --clientes 100000 --procedimentos 1000000
+    python benchmarks/retencao.py --database-url postgresql://... --limite-ms 3000
+
+Sai com código 1 quando o cálculo completo passa do limite.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+from dados import APP_DIR, popular
+from executar import _url_absoluta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo das estatísticas de retorno dos clientes")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///benchmarks/bench.db"))
+    parser.add_argument("--popular", action="store_true", help="Recria e popula o banco antes de medir")
+    parser.add_argument("--clientes", type=int, default=100000)
+    parser.add_argument("--procedimentos", type=int, default=1000000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--limite-ms", type=float, default=5000, help="Limite para a mediana do cálculo completo")
+    args = parser.parse_args()
+
+    database_url = _url_absoluta(args.database_url)
+    if args.popular:
+        popular(database_url, args.clientes, args.procedimentos, anos=5, semente=42, recriar=True)
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, APP_DIR)
+
+    import numpy as np
+    from core import retencao
+    from crud.retencao import _carregar, retorno_previsto
+    from db.session import SessionLocal
+
+    # Separa o tempo do cálculo: mede retencao.calcular à parte
+    calculos = []
+    original = retencao.calcular
+
+    def medir_calculo(*colunas):
+        comeco = time.perf_counter()
+        resultado = original(*colunas)
+        calculos.append((time.perf_counter() - comeco) * 1000)
+        return resultado
+
+    sys.modules["crud.retencao"].calcular = medir_calculo
+
+    totais = []
+    with SessionLocal() as db:
+        for _ in range(args.repeticoes):
+            comeco = time.perf_counter()
+            dados = _carregar(db)
+            totais.append((time.perf_counter() - comeco) * 1000)
+
+        retorno_previsto(db, limit=100)
+        paginas = []
+        for _ in range(50):
+            comeco = time.perf_counter()
+            pagina = retorno_previsto(db, limit=100)
+            paginas.append((time.perf_counter() - comeco) * 1000)
+
+    total = statistics.median(totais)
+    calculo = statistics.median(calculos)
+    hoje = (date.today() - date(1970, 1, 1)).days
+    with np.errstate(invalid="ignore"):
+        atrasados = int(np.count_nonzero(dados.colunas["retorno_previsto"] <= hoje))
+    print(f"{len(dados)} clientes com procedimentos, {atrasados} com retorno atrasado ({len(pagina)} na página)")
+    print(f"cálculo completo: mediana {total:.0f} ms (banco e transposição {total - calculo:.0f} ms, NumPy {calculo:.0f} ms)")
+    print(f"página de retorno-previsto com cache: mediana {statistics.median(paginas):.1f} ms")
+    if total > args.limite_ms:
+        print(f"Acima do limite de {args.limite_ms:.0f} ms.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
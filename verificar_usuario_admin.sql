@@ -12,3 +12,8 @@ ORDER BY id;
 -- 3. Para tornar TODOS os usuários como admin (use com cuidado):
 -- UPDATE usuarios SET is_admin = TRUE;
 
+-- 4. Com a API rodando, avise os workers para descartarem o usuário do cache
+--    (senão a mudança só aparece quando a entrada expirar, em até CACHE_TTL_S segundos):
+-- SELECT pg_notify('salao_cache', '{"tipo": "usuario", "ids": [ID_DO_USUARIO]}');
+--    Para descartar o cache inteiro:
+-- SELECT pg_notify('salao_cache', '{"limpar": true}');